@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Persistent Embedding Cache
+
+Disk-backed cache of embedding vectors keyed by model plus a hash of the
+text, shared by EmbeddingGenerator.generate_embeddings and the query path of
+SemanticSearcher. Titles, summaries, re-stored chunks and popular queries are
+encoded once; later lookups skip the model entirely.
+
+Layout, one directory per model under EMBEDDING_CACHE_DIR:
+
+    vectors-<generation>.bin  append-only float32/float16 rows, memory-mapped for reads
+    index.sqlite              text hash -> row slot, last use time, dimension
+
+When the vector file grows past EMBEDDING_CACHE_MAX_MB, the least recently
+used entries are dropped by compacting into a new generation file. Hits
+record their use time in memory; it is written to the index with the next
+append, compaction or at most every TOUCH_FLUSH_SECONDS, so lookups do not
+take the SQLite write lock.
+
+The cache is off unless EMBEDDING_CACHE_DIR is set.
+
+Usage:
+    python embedding_cache.py status    # entries and size per model
+    python embedding_cache.py compact   # evict down to the size limit now
+"""
+
+import sys
+import json
+import os
+import re
+import time
+import atexit
+import threading
+import sqlite3
+import hashlib
+from typing import List, Dict, Any, Optional, Callable
+import numpy as np
+
+# Compaction shrinks the file to this fraction of the limit so it does not
+# run again on the very next write
+COMPACT_TARGET = 0.8
+
+# Longest a process keeps last-use times of cache hits in memory before
+# writing them to the index
+TOUCH_FLUSH_SECONDS = 60.0
+
+
+# Settings are read when used, not at import, so a .env loaded by the
+# importing script still applies
+def get_cache_dir() -> str:
+    return os.getenv('EMBEDDING_CACHE_DIR', '')
+
+
+def get_cache_max_bytes() -> int:
+    return int(float(os.getenv('EMBEDDING_CACHE_MAX_MB', '512')) * 1024 * 1024)
+
+
+def get_cache_dtype() -> str:
+    return os.getenv('EMBEDDING_CACHE_DTYPE', 'float32')
+
+
+class EmbeddingCache:
+    def __init__(self, directory: str, model_key: str, dtype: str = 'float32',
+                 max_bytes: int = int(512 * 1024 * 1024)):
+        """
+        Cache of one model's embeddings.
+
+        Args:
+            directory: Root cache directory (a subdirectory is used per model)
+            model_key: Everything that changes a vector, e.g. 'all-MiniLM-L6-v2|torch'
+            dtype: 'float32' or 'float16' storage for the vectors
+            max_bytes: Vector file size that triggers eviction
+        """
+        if dtype not in ('float32', 'float16'):
+            raise ValueError(f"Unsupported embedding cache dtype '{dtype}'. Use float32 or float16")
+        self.model_key = model_key
+        self.dtype = np.dtype(dtype)
+        self.max_bytes = max_bytes
+        self.path = os.path.join(directory, re.sub(r'[^A-Za-z0-9._-]+', '_', model_key))
+        os.makedirs(self.path, exist_ok=True)
+
+        # One connection and vector mapping per thread (sqlite3 connections
+        # cannot cross threads, and inference_server.py encodes on its own
+        # thread); reopened after a fork
+        self._local = threading.local()
+        # key -> last use time of hits not written to the index yet, shared by all threads
+        self._touched = {}
+        self._touched_lock = threading.Lock()
+        self._touched_written_at = time.monotonic()
+        atexit.register(self._flush_touches_at_exit)
+        self.stats = {'hits': 0, 'misses': 0}
+
+        # An existing cache keeps the format it was created with
+        stored_dtype = self._meta('dtype')
+        if stored_dtype and stored_dtype != self.dtype.name:
+            print(f"Warning: Embedding cache {self.path} stores {stored_dtype}; "
+                  f"ignoring EMBEDDING_CACHE_DTYPE={dtype}", file=sys.stderr)
+            self.dtype = np.dtype(stored_dtype)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, 'connection', None) is None or local.pid != os.getpid():
+            local.connection = sqlite3.connect(os.path.join(self.path, 'index.sqlite'), timeout=30,
+                                               isolation_level=None)
+            local.pid = os.getpid()
+            local.vectors = None
+            local.mapped_generation = None
+            local.connection.execute('PRAGMA journal_mode=WAL')
+            local.connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER, last_used REAL)'
+            )
+            local.connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        return local.connection
+
+    def _meta(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        row = self.connection.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, name: str, value: Any) -> None:
+        self.connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (name, str(value)))
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _vector_file(self, generation: int) -> str:
+        return os.path.join(self.path, f'vectors-{generation}.bin')
+
+    def _row_bytes(self, dimension: int) -> int:
+        return dimension * self.dtype.itemsize
+
+    def _map_vectors(self, generation: int, dimension: int, min_rows: int) -> Optional[np.ndarray]:
+        """Memory-map the vector file, remapping when it was compacted or has grown."""
+        local = self._local
+        if (getattr(local, 'vectors', None) is None or local.mapped_generation != generation
+                or local.vectors.shape[0] < min_rows):
+            path = self._vector_file(generation)
+            rows = os.path.getsize(path) // self._row_bytes(dimension) if os.path.exists(path) else 0
+            if rows == 0:
+                return None
+            local.vectors = np.memmap(path, dtype=self.dtype, mode='r', shape=(rows, dimension))
+            local.mapped_generation = generation
+        return local.vectors
+
+    def get_many(self, texts: List[str]) -> Dict[int, np.ndarray]:
+        """
+        Look up cached vectors.
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            Mapping of input position to vector for the texts that were found.
+            float32 vectors are read-only views into the memory-mapped file;
+            callers that keep them should copy.
+        """
+        keys = [self.make_key(text) for text in texts]
+        slots = {}
+        # One read transaction so slots and generation come from the same snapshot
+        self.connection.execute('BEGIN')
+        try:
+            dimension = int(self._meta('dimension', '0'))
+            generation = int(self._meta('generation', '0'))
+            unique_keys = list(dict.fromkeys(keys)) if dimension else []
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                rows = self.connection.execute(
+                    f'SELECT key, slot FROM entries WHERE key IN ({",".join("?" * len(chunk))})', chunk
+                ).fetchall()
+                slots.update(rows)
+        finally:
+            self.connection.execute('COMMIT')
+
+        found = {}
+        if slots:
+            vectors = self._map_vectors(generation, dimension, max(slots.values()) + 1)
+            if vectors is not None:
+                for i, key in enumerate(keys):
+                    slot = slots.get(key)
+                    if slot is not None and slot < vectors.shape[0]:
+                        found[i] = vectors[slot]
+
+            now = time.time()
+            with self._touched_lock:
+                self._touched.update(dict.fromkeys(slots, now))
+            if time.monotonic() - self._touched_written_at >= TOUCH_FLUSH_SECONDS:
+                self.flush_touches()
+
+        self.stats['hits'] += len(found)
+        self.stats['misses'] += len(texts) - len(found)
+        return found
+
+    def _write_touches(self) -> None:
+        """Write pending last-use times; the caller holds the write transaction."""
+        with self._touched_lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            self.connection.executemany(
+                'UPDATE entries SET last_used = ? WHERE key = ?',
+                [(last_used, key) for key, last_used in touched.items()]
+            )
+        self._touched_written_at = time.monotonic()
+
+    def flush_touches(self) -> None:
+        """Write the last-use times of hits since the previous write."""
+        if not self._touched:
+            return
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._write_touches()
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def _flush_touches_at_exit(self) -> None:
+        try:
+            self.flush_touches()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Warning: Embedding cache last-use update failed: {str(e)}", file=sys.stderr)
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Append vectors for texts that are not cached yet.
+
+        Args:
+            texts: Encoded texts
+            vectors: Matrix with one row per text
+        """
+        vectors = np.asarray(vectors)
+        if not len(texts):
+            return
+        dimension = vectors.shape[1]
+        row_bytes = self._row_bytes(dimension)
+
+        connection = self.connection
+        # The write lock serialises appends from several processes
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            stored_dimension = int(self._meta('dimension', '0'))
+            if stored_dimension and stored_dimension != dimension:
+                raise ValueError(f"Cache holds {stored_dimension}-d vectors, got {dimension}-d")
+            if not stored_dimension:
+                self._set_meta('dimension', dimension)
+                self._set_meta('dtype', self.dtype.name)
+            generation = int(self._meta('generation', '0'))
+
+            keys = list(dict.fromkeys(self.make_key(text) for text in texts))
+            position = {self.make_key(text): i for i, text in enumerate(texts)}
+            existing = set()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                existing.update(row[0] for row in connection.execute(
+                    f'SELECT key FROM entries WHERE key IN ({",".join("?" * len(chunk))})', chunk
+                ))
+            new_keys = [key for key in keys if key not in existing]
+
+            if new_keys:
+                path = self._vector_file(generation)
+                # Slots follow the file length, so rows left by an interrupted
+                # append are skipped rather than reused
+                first_slot = (os.path.getsize(path) if os.path.exists(path) else 0) // row_bytes
+                block = vectors[[position[key] for key in new_keys]].astype(self.dtype)
+                with open(path, 'ab') as f:
+                    f.seek(first_slot * row_bytes)
+                    f.truncate()
+                    f.write(np.ascontiguousarray(block).tobytes())
+
+                now = time.time()
+                connection.executemany(
+                    'INSERT INTO entries VALUES (?, ?, ?)',
+                    [(key, first_slot + i, now) for i, key in enumerate(new_keys)]
+                )
+            # Already holding the write lock: record pending hits too
+            self._write_touches()
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        if self.file_size() > self.max_bytes:
+            self.compact()
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Return embeddings for texts, calling encode_fn only for cache misses.
+
+        Args:
+            texts: Texts to embed
+            encode_fn: Encodes a list of texts into a matrix (e.g. SentenceTransformer.encode)
+
+        Returns:
+            float32 matrix with one row per text, in input order. Cached rows
+            are copied out of the memory-mapped file into it (and converted
+            when the cache stores float16); a hit saves the forward pass,
+            not the copy.
+        """
+        try:
+            found = self.get_many(texts)
+        except (sqlite3.Error, OSError) as e:
+            print(f"Warning: Embedding cache lookup failed: {str(e)}", file=sys.stderr)
+            found = {}
+        missing = [i for i in range(len(texts)) if i not in found]
+        # Repeated text in one call is encoded once
+        missing_texts = list(dict.fromkeys(texts[i] for i in missing))
+
+        encoded = {}
+        if missing_texts:
+            vectors = np.asarray(encode_fn(missing_texts), dtype=np.float32)
+            encoded = dict(zip(missing_texts, vectors))
+            try:
+                self.put_many(missing_texts, vectors)
+            except (sqlite3.Error, OSError, ValueError) as e:
+                print(f"Warning: Embedding cache write failed: {str(e)}", file=sys.stderr)
+
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        first = found[0] if 0 in found else encoded[texts[0]]
+        # Filled row by row: one copy per vector, whatever the cache dtype
+        embeddings = np.empty((len(texts), first.shape[0]), dtype=np.float32)
+        for i in range(len(texts)):
+            embeddings[i] = found[i] if i in found else encoded[texts[i]]
+        return embeddings
+
+    def file_size(self) -> int:
+        path = self._vector_file(int(self._meta('generation', '0')))
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def compact(self, target_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Drop least recently used entries and rewrite the vector file.
+
+        The surviving rows are written to a new generation file; readers
+        notice the generation change and remap.
+
+        Args:
+            target_bytes: Size to shrink to (default COMPACT_TARGET of the limit)
+
+        Returns:
+            Entry counts before and after
+        """
+        target_bytes = int(self.max_bytes * COMPACT_TARGET) if target_bytes is None else target_bytes
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            # Evict by up-to-date use times, including this process's pending hits
+            self._write_touches()
+            dimension = int(self._meta('dimension', '0'))
+            generation = int(self._meta('generation', '0'))
+            entries = connection.execute(
+                'SELECT key, slot, last_used FROM entries ORDER BY last_used DESC'
+            ).fetchall()
+            if not dimension:
+                connection.execute('COMMIT')
+                return {'entries_before': 0, 'entries_after': 0}
+
+            keep = entries[:max(0, target_bytes // self._row_bytes(dimension))]
+            old_path = self._vector_file(generation)
+            new_path = self._vector_file(generation + 1)
+            self._local.vectors = None
+            old_vectors = self._map_vectors(generation, dimension, 0)
+
+            with open(new_path, 'wb') as f:
+                if keep and old_vectors is not None:
+                    f.write(np.ascontiguousarray(old_vectors[[slot for _, slot, _ in keep]]).tobytes())
+
+            connection.execute('DELETE FROM entries')
+            connection.executemany(
+                'INSERT INTO entries VALUES (?, ?, ?)',
+                [(key, slot, last_used) for slot, (key, _, last_used) in enumerate(keep)]
+            )
+            self._set_meta('generation', generation + 1)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        self._local.vectors = None
+        try:
+            os.remove(old_path)
+        except OSError:
+            # Still mapped by another process (Windows); removed by a later compaction
+            pass
+
+        return {'entries_before': len(entries), 'entries_after': len(keep)}
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'model_key': self.model_key,
+            'path': self.path,
+            'entries': self.connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0],
+            'dimension': int(self._meta('dimension', '0')),
+            'dtype': self.dtype.name,
+            'size_mb': round(self.file_size() / (1024 * 1024), 2),
+            'max_mb': round(self.max_bytes / (1024 * 1024), 2)
+        }
+
+
+def open_embedding_cache(model_name: str, backend: str) -> Optional[EmbeddingCache]:
+    """
+    Open the cache configured by EMBEDDING_CACHE_DIR for a model and backend.
+
+    Returns:
+        EmbeddingCache, or None when caching is disabled
+    """
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return None
+    return EmbeddingCache(
+        cache_dir,
+        f"{model_name}|{backend}",
+        dtype=get_cache_dtype(),
+        max_bytes=get_cache_max_bytes()
+    )
+
+
+def main():
+    """Main function to handle command line execution."""
+    commands = ('status', 'compact')
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        print(json.dumps({
+            'success': False,
+            'error': 'Usage: python embedding_cache.py <status|compact>'
+        }))
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    try:
+        cache_dir = get_cache_dir()
+        if not cache_dir:
+            raise ValueError('EMBEDDING_CACHE_DIR is not set')
+
+        models = {}
+        if os.path.isdir(cache_dir):
+            for name in sorted(os.listdir(cache_dir)):
+                if not os.path.isfile(os.path.join(cache_dir, name, 'index.sqlite')):
+                    continue
+                cache = EmbeddingCache(cache_dir, name, dtype=get_cache_dtype(),
+                                       max_bytes=get_cache_max_bytes())
+                if command == 'compact':
+                    models[name] = {**cache.compact(), **cache.status()}
+                else:
+                    models[name] = cache.status()
+
+        print(json.dumps({'success': True, 'cache_dir': cache_dir, 'models': models}, indent=2))
+        sys.exit(0)
+
+    except Exception as e:
+        print(json.dumps({
+            'success': False,
+            'error': f'{command} failed: {str(e)}'
+        }))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,55 +3,133 @@
 Embedding Generator and Vector Store Manager
 
 This script generates embeddings for video transcripts and stores them in ChromaDB
-for semantic search functionality.
+(or the flat store from vector_store.py, see VECTOR_STORE_BACKEND) for semantic
+search functionality.
+
+Which model embeds into which collection comes from model_registry.py. Every
+store writes to the active model's collection and, during a migration, to
+the collections of the other models marked for dual-write.
 """
 
 import sys
 import json
 import os
-from typing import List, Dict, Any, Optional
-import chromadb
-from chromadb.config import Settings
+import time
+from typing import List, Dict, Any, Optional, Callable
+from dotenv import load_dotenv
+
+# Load environment variables (before model_backends, which reads MODEL_STORE_OFFLINE on import)
+load_dotenv()
+
+# Before sentence_transformers: switches on strict offline mode ahead of the HF imports
+from model_backends import get_backend, load_embedding_model
 from sentence_transformers import SentenceTransformer
 import numpy as np
-from dotenv import load_dotenv
-import uuid
 import hashlib
+from embedding_cache import open_embedding_cache
+from vector_store import (create_client, get_vector_store_backend, hnsw_metadata, get_collection_space,
+                          distance_to_similarity, bump_collection_version, drop_collection_version)
+from model_registry import load_registry, get_active_model, get_model_entry, get_write_models
+
+# Model search reads from (all-MiniLM-L6-v2 unless the registry says otherwise)
+EMBEDDING_MODEL_NAME = get_active_model()['name']
+
+# Documents encoded and written to ChromaDB per block when storing a video
+WRITE_BLOCK_SIZE = int(os.getenv('EMBEDDING_WRITE_BLOCK', '256'))
+
+# Texts per forward pass of the embedding model
+ENCODE_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+
+# Transcript chunk size in model tokens (0 = the model's max_seq_length) and
+# the tokens shared between consecutive chunks
+CHUNK_TOKEN_BUDGET = int(os.getenv('CHUNK_TOKEN_BUDGET', '0'))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', '32'))
+
+
+def collection_metadata() -> Dict[str, Any]:
+    """
+    Metadata for new collections: explicit distance space and HNSW parameters
+    (HNSW_* in .env), read when a collection is created.
+    """
+    return {"description": "Video transcript embeddings for semantic search", **hnsw_metadata()}
 
-# Load environment variables
-load_dotenv()
 
 class EmbeddingGenerator:
-    def __init__(self):
-        self.model_name = "all-MiniLM-L6-v2"  # Lightweight but effective model
-        self.chroma_persist_dir = os.getenv('CHROMA_PERSIST_DIR', './chromadb')
+    def __init__(self, embedding_model: Optional[SentenceTransformer] = None, backend: Optional[str] = None,
+                 vector_store: Optional[str] = None, model_name: Optional[str] = None,
+                 dual_write: bool = True):
+        """
+        Args:
+            embedding_model: Already loaded model for model_name, shared with the caller
+            backend: Inference backend (defaults to INFERENCE_BACKEND)
+            vector_store: Vector store backend (defaults to VECTOR_STORE_BACKEND)
+            model_name: Registered model to embed with (defaults to the active model)
+            dual_write: Also write to the other models the registry marks for writing
+        """
+        registry = load_registry()
+        model_entry = get_model_entry(model_name, registry) if model_name else get_active_model(registry)
+        self.model_name = model_entry['name']
+        self.collection_name = model_entry['collection']
+        self.backend = get_backend(backend)
+        self.vector_store = get_vector_store_backend(vector_store)
         
-        try:
-            print("Loading embedding model...", file=sys.stderr)
-            self.embedding_model = SentenceTransformer(self.model_name)
-            print(f"Model loaded: {self.model_name}", file=sys.stderr)
-        except Exception as e:
-            raise Exception(f"Failed to load embedding model: {str(e)}")
+        if embedding_model is not None:
+            # Reuse an already loaded model (e.g. shared inside model_worker.py)
+            self.embedding_model = embedding_model
+        else:
+            try:
+                print(f"Loading embedding model ({self.backend} backend)...", file=sys.stderr)
+                self.embedding_model = load_embedding_model(self.model_name, self.backend)
+                print(f"Model loaded: {self.model_name}", file=sys.stderr)
+            except Exception as e:
+                raise Exception(f"Failed to load embedding model: {str(e)}")
+        
+        # Disk cache of vectors already computed for identical text (EMBEDDING_CACHE_DIR)
+        self.embedding_cache = open_embedding_cache(self.model_name, self.backend)
         
         try:
-            print("Initializing ChromaDB...", file=sys.stderr)
-            self.chroma_client = chromadb.PersistentClient(
-                path=self.chroma_persist_dir,
-                settings=Settings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
-                )
-            )
+            print(f"Initializing vector store ({self.vector_store})...", file=sys.stderr)
+            # A chromadb PersistentClient or a client with the same interface
+            self.chroma_client = create_client(self.vector_store, allow_reset=True)
             
-            # Get or create collection for video embeddings
-            self.collection = self.chroma_client.get_or_create_collection(
-                name="video_embeddings",
-                metadata={"description": "Video transcript embeddings for semantic search"}
-            )
-            print("ChromaDB initialized successfully", file=sys.stderr)
+            self.collection = self.open_collection()
+            print(f"Vector store initialized successfully ({self.collection_name}, "
+                  f"{get_collection_space(self.collection)} space)", file=sys.stderr)
             
         except Exception as e:
-            raise Exception(f"Failed to initialize ChromaDB: {str(e)}")
+            raise Exception(f"Failed to initialize vector store: {str(e)}")
+        
+        # Generators for the other collections written during a model migration
+        self.dual_writers = []
+        if dual_write:
+            for entry in get_write_models(registry):
+                if entry['name'] != self.model_name:
+                    print(f"Dual-writing to {entry['collection']} ({entry['name']})", file=sys.stderr)
+                    self.dual_writers.append(EmbeddingGenerator(
+                        backend=backend, vector_store=vector_store, model_name=entry['name'], dual_write=False
+                    ))
+    
+    def open_collection(self, name: Optional[str] = None):
+        """
+        Get the collection, creating it with collection_metadata() if missing.
+        
+        get_or_create_collection is avoided on purpose: handing it new HNSW
+        metadata for an existing collection asks Chroma to change its distance
+        space, which it refuses. Existing collections keep their settings
+        until `rebuild` recreates them.
+        """
+        name = name or self.collection_name
+        try:
+            return self.chroma_client.get_collection(name)
+        except Exception:
+            pass  # Not created yet
+        # Outside the try below so bad HNSW_* settings are reported as such
+        metadata = collection_metadata()
+        try:
+            return self.chroma_client.create_collection(name=name, metadata=metadata)
+        except Exception:
+            # Created concurrently by another process
+            return self.chroma_client.get_collection(name)
     
     def chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
         """
@@ -84,160 +162,613 @@ class EmbeddingGenerator:
         
         return chunks
     
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+    def get_token_budget(self) -> int:
+        """Tokens per transcript chunk: CHUNK_TOKEN_BUDGET or what the model reads."""
+        if CHUNK_TOKEN_BUDGET > 0:
+            return CHUNK_TOKEN_BUDGET
+        max_seq_length = getattr(self.embedding_model, 'max_seq_length', None) or 256
+        # Leave room for the [CLS]/[SEP] special tokens
+        return max(1, max_seq_length - 2)
+    
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Token count of each text, using the model's tokenizer when it has one."""
+        tokenizer = getattr(self.embedding_model, 'tokenizer', None)
+        if tokenizer is None or not texts:
+            return [len(text.split()) for text in texts]
+        return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)['input_ids']]
+    
+    def chunk_segments(self, transcript_segments: List[Dict[str, Any]],
+                       token_budget: Optional[int] = None,
+                       overlap_tokens: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        Generate embeddings for a list of texts.
+        Group consecutive transcript segments into overlapping chunks.
+        
+        Chunks start and end on segment boundaries, so each one carries the
+        exact start and end time of the speech it contains. Segments are
+        added while the chunk stays within token_budget; the next chunk
+        starts far enough back to repeat about overlap_tokens tokens. A
+        single segment longer than the budget becomes a chunk of its own.
+        
+        Args:
+            transcript_segments: List of transcript segments with text, start, and duration
+            token_budget: Maximum tokens per chunk (defaults to get_token_budget())
+            overlap_tokens: Tokens repeated between chunks (defaults to CHUNK_OVERLAP_TOKENS)
+            
+        Returns:
+            List of chunks with 'text', 'start', 'end', 'token_count' and 'word_count'
+        """
+        token_budget = token_budget or self.get_token_budget()
+        overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+        overlap_tokens = min(overlap_tokens, token_budget // 2)
+        
+        segments = [segment for segment in transcript_segments if segment.get('text', '').strip()]
+        texts = [segment['text'].strip() for segment in segments]
+        counts = self.count_tokens(texts)
+        
+        chunks = []
+        first = 0
+        while first < len(segments):
+            # Extend the chunk one segment at a time up to the budget
+            last = first
+            tokens = counts[first]
+            while last + 1 < len(segments) and tokens + counts[last + 1] <= token_budget:
+                last += 1
+                tokens += counts[last]
+            
+            chunk_text = ' '.join(texts[first:last + 1])
+            end_segment = segments[last]
+            chunks.append({
+                'text': chunk_text,
+                'start': round(float(segments[first].get('start', 0)), 2),
+                'end': round(float(end_segment.get('start', 0)) + float(end_segment.get('duration', 0)), 2),
+                'token_count': tokens,
+                'word_count': len(chunk_text.split())
+            })
+            
+            if last + 1 >= len(segments):
+                break
+            
+            # Step back over trailing segments for the overlap, always moving forward
+            next_first = last + 1
+            repeated = 0
+            while next_first - 1 > first and repeated + counts[next_first - 1] <= overlap_tokens:
+                next_first -= 1
+                repeated += counts[next_first]
+            first = next_first
+        
+        return chunks
+    
+    def encode_texts(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Encode texts into unit-length float32 vectors.
+        
+        Search turns distances into cosine similarity assuming unit vectors,
+        so embeddings are always normalized. With EMBEDDING_CACHE_DIR set,
+        texts encoded before are read from the embedding cache and only the
+        rest go through the model.
         
         Args:
             texts: List of text strings
+            batch_size: Texts per forward pass (defaults to EMBEDDING_BATCH_SIZE)
             
         Returns:
-            List of embedding vectors
+            float32 matrix with one row per text
         """
+        batch_size = batch_size or ENCODE_BATCH_SIZE
+        
+        def encode(batch: List[str]) -> np.ndarray:
+            return np.asarray(self.embedding_model.encode(
+                batch,
+                batch_size=batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            ), dtype=np.float32)
+        
         try:
-            embeddings = self.embedding_model.encode(texts, convert_to_tensor=False)
-            return embeddings.tolist()
+            if self.embedding_cache is not None:
+                return self.embedding_cache.encode(texts, encode)
+            return encode(texts)
         except Exception as e:
             raise Exception(f"Failed to generate embeddings: {str(e)}")
     
-    def create_document_id(self, video_id: str, chunk_index: int) -> str:
-        """Create a unique document ID for ChromaDB."""
-        return f"{video_id}_chunk_{chunk_index}"
+    def iter_embeddings(self, texts: List[str], batch_size: Optional[int] = None,
+                        block_size: int = WRITE_BLOCK_SIZE):
+        """
+        Encode texts block by block so only one block of vectors is alive at a time.
+        
+        Args:
+            texts: List of text strings
+            batch_size: Texts per forward pass (defaults to EMBEDDING_BATCH_SIZE)
+            block_size: Texts per yielded block (defaults to EMBEDDING_WRITE_BLOCK)
+            
+        Yields:
+            (start, vectors) with the block's offset into texts and its float32 matrix
+        """
+        for start in range(0, len(texts), block_size):
+            yield start, self.encode_texts(texts[start:start + block_size], batch_size)
+    
+    def generate_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+        """
+        Generate embeddings for a list of texts.
+        
+        Args:
+            texts: List of text strings
+            batch_size: Texts per forward pass (defaults to EMBEDDING_BATCH_SIZE)
+            
+        Returns:
+            List of embedding vectors
+        """
+        return self.encode_texts(texts, batch_size).tolist()
+    
+    def content_hash(self, text: str) -> str:
+        """Hash of a document's text and the model that embeds it."""
+        return hashlib.sha256(f"{self.model_name}\n{text}".encode('utf-8')).hexdigest()[:16]
+    
+    def create_document_id(self, video_id: str, content_hash: str, occurrence: int = 0) -> str:
+        """
+        Create a unique document ID for ChromaDB.
+        
+        The ID is the video and the content hash, not the chunk position, so
+        a chunk whose text is unchanged keeps its ID (and its stored
+        embedding) across re-ingests even when an earlier chunk changed.
+        Repeats of the same text within a video are numbered by occurrence.
+        """
+        if occurrence:
+            return f"{video_id}_chunk_{content_hash}_{occurrence}"
+        return f"{video_id}_chunk_{content_hash}"
+    
+    def document_id_for(self, video_id: str, metadata: Dict[str, Any], content_hash: str,
+                        occurrence: int = 0) -> str:
+        """ID of a title, summary or transcript chunk document, as prepare_video_documents assigns it."""
+        chunk_type = metadata.get('chunk_type', 'transcript')
+        if chunk_type in ('title', 'summary'):
+            return f"{video_id}_{chunk_type}_{content_hash}"
+        return self.create_document_id(video_id, content_hash, occurrence)
+    
+    def prepare_video_documents(self, video_id: str, transcript_text: str,
+                                transcript_segments: List[Dict[str, Any]],
+                                title: str = '', summary: str = '') -> Dict[str, Any]:
+        """
+        Build the ChromaDB documents (title, summary and transcript chunks) for a video.
+        
+        Args:
+            video_id: YouTube video ID
+            transcript_text: Full transcript text
+            transcript_segments: List of transcript segments with timestamps
+            title: Video title (optional but recommended)
+            summary: Video summary (optional but recommended)
+            
+        Returns:
+            Dictionary with parallel 'ids', 'documents' and 'metadatas' lists
+            plus the number of transcript chunks
+        """
+        document_ids = []
+        documents = []
+        metadatas = []
+        
+        # Add title as a searchable document (high priority)
+        if title and title.strip():
+            title_hash = self.content_hash(title)
+            document_ids.append(f"{video_id}_title_{title_hash}")
+            documents.append(title)
+            metadatas.append({
+                'video_id': video_id,
+                'chunk_index': -1,
+                'estimated_timestamp': 0.0,
+                'word_count': len(title.split()),
+                'chunk_type': 'title',
+                'content_hash': title_hash
+            })
+            print(f"Adding title for embedding: {title}", file=sys.stderr)
+        
+        # Add summary as a searchable document (high priority)
+        if summary and summary.strip():
+            summary_hash = self.content_hash(summary)
+            document_ids.append(f"{video_id}_summary_{summary_hash}")
+            documents.append(summary)
+            metadatas.append({
+                'video_id': video_id,
+                'chunk_index': -2,
+                'estimated_timestamp': 0.0,
+                'word_count': len(summary.split()),
+                'chunk_type': 'summary',
+                'content_hash': summary_hash
+            })
+            print(f"Adding summary for embedding", file=sys.stderr)
+        
+        # Chunk along segment boundaries so every chunk has exact times
+        chunks = self.chunk_segments(transcript_segments or [])
+        if not chunks and transcript_text.strip():
+            # No usable segments: fall back to word windows over the flat text
+            chunks = [
+                {'text': chunk, 'start': 0.0, 'end': 0.0, 'word_count': len(chunk.split())}
+                for chunk in self.chunk_text(transcript_text)
+            ]
+        print(f"Generated {len(chunks)} chunks for video {video_id}", file=sys.stderr)
+        
+        # Add transcript chunks
+        occurrences: Dict[str, int] = {}
+        for i, chunk in enumerate(chunks):
+            chunk_hash = self.content_hash(chunk['text'])
+            occurrence = occurrences.get(chunk_hash, 0)
+            occurrences[chunk_hash] = occurrence + 1
+            document_ids.append(self.create_document_id(video_id, chunk_hash, occurrence))
+            documents.append(chunk['text'])
+            metadatas.append({
+                'video_id': video_id,
+                'chunk_index': i,
+                # Kept under the old name: search results deep-link to it
+                'estimated_timestamp': chunk['start'],
+                'start_time': chunk['start'],
+                'end_time': chunk['end'],
+                'word_count': chunk['word_count'],
+                'chunk_type': 'transcript',
+                'content_hash': chunk_hash
+            })
+        
+        return {
+            'ids': document_ids,
+            'documents': documents,
+            'metadatas': metadatas,
+            'chunk_count': len(chunks)
+        }
+    
+    def get_max_write_batch(self) -> int:
+        """Largest number of records ChromaDB accepts in one add/upsert call."""
+        try:
+            return self.chroma_client.get_max_batch_size()
+        except Exception:
+            # Older chromadb releases don't expose the limit
+            return 5000
+    
+    def add_documents(self, ids: List[str], documents: List[str],
+                      metadatas: List[Dict[str, Any]], embeddings: List[List[float]]) -> None:
+        """Upsert documents into the collection, split to stay under Chroma's batch limit."""
+        max_batch = self.get_max_write_batch()
+        for start in range(0, len(ids), max_batch):
+            end = start + max_batch
+            self.collection.upsert(
+                ids=ids[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+                embeddings=embeddings[start:end]
+            )
+    
+    def sync_video_documents(self, video_ids: List[str], ids: List[str], documents: List[str],
+                             metadatas: List[Dict[str, Any]], encode_batch_size: Optional[int] = None,
+                             on_block: Optional[Callable[[int, int], None]] = None,
+                             write_block_size: int = WRITE_BLOCK_SIZE) -> Dict[str, int]:
+        """
+        Bring the stored documents of some videos in line with freshly prepared ones.
+        
+        Document IDs carry a content hash, so only documents whose ID is not
+        stored yet are encoded and upserted. Unchanged documents keep their
+        embedding and only get their metadata refreshed when it differs
+        (e.g. re-estimated timestamps), and stored documents that are no
+        longer produced are deleted afterwards, so the video stays
+        searchable throughout.
+        
+        Args:
+            video_ids: Videos the prepared documents belong to
+            ids: Prepared document IDs
+            documents: Prepared document texts
+            metadatas: Prepared document metadata
+            encode_batch_size: Texts per forward pass (defaults to EMBEDDING_BATCH_SIZE)
+            on_block: Called with (documents_written, documents_to_embed)
+                after each block of new documents is written
+            write_block_size: New documents encoded and written per block
+                (defaults to EMBEDDING_WRITE_BLOCK)
+            
+        Returns:
+            Counts of embedded, unchanged, metadata-updated and deleted documents
+        """
+        existing = self.collection.get(where={"video_id": {"$in": list(video_ids)}}, include=['metadatas'])
+        existing_metadata = dict(zip(existing['ids'], existing['metadatas']))
+        
+        new_positions = [i for i, doc_id in enumerate(ids) if doc_id not in existing_metadata]
+        changed_positions = [
+            i for i, doc_id in enumerate(ids)
+            if doc_id in existing_metadata and existing_metadata[doc_id] != metadatas[i]
+        ]
+        wanted = set(ids)
+        orphans = [doc_id for doc_id in existing_metadata if doc_id not in wanted]
+        
+        embedding_dimension = 0
+        new_documents = [documents[i] for i in new_positions]
+        for start, vectors in self.iter_embeddings(new_documents, encode_batch_size, write_block_size):
+            block = new_positions[start:start + len(vectors)]
+            embedding_dimension = vectors.shape[1]
+            self.add_documents(
+                [ids[i] for i in block],
+                [documents[i] for i in block],
+                [metadatas[i] for i in block],
+                # Python floats only for the block being written
+                vectors.tolist()
+            )
+            if on_block is not None:
+                on_block(start + len(block), len(new_positions))
+        
+        max_batch = self.get_max_write_batch()
+        for start in range(0, len(changed_positions), max_batch):
+            block = changed_positions[start:start + max_batch]
+            self.collection.update(ids=[ids[i] for i in block], metadatas=[metadatas[i] for i in block])
+        
+        for start in range(0, len(orphans), max_batch):
+            self.collection.delete(ids=orphans[start:start + max_batch])
+        
+        if new_positions or changed_positions or orphans:
+            # Searchers drop results cached before this write
+            bump_collection_version(self.collection.name, self.vector_store)
+        
+        return {
+            'embedded': len(new_positions),
+            'unchanged': len(ids) - len(new_positions),
+            'metadata_updated': len(changed_positions),
+            'deleted': len(orphans),
+            'embedding_dimension': embedding_dimension
+        }
     
     def store_video_embeddings(self, video_id: str, transcript_text: str, 
                              transcript_segments: List[Dict[str, Any]], 
-                             title: str = '', summary: str = '') -> Dict[str, Any]:
+                             title: str = '', summary: str = '',
+                             on_batch: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """
         Generate and store embeddings for a video's transcript, title, and summary.
         
+        Re-ingesting a video is incremental: only documents whose text changed
+        are encoded (see sync_video_documents). New documents are encoded and
+        written EMBEDDING_WRITE_BLOCK at a time, so only one block of vectors
+        is held in memory at once.
+        
         Args:
             video_id: YouTube video ID
             transcript_text: Full transcript text
             transcript_segments: List of transcript segments with timestamps
             title: Video title (optional but recommended)
             summary: Video summary (optional but recommended)
+            on_batch: Streaming callback, called with a progress record after
+                each block of new documents has been written
             
         Returns:
             Dictionary with storage results
         """
         try:
-            # Check if video already exists in the collection
-            existing_docs = self.collection.get(
-                where={"video_id": video_id}
-            )
-            
-            if existing_docs['ids']:
-                print(f"Video {video_id} already exists in ChromaDB, updating...", file=sys.stderr)
-                # Delete existing documents for this video
-                self.collection.delete(where={"video_id": video_id})
-            
             # Prepare data for ChromaDB
-            document_ids = []
-            documents = []
-            all_texts_to_embed = []
-            metadatas = []
-            
-            # Add title as a searchable document (high priority)
-            if title and title.strip():
-                doc_id = f"{video_id}_title"
-                document_ids.append(doc_id)
-                documents.append(title)
-                all_texts_to_embed.append(title)
-                metadatas.append({
-                    'video_id': video_id,
-                    'chunk_index': -1,
-                    'estimated_timestamp': 0.0,
-                    'word_count': len(title.split()),
-                    'chunk_type': 'title'
-                })
-                print(f"Adding title for embedding: {title}", file=sys.stderr)
-            
-            # Add summary as a searchable document (high priority)
-            if summary and summary.strip():
-                doc_id = f"{video_id}_summary"
-                document_ids.append(doc_id)
-                documents.append(summary)
-                all_texts_to_embed.append(summary)
-                metadatas.append({
-                    'video_id': video_id,
-                    'chunk_index': -2,
-                    'estimated_timestamp': 0.0,
-                    'word_count': len(summary.split()),
-                    'chunk_type': 'summary'
-                })
-                print(f"Adding summary for embedding", file=sys.stderr)
-            
-            # Create chunks from the full transcript
-            chunks = self.chunk_text(transcript_text)
+            prepared = self.prepare_video_documents(
+                video_id, transcript_text, transcript_segments, title=title, summary=summary
+            )
             
-            if not chunks:
+            if not prepared['chunk_count']:
                 return {
                     'success': False,
                     'error': 'No valid text chunks generated'
                 }
             
-            print(f"Generated {len(chunks)} chunks for video {video_id}", file=sys.stderr)
-            
-            # Add transcript chunks
-            for i, chunk in enumerate(chunks):
-                doc_id = self.create_document_id(video_id, i)
-                
-                # Calculate approximate timestamp for this chunk
-                words_per_chunk = len(chunk.split())
-                total_words = len(transcript_text.split())
-                progress = (i * words_per_chunk) / total_words
-                
-                # Estimate timestamp based on progress through transcript
-                total_duration = 0
-                if transcript_segments:
-                    last_segment = transcript_segments[-1]
-                    total_duration = last_segment['start'] + last_segment['duration']
-                
-                estimated_timestamp = progress * total_duration
-                
-                document_ids.append(doc_id)
-                documents.append(chunk)
-                all_texts_to_embed.append(chunk)
-                metadatas.append({
-                    'video_id': video_id,
-                    'chunk_index': i,
-                    'estimated_timestamp': round(estimated_timestamp, 2),
-                    'word_count': words_per_chunk,
-                    'chunk_type': 'transcript'
-                })
+            def on_block(documents_written: int, documents_to_embed: int) -> None:
+                if on_batch is not None:
+                    on_batch({
+                        'type': 'batch',
+                        'video_id': video_id,
+                        'documents_written': documents_written,
+                        'total_documents': documents_to_embed
+                    })
             
-            # Generate embeddings for all documents (title, summary, and transcript chunks)
-            print(f"Generating embeddings for {len(all_texts_to_embed)} documents...", file=sys.stderr)
-            embeddings = self.generate_embeddings(all_texts_to_embed)
-            
-            # Store in ChromaDB
-            print(f"Storing {len(document_ids)} documents in ChromaDB...", file=sys.stderr)
-            self.collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=document_ids,
-                embeddings=embeddings
+            # Embed and store only the title, summary and transcript chunks whose
+            # text is not stored yet
+            print(f"Syncing {len(prepared['ids'])} documents for video {video_id}...", file=sys.stderr)
+            sync = self.sync_video_documents(
+                [video_id], prepared['ids'], prepared['documents'], prepared['metadatas'],
+                on_block=on_block
             )
+            embedding_dimension = sync['embedding_dimension'] or self.embedding_model.get_sentence_embedding_dimension()
             
-            print("Embeddings stored successfully", file=sys.stderr)
+            print(f"Embeddings stored successfully ({sync['embedded']} new, "
+                  f"{sync['unchanged']} unchanged, {sync['deleted']} removed)", file=sys.stderr)
             
-            return {
+            result = {
                 'success': True,
                 'video_id': video_id,
-                'chunks_stored': len(chunks),
+                'chunks_stored': prepared['chunk_count'],
                 'title_included': bool(title),
                 'summary_included': bool(summary),
-                'total_documents': len(document_ids),
-                'embedding_dimension': len(embeddings[0]) if embeddings else 0,
+                'total_documents': len(prepared['ids']),
+                'documents_embedded': sync['embedded'],
+                'documents_unchanged': sync['unchanged'],
+                'documents_deleted': sync['deleted'],
+                'embedding_dimension': embedding_dimension,
                 'collection_size': self.collection.count()
             }
             
+            # Migration targets; a failure here leaves the video for the backfill
+            if self.dual_writers:
+                result['dual_write'] = {}
+                for writer in self.dual_writers:
+                    written = writer.store_video_embeddings(
+                        video_id, transcript_text, transcript_segments, title=title, summary=summary
+                    )
+                    result['dual_write'][writer.model_name] = (
+                        {'success': True, 'documents_embedded': written['documents_embedded']}
+                        if written['success'] else {'success': False, 'error': written['error']}
+                    )
+            
+            return result
+            
         except Exception as e:
             return {
                 'success': False,
                 'error': f'Failed to store embeddings: {str(e)}'
             }
     
+    def store_video_batch(self, payloads, videos_per_batch: int = 32,
+                          encode_batch_size: Optional[int] = None,
+                          write_block_size: int = WRITE_BLOCK_SIZE):
+        """
+        Store embeddings for many videos, encoding across videos in large batches.
+        
+        Videos are grouped videos_per_batch at a time: their new or changed
+        documents are encoded together and written to ChromaDB in bulk, so a
+        backfill pays for a single model load instead of one per video, and
+        re-running it only embeds what changed.
+        
+        Args:
+            payloads: Iterable of dicts in the 'store' format
+                ({video_id, transcript_text, transcript_segments, title, summary})
+            videos_per_batch: Number of videos encoded and written together
+            encode_batch_size: Texts per forward pass (defaults to EMBEDDING_BATCH_SIZE)
+            write_block_size: Documents encoded and written per block
+            
+        Yields:
+            One result dictionary per video, in input order
+        """
+        group = []
+        for payload in payloads:
+            group.append(payload)
+            if len(group) >= videos_per_batch:
+                yield from self._store_video_group(group, encode_batch_size, write_block_size)
+                group = []
+        if group:
+            yield from self._store_video_group(group, encode_batch_size, write_block_size)
+    
+    def _store_video_group(self, payloads: List[Dict[str, Any]], encode_batch_size: Optional[int],
+                           write_block_size: int = WRITE_BLOCK_SIZE):
+        results = []
+        prepared_videos = []
+        
+        # A video listed twice in one group would produce duplicate IDs; keep the last copy
+        last_index = {payload.get('video_id'): i for i, payload in enumerate(payloads) if isinstance(payload, dict)}
+        
+        for i, payload in enumerate(payloads):
+            if not isinstance(payload, dict):
+                results.append({
+                    'success': False,
+                    'video_id': None,
+                    'error': f'Invalid payload: expected an object, got {type(payload).__name__}'
+                })
+                continue
+            try:
+                if 'error' in payload:
+                    raise ValueError(payload['error'])
+                video_id = payload['video_id']
+                if last_index[video_id] != i:
+                    raise ValueError('Superseded by a later payload for the same video')
+                prepared = self.prepare_video_documents(
+                    video_id,
+                    payload['transcript_text'],
+                    payload['transcript_segments'],
+                    title=payload.get('title', ''),
+                    summary=payload.get('summary', '')
+                )
+                if not prepared['chunk_count']:
+                    raise ValueError('No valid text chunks generated')
+                prepared_videos.append(prepared)
+                results.append({
+                    'success': True,
+                    'video_id': video_id,
+                    'chunks_stored': prepared['chunk_count'],
+                    'title_included': bool(payload.get('title')),
+                    'summary_included': bool(payload.get('summary')),
+                    'total_documents': len(prepared['ids'])
+                })
+            except KeyError as e:
+                results.append({
+                    'success': False,
+                    'video_id': payload.get('video_id'),
+                    'error': f'Missing required field: {str(e)}'
+                })
+            except Exception as e:
+                results.append({
+                    'success': False,
+                    'video_id': payload.get('video_id'),
+                    'error': f'Failed to prepare video: {str(e)}'
+                })
+        
+        if prepared_videos:
+            ids, documents, metadatas = [], [], []
+            for prepared in prepared_videos:
+                ids.extend(prepared['ids'])
+                documents.extend(prepared['documents'])
+                metadatas.extend(prepared['metadatas'])
+            video_ids = [result['video_id'] for result in results if result['success']]
+            
+            try:
+                print(f"Syncing {len(documents)} documents for {len(video_ids)} videos...", file=sys.stderr)
+                sync = self.sync_video_documents(
+                    video_ids, ids, documents, metadatas, encode_batch_size=encode_batch_size,
+                    write_block_size=write_block_size
+                )
+                print(f"Encoded {sync['embedded']} new documents, {sync['unchanged']} unchanged, "
+                      f"{sync['deleted']} removed", file=sys.stderr)
+            except Exception as e:
+                error = f'Failed to store embeddings: {str(e)}'
+                results = [
+                    {'success': False, 'video_id': result['video_id'], 'error': error}
+                    if result['success'] else result
+                    for result in results
+                ]
+        
+        for writer in self.dual_writers:
+            failed = [
+                result for result in writer._store_video_group(payloads, encode_batch_size, write_block_size)
+                if not result['success']
+            ]
+            if failed:
+                print(f"Warning: dual-write to {writer.collection_name} failed for {len(failed)} videos "
+                      f"(backfill will copy them): {failed[0].get('error')}", file=sys.stderr)
+        
+        return results
+    
+    def create_staging_collection(self, name: Optional[str] = None):
+        """
+        Create an empty collection to rebuild `name` (this model's collection
+        by default) into, replacing any leftover from an interrupted rebuild.
+        """
+        name = name or self.collection_name
+        staging_name = f"{name}__rebuild"
+        try:
+            self.chroma_client.delete_collection(staging_name)
+        except Exception:
+            pass  # No leftover staging collection
+        return self.chroma_client.create_collection(name=staging_name, metadata=collection_metadata())
+    
+    def swap_collection(self, staging, name: Optional[str] = None) -> None:
+        """
+        Put a fully built staging collection in place of `name`.
+        
+        The live collection is renamed to a backup, the staging collection
+        takes its name and only then is the backup dropped. If the second
+        rename fails the backup is renamed back, so `name` always ends up
+        holding either the old or the new data.
+        """
+        name = name or self.collection_name
+        backup_name = f"{name}__previous"
+        try:
+            self.chroma_client.delete_collection(backup_name)
+        except Exception:
+            pass  # No backup left behind by an earlier swap
+        
+        try:
+            current = self.chroma_client.get_collection(name)
+        except Exception:
+            current = None
+        
+        staging_name = staging.name
+        if current is not None:
+            current.modify(name=backup_name)
+        try:
+            staging.modify(name=name)
+        except Exception:
+            if current is not None:
+                current.modify(name=name)
+            raise
+        if current is not None:
+            self.chroma_client.delete_collection(backup_name)
+        
+        self.collection = staging
+        bump_collection_version(name, self.vector_store)
+        # Writes during the build bumped the staging name, which is gone now
+        drop_collection_version(staging_name, self.vector_store)
+    
     def search_similar_videos(self, query: str, limit: int = 10) -> Dict[str, Any]:
         """
         Search for videos similar to the given query.
@@ -259,7 +790,7 @@ class EmbeddingGenerator:
             print(f"Searching for: '{query}' (limit: {limit})", file=sys.stderr)
             
             # Generate embedding for the query
-            query_embedding = self.embedding_model.encode([query], convert_to_tensor=False)[0].tolist()
+            query_embedding = self.generate_embeddings([query])[0]
             
             # Search in ChromaDB
             results = self.collection.query(
@@ -277,6 +808,7 @@ class EmbeddingGenerator:
                 }
             
             # Process results and group by video_id
+            space = get_collection_space(self.collection)
             video_scores = {}
             for doc, metadata, distance in zip(
                 results['documents'][0], 
@@ -284,7 +816,7 @@ class EmbeddingGenerator:
                 results['distances'][0]
             ):
                 video_id = metadata['video_id']
-                similarity_score = 1 - distance  # Convert distance to similarity
+                similarity_score = distance_to_similarity(distance, space)
                 
                 # Keep the best score for each video
                 if video_id not in video_scores or similarity_score > video_scores[video_id]['similarity_score']:
@@ -315,6 +847,228 @@ class EmbeddingGenerator:
                 'error': f'Search failed: {str(e)}'
             }
 
+def iter_video_payloads(source: str):
+    """
+    Read 'store' payloads from a JSONL file or a directory of JSON files.
+    
+    Payloads are read lazily so very large exports are never fully in memory.
+    Lines or files that are not valid UTF-8, fail to parse or do not hold a
+    JSON object are yielded as {'error': ...} entries, so they are reported
+    as failed videos instead of aborting the batch.
+    """
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(source, name), 'r', encoding='utf-8') as f:
+                    yield _checked_payload(json.load(f), name)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                yield {'video_id': name, 'error': f'Invalid JSON input: {str(e)}'}
+        return
+    
+    # Lines are decoded one at a time so a bad byte only fails its own line
+    with open(source, 'rb') as f:
+        for line_number, raw_line in enumerate(f, start=1):
+            label = f'line {line_number}'
+            try:
+                line = raw_line.decode('utf-8').strip()
+                if not line:
+                    continue
+                yield _checked_payload(json.loads(line), label)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                yield {'video_id': label, 'error': f'Invalid JSON input: {str(e)}'}
+
+def _checked_payload(payload: Any, label: str) -> Dict[str, Any]:
+    """A parsed payload, or an {'error': ...} entry when it is not a JSON object."""
+    if not isinstance(payload, dict):
+        return {'video_id': label, 'error': f'Invalid payload: expected an object, got {type(payload).__name__}'}
+    return payload
+
+def run_store_batch(embedder: EmbeddingGenerator, source: str, videos_per_batch: int) -> Dict[str, Any]:
+    """Stream one NDJSON result line per video to stdout and return a summary."""
+    started = time.perf_counter()
+    succeeded = 0
+    failed = 0
+    documents = 0
+    
+    for video_result in embedder.store_video_batch(iter_video_payloads(source), videos_per_batch):
+        print(json.dumps(video_result, ensure_ascii=False), flush=True)
+        if video_result['success']:
+            succeeded += 1
+            documents += video_result['total_documents']
+        else:
+            failed += 1
+    
+    return {
+        'success': failed == 0,
+        'event': 'summary',
+        'videos_processed': succeeded + failed,
+        'videos_succeeded': succeeded,
+        'videos_failed': failed,
+        'documents_stored': documents,
+        'elapsed_seconds': round(time.perf_counter() - started, 2),
+        'collection_size': embedder.collection.count()
+    }
+
+def run_rebuild(embedder: EmbeddingGenerator, source: str, videos_per_batch: int,
+                allow_failures: bool = False) -> Dict[str, Any]:
+    """
+    Rebuild the active model's collection from a JSONL export (or a
+    directory of JSON payloads) and swap it in when done.
+    
+    Videos are written into a fresh staging collection with upserts sized to
+    Chroma's max batch, one NDJSON result line per video. Searches keep using
+    the old collection until the swap. The swap is skipped (and the staging
+    collection dropped) if any video failed, unless allow_failures is set.
+    """
+    started = time.perf_counter()
+    live_collection = embedder.collection
+    staging = embedder.create_staging_collection()
+    print(f"Rebuilding into staging collection {staging.name}...", file=sys.stderr)
+    
+    succeeded = 0
+    failed = 0
+    documents = 0
+    embedder.collection = staging
+    # Only this model's collection is rebuilt; dual-write targets are left alone
+    dual_writers, embedder.dual_writers = embedder.dual_writers, []
+    # Offline job: write as much per upsert as Chroma accepts
+    write_block_size = embedder.get_max_write_batch()
+    try:
+        for video_result in embedder.store_video_batch(iter_video_payloads(source), videos_per_batch,
+                                                       write_block_size=write_block_size):
+            print(json.dumps(video_result, ensure_ascii=False), flush=True)
+            if video_result['success']:
+                succeeded += 1
+                documents += video_result['total_documents']
+            else:
+                failed += 1
+    except Exception:
+        embedder.collection = live_collection
+        embedder.chroma_client.delete_collection(staging.name)
+        raise
+    finally:
+        embedder.dual_writers = dual_writers
+    
+    swapped = succeeded > 0 and (failed == 0 or allow_failures)
+    if swapped:
+        embedder.swap_collection(staging)
+    else:
+        embedder.collection = live_collection
+        embedder.chroma_client.delete_collection(staging.name)
+        print("Rebuild not swapped in: " + ("some videos failed (use --allow-failures)" if succeeded
+              else "no videos were stored"), file=sys.stderr)
+    
+    return {
+        'success': swapped,
+        'event': 'summary',
+        'swapped': swapped,
+        'videos_processed': succeeded + failed,
+        'videos_succeeded': succeeded,
+        'videos_failed': failed,
+        'documents_stored': documents,
+        'elapsed_seconds': round(time.perf_counter() - started, 2),
+        'collection_size': embedder.collection.count()
+    }
+
+def run_backfill(embedder: EmbeddingGenerator, source_collection, videos_per_batch: int = 32) -> Dict[str, Any]:
+    """
+    Copy every video of another model's collection into this model's collection.
+    
+    Stored titles, summaries and transcript chunks are re-encoded with the
+    embedder's model videos_per_batch videos at a time, keeping their text
+    and metadata, so no transcript export is needed. Chunks keep the size
+    they were cut to for the old model; `rebuild` from an export re-chunks
+    for the new one. Copied documents are marked with 'backfilled_from'.
+    Videos that ingest has already dual-written to the target collection
+    (documents without that mark) are skipped, so their fresh chunks are
+    not replaced by the old model's. Other videos go through
+    sync_video_documents, so an interrupted backfill resumes where it
+    stopped: documents already in the target collection are not encoded
+    again. One NDJSON progress line is printed per batch.
+    """
+    started = time.perf_counter()
+    
+    video_ids = []
+    seen = set()
+    page_size = 5000
+    offset = 0
+    while True:
+        page = source_collection.get(limit=page_size, offset=offset, include=['metadatas'])
+        if not page['ids']:
+            break
+        for metadata in page['metadatas']:
+            video_id = metadata.get('video_id')
+            if video_id and video_id not in seen:
+                seen.add(video_id)
+                video_ids.append(video_id)
+        offset += len(page['ids'])
+    print(f"Backfilling {len(video_ids)} videos from {source_collection.name} into "
+          f"{embedder.collection_name}...", file=sys.stderr)
+    
+    embedded = 0
+    unchanged = 0
+    skipped = 0
+    # Offline job: write as much per upsert as the store accepts
+    write_block_size = embedder.get_max_write_batch()
+    for start in range(0, len(video_ids), videos_per_batch):
+        group = video_ids[start:start + videos_per_batch]
+        
+        # Already stored by ingest with the new model's own chunking: leave them alone
+        target = embedder.collection.get(where={"video_id": {"$in": group}}, include=['metadatas'])
+        ingested = {metadata['video_id'] for metadata in target['metadatas'] if 'backfilled_from' not in metadata}
+        skipped += len(ingested)
+        group = [video_id for video_id in group if video_id not in ingested]
+        
+        sync = {'embedded': 0, 'unchanged': 0}
+        if group:
+            stored = source_collection.get(where={"video_id": {"$in": group}}, include=['documents', 'metadatas'])
+            
+            # Keyed by the new ID: duplicates left in the source collapse into one document.
+            # Repeated text is numbered in chunk order, as prepare_video_documents does.
+            prepared = {}
+            occurrences: Dict[Any, Dict[int, int]] = {}
+            for document, metadata in sorted(zip(stored['documents'], stored['metadatas']),
+                                             key=lambda item: (item[1]['video_id'], item[1].get('chunk_index', 0))):
+                content_hash = embedder.content_hash(document)
+                chunk_key = (metadata['video_id'], metadata.get('chunk_type'), content_hash)
+                chunk_positions = occurrences.setdefault(chunk_key, {})
+                occurrence = chunk_positions.setdefault(metadata.get('chunk_index', 0), len(chunk_positions))
+                document_id = embedder.document_id_for(metadata['video_id'], metadata, content_hash, occurrence)
+                prepared[document_id] = (document, {
+                    **metadata, 'content_hash': content_hash, 'backfilled_from': source_collection.name
+                })
+            
+            sync = embedder.sync_video_documents(
+                group, list(prepared), [document for document, _ in prepared.values()],
+                [metadata for _, metadata in prepared.values()], write_block_size=write_block_size
+            )
+        embedded += sync['embedded']
+        unchanged += sync['unchanged']
+        print(json.dumps({
+            'event': 'batch',
+            'videos_done': min(start + videos_per_batch, len(video_ids)),
+            'videos_total': len(video_ids),
+            'videos_skipped': skipped,
+            'documents_embedded': sync['embedded'],
+            'documents_unchanged': sync['unchanged']
+        }), flush=True)
+    
+    return {
+        'success': True,
+        'event': 'summary',
+        'model': embedder.model_name,
+        'collection': embedder.collection_name,
+        'source_collection': source_collection.name,
+        'videos': len(video_ids),
+        'videos_skipped': skipped,
+        'documents_embedded': embedded,
+        'documents_unchanged': unchanged,
+        'elapsed_seconds': round(time.perf_counter() - started, 2),
+        'collection_size': embedder.collection.count()
+    }
+
 def main():
     """Main function to handle command line execution."""
     if len(sys.argv) < 2:
@@ -324,10 +1078,23 @@ def main():
         }))
         sys.exit(1)
     
+    # --stream: NDJSON progress records per written block, then a summary record
+    stream = '--stream' in sys.argv
+    # --allow-failures: rebuild swaps the new collection in even if some videos failed
+    allow_failures = '--allow-failures' in sys.argv
+    sys.argv = [arg for arg in sys.argv if arg not in ('--stream', '--allow-failures')]
+    
     command = sys.argv[1]
     
+    def print_record(record: Dict[str, Any]) -> None:
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+    
     try:
-        embedder = EmbeddingGenerator()
+        if command == "backfill" and len(sys.argv) in (3, 4):
+            # Only the migration target's model is needed, and it must not dual-write
+            embedder = EmbeddingGenerator(model_name=sys.argv[2], dual_write=False)
+        else:
+            embedder = EmbeddingGenerator()
         
         if command == "store" and len(sys.argv) == 3:
             # Store embeddings: data_file_path
@@ -347,9 +1114,28 @@ def main():
                 transcript_text, 
                 transcript_segments,
                 title=title,
-                summary=summary
+                summary=summary,
+                on_batch=print_record if stream else None
             )
             
+        elif command == "store-batch" and len(sys.argv) in (3, 4):
+            # Store many videos: JSONL file or directory of JSON payloads, [videos_per_batch]
+            videos_per_batch = int(sys.argv[3]) if len(sys.argv) == 4 else 32
+            result = run_store_batch(embedder, sys.argv[2], videos_per_batch)
+            
+        elif command == "rebuild" and len(sys.argv) in (3, 4):
+            # Rebuild the whole collection: JSONL export or directory, [videos_per_batch]
+            videos_per_batch = int(sys.argv[3]) if len(sys.argv) == 4 else 32
+            result = run_rebuild(embedder, sys.argv[2], videos_per_batch, allow_failures)
+            
+        elif command == "backfill" and len(sys.argv) in (3, 4):
+            # Copy the active model's videos into a registered model: model, [videos_per_batch]
+            source_name = get_active_model()['collection']
+            if source_name == embedder.collection_name:
+                raise ValueError(f"{embedder.model_name} is the active model; backfill another model from it")
+            videos_per_batch = int(sys.argv[3]) if len(sys.argv) == 4 else 32
+            result = run_backfill(embedder, embedder.chroma_client.get_collection(source_name), videos_per_batch)
+            
         elif command == "search" and len(sys.argv) == 4:
             # Search: query, limit
             query = sys.argv[2]
@@ -360,10 +1146,16 @@ def main():
         else:
             result = {
                 'success': False,
-                'error': 'Invalid command. Use "store" or "search".'
+                'error': 'Invalid command. Use "store", "store-batch", "rebuild", "backfill" or "search".'
             }
         
-        print(json.dumps(result, ensure_ascii=False, indent=2))
+        if stream:
+            print_record({'type': 'summary', **result})
+        elif command in ("store-batch", "rebuild", "backfill"):
+            # Keep the summary on one line so the whole output stays NDJSON
+            print(json.dumps(result, ensure_ascii=False))
+        else:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
         
         # Exit with appropriate code
         sys.exit(0 if result['success'] else 1)
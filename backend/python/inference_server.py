@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Local Inference Service with Query Micro-Batching
+
+Small asyncio HTTP server exposing the embedding model over localhost:
+
+    POST /search  {"query": "...", "limit": 10}   -> same JSON as semantic_search.py
+    POST /embed   {"texts": ["...", "..."]}       -> {"success": true, "embeddings": [...]}
+    POST /sentiment {"transcript_segments": [...]} -> same JSON as sentiment_analyzer.py
+    GET  /health                                  -> batching and memory statistics
+
+Concurrent requests are not encoded one by one. Texts are queued and
+collected for up to BATCH_WINDOW_MS milliseconds (or until BATCH_MAX_SIZE
+texts are waiting) and then encoded in a single batched forward pass.
+
+With --workers N (POSIX only) the server runs in pre-fork mode: the parent
+loads both models once, moves their weights into shared memory and forks N
+workers that accept connections on the same listening socket. Workers share
+the weight pages, so each extra worker adds little resident memory.
+"""
+
+import sys
+import json
+import os
+import time
+import asyncio
+import argparse
+import socket
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+# Suppress TensorFlow warnings before importing anything else
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+
+import warnings
+warnings.filterwarnings('ignore')
+
+# Pre-fork supervision: a worker exiting within WORKER_RAPID_EXIT_SECONDS of
+# being forked counts as a crash. Respawns after consecutive crashes back off
+# exponentially, and the parent gives up after WORKER_MAX_RAPID_FAILURES.
+WORKER_RAPID_EXIT_SECONDS = 10.0
+WORKER_RESPAWN_BASE_DELAY = 0.5
+WORKER_RESPAWN_MAX_DELAY = 30.0
+WORKER_MAX_RAPID_FAILURES = 5
+
+HTTP_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error'
+}
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class MicroBatcher:
+    def __init__(self, encode_fn: Callable[[List[str]], List[List[float]]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """
+        Collect texts submitted concurrently and encode them together.
+
+        Args:
+            encode_fn: Blocking function mapping a list of texts to vectors
+            max_batch_size: Flush as soon as this many texts are waiting
+            max_wait_ms: Longest time the first text of a batch waits for company
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue: Optional[asyncio.Queue] = None
+        # The model is not safe to call from several threads at once
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='encode')
+        self.batches_run = 0
+        self.texts_encoded = 0
+
+    def start(self) -> None:
+        self.queue = asyncio.Queue()
+        asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, text: str) -> List[float]:
+        """Queue a text for encoding and wait for its vector."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for one item, then gather more until the window closes or the batch is full."""
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await loop.run_in_executor(self.executor, self.encode_fn, texts)
+                for (_, future), vector in zip(batch, vectors):
+                    if not future.done():
+                        future.set_result(vector)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            self.batches_run += 1
+            self.texts_encoded += len(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'batches_run': self.batches_run,
+            'texts_encoded': self.texts_encoded,
+            'average_batch_size': round(self.texts_encoded / self.batches_run, 2) if self.batches_run else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'window_ms': self.max_wait * 1000.0
+        }
+
+
+def memory_usage() -> Dict[str, float]:
+    """Resident and shared memory of this process in MB (Linux only)."""
+    usage = {}
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'RssAnon', 'RssFile', 'RssShmem'):
+                    usage[key] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return usage
+
+
+class InferenceServer:
+    def __init__(self, max_batch_size: int, window_ms: float,
+                 embedding_model=None, sentiment_pipeline=None):
+        from embedding_generator import EmbeddingGenerator
+        from semantic_search import SemanticSearcher
+
+        # Search only: no dual-write generators, which would each load another model
+        self.embedder = EmbeddingGenerator(embedding_model=embedding_model, dual_write=False)
+        # One vector store client per process: Chroma rejects a second one on
+        # the same path with different Settings
+        self.searcher = SemanticSearcher(embedding_model=self.embedder.embedding_model,
+                                         chroma_client=self.embedder.chroma_client)
+        self.batcher = MicroBatcher(self.searcher.encode_queries, max_batch_size, window_ms)
+        self.sentiment_pipeline = sentiment_pipeline
+        self._sentiment_analyzer = None
+        self.sentiment_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sentiment')
+        self.requests_served = 0
+
+    @property
+    def sentiment_analyzer(self):
+        """Loaded on the first /sentiment request unless a shared pipeline was given."""
+        if self._sentiment_analyzer is None:
+            from sentiment_analyzer import SentimentAnalyzer
+            self._sentiment_analyzer = SentimentAnalyzer(sentiment_pipeline=self.sentiment_pipeline)
+        return self._sentiment_analyzer
+
+    async def handle_search(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        query = body.get('query', '')
+        if not isinstance(query, str) or not query.strip():
+            return 400, {'success': False, 'error': 'Empty search query provided'}
+
+        try:
+            limit = int(body.get('limit', 10))
+            if limit < 1 or limit > 50:
+                raise ValueError("Limit must be between 1 and 50")
+        except (TypeError, ValueError) as e:
+            return 400, {'success': False, 'error': f'Invalid limit parameter: {str(e)}'}
+
+        loop = asyncio.get_running_loop()
+        if self.searcher.collection is None:
+            # Videos may have been stored since the server started
+            await loop.run_in_executor(None, self.searcher.connect_collection)
+
+        # Warm repeats skip the encoder and the collection entirely
+        cached = self.searcher.cached_search(query, limit)
+        if cached is not None:
+            return 200, cached
+
+        query_embedding = await self.batcher.submit(query)
+        result = await loop.run_in_executor(
+            None, lambda: self.searcher.search(query, limit, query_embedding=query_embedding)
+        )
+        return (200 if result['success'] else 500), result
+
+    async def handle_embed(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        texts = body.get('texts')
+        if texts is None and 'text' in body:
+            texts = [body['text']]
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+            return 400, {'success': False, 'error': '"texts" must be a non-empty list of strings'}
+
+        # Submit texts individually so they share batches with other requests
+        embeddings = await asyncio.gather(*(self.batcher.submit(text) for text in texts))
+        return 200, {
+            'success': True,
+            'embeddings': embeddings,
+            'model': self.embedder.model_name,
+            'embedding_dimension': len(embeddings[0])
+        }
+
+    async def handle_sentiment(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        transcript_segments = body.get('transcript_segments')
+        if not isinstance(transcript_segments, list) or not transcript_segments:
+            return 400, {'success': False, 'error': 'No transcript segments provided'}
+
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            self.sentiment_executor,
+            lambda: self.sentiment_analyzer.analyze_transcript(transcript_segments)
+        )
+        return (200 if result['success'] else 500), result
+
+    async def route(self, method: str, path: str, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        if path == '/health':
+            return 200, {
+                'success': True,
+                'pid': os.getpid(),
+                'requests_served': self.requests_served,
+                'batching': self.batcher.stats(),
+                'memory_mb': memory_usage()
+            }
+
+        routes = {
+            '/search': self.handle_search,
+            '/embed': self.handle_embed,
+            '/sentiment': self.handle_sentiment
+        }
+        handler = routes.get(path)
+        if handler is None:
+            return 404, {'success': False, 'error': f'Unknown endpoint: {path}'}
+        if method != 'POST':
+            return 405, {'success': False, 'error': f'{path} only accepts POST'}
+        return await handler(body)
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """Parse one HTTP/1.1 request; returns None when the client closed the connection."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise ValueError('Malformed request line')
+        method, target, _ = parts
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', '0') or 0)
+        if length > MAX_BODY_BYTES:
+            raise OverflowError('Request body too large')
+        body = await reader.readexactly(length) if length else b''
+
+        return method.upper(), target.split('?', 1)[0], headers, body
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, raw_body = request
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+
+                    body = json.loads(raw_body.decode('utf-8')) if raw_body else {}
+                    if not isinstance(body, dict):
+                        raise ValueError('Request body must be a JSON object')
+                    status, response = await self.route(method, path, body)
+                except OverflowError as e:
+                    status, response = 413, {'success': False, 'error': str(e)}
+                except (ValueError, json.JSONDecodeError) as e:
+                    status, response = 400, {'success': False, 'error': f'Invalid request: {str(e)}'}
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as e:
+                    status, response = 500, {'success': False, 'error': f'Unexpected error: {str(e)}'}
+
+                self.requests_served += 1
+                payload = json.dumps(response, ensure_ascii=False).encode('utf-8')
+                writer.write(
+                    f'HTTP/1.1 {status} {HTTP_REASONS.get(status, "")}\r\n'
+                    f'Content-Type: application/json; charset=utf-8\r\n'
+                    f'Content-Length: {len(payload)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1')
+                    + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int, sock: Optional[socket.socket] = None) -> None:
+        """
+        Accept connections until cancelled.
+
+        Args:
+            host: Interface to bind (ignored when sock is given)
+            port: Port to bind (ignored when sock is given)
+            sock: Already bound listening socket inherited from a pre-fork parent
+        """
+        self.batcher.start()
+        if sock is not None:
+            server = await asyncio.start_server(self.handle_connection, sock=sock)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Inference server {os.getpid()} listening on http://{host}:{port} "
+              f"(batch window {self.batcher.max_wait * 1000:.1f}ms, "
+              f"max batch {self.batcher.max_batch_size})", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+def load_shared_models() -> Tuple[Any, Any]:
+    """
+    Load the embedding model and sentiment pipeline in the pre-fork parent.
+
+    Weights are moved into shared memory and the modules switched to eval
+    mode, so forked workers read the same physical pages instead of each
+    holding a private copy.
+    """
+    import torch
+    from embedding_generator import EMBEDDING_MODEL_NAME
+    from sentiment_analyzer import SentimentAnalyzer
+    from model_backends import load_embedding_model
+
+    print("Loading shared models in pre-fork parent...", file=sys.stderr)
+    embedding_model = load_embedding_model(EMBEDDING_MODEL_NAME)
+    sentiment_pipeline = SentimentAnalyzer().sentiment_pipeline
+
+    torch.set_grad_enabled(False)
+    for module in (embedding_model, sentiment_pipeline.model):
+        # ONNX Runtime sessions are not torch modules; fork still shares them copy-on-write
+        if isinstance(module, torch.nn.Module):
+            module.eval()
+            module.share_memory()
+
+    return embedding_model, sentiment_pipeline
+
+
+def run_worker(sock: socket.socket, args: argparse.Namespace, embedding_model, sentiment_pipeline) -> None:
+    """Body of a forked worker: build per-process clients and serve on the shared socket."""
+    import torch
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Workers split the cores between them instead of each using all of them
+    torch.set_num_threads(args.threads_per_worker)
+
+    # ChromaDB's SQLite connections are created here, after the fork
+    server = InferenceServer(args.max_batch, args.window_ms,
+                             embedding_model=embedding_model,
+                             sentiment_pipeline=sentiment_pipeline)
+    asyncio.run(server.serve(args.host, args.port, sock=sock))
+
+
+def run_prefork(args: argparse.Namespace) -> None:
+    """Load models once, then fork and supervise args.workers worker processes."""
+    import gc
+
+    embedding_model, sentiment_pipeline = load_shared_models()
+
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+    sock.setblocking(False)
+
+    # Move everything allocated so far out of the garbage collector's reach so
+    # collections in the workers don't touch (and copy) the parent's pages
+    gc.collect()
+    gc.freeze()
+
+    # pid -> time the worker was forked
+    children = {}
+    shutting_down = False
+    rapid_failures = 0
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                run_worker(sock, args, embedding_model, sentiment_pipeline)
+            except BaseException as e:
+                print(f"Worker {os.getpid()} exited: {str(e)}", file=sys.stderr)
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame) -> None:
+        nonlocal shutting_down
+        shutting_down = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        spawn()
+    print(f"Pre-fork parent {os.getpid()} started {args.workers} workers "
+          f"on http://{args.host}:{args.port}", file=sys.stderr)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started_at = children.pop(pid, None)
+        if shutting_down:
+            continue
+
+        if started_at is not None and time.monotonic() - started_at < WORKER_RAPID_EXIT_SECONDS:
+            rapid_failures += 1
+        else:
+            rapid_failures = 0
+        if rapid_failures >= WORKER_MAX_RAPID_FAILURES:
+            # A startup failure every worker hits: stop instead of fork-looping
+            stop(signal.SIGTERM, None)
+            for child in list(children):
+                try:
+                    os.waitpid(child, 0)
+                except ChildProcessError:
+                    pass
+            sock.close()
+            raise Exception(f"Workers crashed {rapid_failures} times in a row within "
+                            f"{WORKER_RAPID_EXIT_SECONDS:g}s of starting (last status {status}); giving up")
+
+        delay = 0.0
+        if rapid_failures:
+            delay = min(WORKER_RESPAWN_MAX_DELAY, WORKER_RESPAWN_BASE_DELAY * 2 ** (rapid_failures - 1))
+        print(f"Worker {pid} died (status {status}), restarting in {delay:g}s", file=sys.stderr)
+        if delay:
+            time.sleep(delay)
+        if not shutting_down:
+            spawn()
+
+    sock.close()
+
+
+def main():
+    """Main function to handle command line execution."""
+    parser = argparse.ArgumentParser(description='VidSense local inference service')
+    parser.add_argument('--host', default=os.getenv('INFERENCE_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('INFERENCE_PORT', '8765')))
+    parser.add_argument('--window-ms', type=float, default=float(os.getenv('BATCH_WINDOW_MS', '5')),
+                        help='How long to wait for more queries before encoding a batch')
+    parser.add_argument('--max-batch', type=int, default=int(os.getenv('BATCH_MAX_SIZE', '32')),
+                        help='Encode immediately once this many queries are waiting')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('INFERENCE_WORKERS', '0')),
+                        help='Pre-fork this many workers sharing one copy of the models (0 = single process)')
+    parser.add_argument('--threads-per-worker', type=int, default=0,
+                        help='torch threads per pre-forked worker (default: cores / workers)')
+    args = parser.parse_args()
+
+    if args.workers > 0:
+        if not hasattr(os, 'fork'):
+            print(json.dumps({
+                'success': False,
+                'error': 'Pre-fork mode requires a POSIX system (os.fork is unavailable)'
+            }))
+            sys.exit(1)
+        if args.threads_per_worker <= 0:
+            args.threads_per_worker = max(1, (os.cpu_count() or 1) // args.workers)
+
+        try:
+            run_prefork(args)
+        except Exception as e:
+            print(json.dumps({
+                'success': False,
+                'error': f'Failed to start pre-fork server: {str(e)}'
+            }))
+            sys.exit(1)
+        return
+
+    try:
+        server = InferenceServer(args.max_batch, args.window_ms)
+    except Exception as e:
+        print(json.dumps({
+            'success': False,
+            'error': f'Failed to start inference server: {str(e)}'
+        }))
+        sys.exit(1)
+
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Inference Backends for the Embedding and Sentiment Models
+
+Selects how the SentenceTransformer embedder and the DistilBERT sentiment
+pipeline are executed on CPU:
+
+    torch  - float32 PyTorch (default, reference behaviour)
+    int8   - PyTorch with nn.Linear layers dynamically quantized to int8
+    onnx   - exported ONNX graph run by ONNX Runtime (needs optimum[onnxruntime])
+
+The backend is chosen with the INFERENCE_BACKEND environment variable or the
+`backend` constructor argument of EmbeddingGenerator, SemanticSearcher and
+SentimentAnalyzer. Run `python model_backends.py parity <backend>` to compare
+a backend against the float32 reference before switching production to it.
+"""
+
+import sys
+import json
+import os
+import time
+from typing import List, Dict, Any, Optional
+from model_store import resolve_model, is_strict_offline, enable_offline_mode
+
+# huggingface_hub and transformers read the offline flags when first imported,
+# so strict offline mode has to be switched on before any loader below runs
+if is_strict_offline():
+    enable_offline_mode()
+
+BACKENDS = ('torch', 'int8', 'onnx')
+
+# Reference texts for the parity check: a mix of clear, mixed and neutral sentiment
+PARITY_TEXTS = [
+    "This tutorial was incredibly helpful, thank you so much!",
+    "I really hated how confusing the second half of the video was.",
+    "Today we are going to look at how neural networks learn.",
+    "The battery life is okay but the screen is disappointing.",
+    "Thanks for watching and don't forget to subscribe.",
+    "This is the worst explanation of recursion I have ever seen.",
+    "Let's move on to the next section.",
+    "Absolutely brilliant performance, the crowd loved every minute.",
+    "I'm not sure this approach will scale to larger datasets.",
+    "The recipe turned out delicious and was easy to follow.",
+    "Prices went up again and customers are frustrated.",
+    "Here is the code for the sorting algorithm.",
+]
+
+
+def get_backend(backend: Optional[str] = None) -> str:
+    """
+    Resolve the backend name from an explicit argument or INFERENCE_BACKEND.
+
+    Raises:
+        ValueError: If the name is not one of BACKENDS
+    """
+    name = (backend or os.getenv('INFERENCE_BACKEND', 'torch')).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Use one of: {', '.join(BACKENDS)}")
+    return name
+
+
+def get_embedding_precision() -> str:
+    """
+    EMBEDDING_PRECISION, read when a model is loaded so .env values apply.
+
+    float16 runs the torch embedding model in half precision (CUDA only).
+    """
+    return os.getenv('EMBEDDING_PRECISION', 'float32').strip().lower()
+
+
+def _quantize_int8(module):
+    """Dynamically quantize every nn.Linear of a module to int8 weights."""
+    import torch
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _local_files_only(model_name: str) -> bool:
+    """
+    Whether a resolved model must load without contacting the hub.
+
+    Set for models served from the local store (and in strict offline mode),
+    so this holds even when transformers was imported before the offline
+    environment variables were set.
+    """
+    return os.path.isdir(model_name) or is_strict_offline()
+
+
+def _load_classifier(model_name: str):
+    """Sequence classification model and tokenizer for a sentiment pipeline."""
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    local_only = _local_files_only(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, local_files_only=local_only)
+    tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=local_only)
+    return model, tokenizer
+
+
+def load_embedding_model(model_name: str, backend: Optional[str] = None):
+    """
+    Load a SentenceTransformer with the requested backend.
+
+    Args:
+        model_name: Hugging Face model name or local path; resolved through
+            the local model store first
+        backend: 'torch', 'int8' or 'onnx' (defaults to INFERENCE_BACKEND)
+
+    Returns:
+        Object exposing SentenceTransformer.encode
+    """
+    # Repeated here for MODEL_STORE_OFFLINE values loaded from .env after import
+    if is_strict_offline():
+        enable_offline_mode()
+    from sentence_transformers import SentenceTransformer
+
+    backend = get_backend(backend)
+    # Prefer the local safetensors copy from model_store.py when present
+    model_name = resolve_model(model_name)
+    local_only = _local_files_only(model_name)
+    if backend == 'onnx':
+        try:
+            # Native ONNX support arrived in sentence-transformers 3.2
+            return SentenceTransformer(model_name, backend='onnx', local_files_only=local_only)
+        except TypeError:
+            raise Exception("ONNX backend requires sentence-transformers>=3.2")
+        except ImportError as e:
+            raise Exception(f"ONNX backend requires optimum[onnxruntime]: {str(e)}")
+
+    if backend == 'int8':
+        model = SentenceTransformer(model_name, device='cpu', local_files_only=local_only)
+        return _quantize_int8(model)
+
+    model = SentenceTransformer(model_name, local_files_only=local_only)
+    if get_embedding_precision() == 'float16':
+        if model.device.type == 'cuda':
+            model.half()
+        else:
+            print("Warning: EMBEDDING_PRECISION=float16 needs a CUDA device, using float32", file=sys.stderr)
+    return model
+
+
+def load_sentiment_pipeline(model_name: str, backend: Optional[str] = None, device: int = -1):
+    """
+    Build a Hugging Face sentiment-analysis pipeline with the requested backend.
+
+    Args:
+        model_name: Hugging Face model name or local path
+        backend: 'torch', 'int8' or 'onnx' (defaults to INFERENCE_BACKEND)
+        device: Pipeline device index; quantized backends always run on CPU
+
+    Returns:
+        transformers Pipeline
+    """
+    if is_strict_offline():
+        enable_offline_mode()
+    from transformers import pipeline, AutoTokenizer
+
+    backend = get_backend(backend)
+    model_name = resolve_model(model_name)
+    if backend == 'onnx':
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+        except ImportError as e:
+            raise Exception(f"ONNX backend requires optimum[onnxruntime]: {str(e)}")
+        local_only = _local_files_only(model_name)
+        model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True, local_files_only=local_only)
+        tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=local_only)
+        return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+    model, tokenizer = _load_classifier(model_name)
+    if backend == 'int8':
+        sentiment_pipeline = pipeline("sentiment-analysis", model=model, tokenizer=tokenizer, device=-1)
+        sentiment_pipeline.model = _quantize_int8(sentiment_pipeline.model)
+        return sentiment_pipeline
+
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer, device=device)
+
+
+def _time_call(fn, repeats: int = 3) -> float:
+    """Best-of-N wall time in milliseconds."""
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 2)
+
+
+def parity_check(backend: str, texts: List[str]) -> Dict[str, Any]:
+    """
+    Compare a backend's embeddings and sentiment output with the torch reference.
+
+    Args:
+        backend: Candidate backend ('int8' or 'onnx')
+        texts: Texts to embed and classify
+
+    Returns:
+        Dictionary with similarity/agreement metrics, timings and a pass flag
+    """
+    import numpy as np
+    from embedding_generator import EMBEDDING_MODEL_NAME
+    from sentiment_analyzer import SENTIMENT_MODEL_NAME
+
+    backend = get_backend(backend)
+
+    reference_embedder = load_embedding_model(EMBEDDING_MODEL_NAME, 'torch')
+    candidate_embedder = load_embedding_model(EMBEDDING_MODEL_NAME, backend)
+    reference_vectors = np.asarray(reference_embedder.encode(texts, normalize_embeddings=True))
+    candidate_vectors = np.asarray(candidate_embedder.encode(texts, normalize_embeddings=True))
+    cosine = np.sum(reference_vectors * candidate_vectors, axis=1)
+
+    # Do the top search results stay the same? Rank every text against all others.
+    reference_ranking = np.argsort(-(reference_vectors @ reference_vectors.T), axis=1)[:, 1:4]
+    candidate_ranking = np.argsort(-(candidate_vectors @ candidate_vectors.T), axis=1)[:, 1:4]
+    top3_overlap = np.mean([
+        len(set(ref) & set(cand)) / 3.0 for ref, cand in zip(reference_ranking, candidate_ranking)
+    ])
+
+    reference_pipeline = load_sentiment_pipeline(SENTIMENT_MODEL_NAME, 'torch')
+    candidate_pipeline = load_sentiment_pipeline(SENTIMENT_MODEL_NAME, backend)
+    reference_sentiment = reference_pipeline(texts, truncation=True)
+    candidate_sentiment = candidate_pipeline(texts, truncation=True)
+
+    def signed(result: Dict[str, Any]) -> float:
+        return result['score'] if result['label'] == 'POSITIVE' else -result['score']
+
+    label_agreement = np.mean([
+        ref['label'] == cand['label'] for ref, cand in zip(reference_sentiment, candidate_sentiment)
+    ])
+    score_delta = np.abs(
+        np.array([signed(r) for r in reference_sentiment]) - np.array([signed(c) for c in candidate_sentiment])
+    )
+
+    embedding = {
+        'mean_cosine': round(float(cosine.mean()), 5),
+        'min_cosine': round(float(cosine.min()), 5),
+        'top3_neighbour_overlap': round(float(top3_overlap), 4),
+        'reference_ms': _time_call(lambda: reference_embedder.encode(texts)),
+        'candidate_ms': _time_call(lambda: candidate_embedder.encode(texts))
+    }
+    sentiment = {
+        'label_agreement': round(float(label_agreement), 4),
+        'mean_score_delta': round(float(score_delta.mean()), 5),
+        'max_score_delta': round(float(score_delta.max()), 5),
+        'reference_ms': _time_call(lambda: reference_pipeline(texts, truncation=True)),
+        'candidate_ms': _time_call(lambda: candidate_pipeline(texts, truncation=True))
+    }
+    for stats in (embedding, sentiment):
+        stats['speedup'] = round(stats['reference_ms'] / stats['candidate_ms'], 2) if stats['candidate_ms'] else 0.0
+
+    passed = (embedding['min_cosine'] >= 0.98 and
+              sentiment['label_agreement'] >= 0.95 and
+              sentiment['max_score_delta'] <= 0.1)
+
+    return {
+        'success': True,
+        'backend': backend,
+        'texts': len(texts),
+        'embedding': embedding,
+        'sentiment': sentiment,
+        'parity_passed': passed
+    }
+
+
+def main():
+    """Main function to handle command line execution."""
+    # Usage: python model_backends.py parity <backend> [texts_file]
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != 'parity':
+        print(json.dumps({
+            'success': False,
+            'error': 'Usage: python model_backends.py parity <int8|onnx> [texts_file]'
+        }))
+        sys.exit(1)
+
+    try:
+        texts = PARITY_TEXTS
+        if len(sys.argv) == 4:
+            # One text per line, e.g. exported transcript segments
+            with open(sys.argv[3], 'r', encoding='utf-8') as f:
+                texts = [line.strip() for line in f if line.strip()]
+
+        result = parity_check(sys.argv[2], texts)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        sys.exit(0 if result['parity_passed'] else 1)
+
+    except Exception as e:
+        print(json.dumps({
+            'success': False,
+            'error': f'Parity check failed: {str(e)}'
+        }))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Embedding Model Registry
+
+Records which embedding models have a collection in the vector store, which
+of them ingest writes to and which one search reads from:
+
+    models  - model name -> {dimension, collection}
+    write   - models every store / store-batch writes to (dual-write)
+    active  - the model SemanticSearcher encodes queries with and searches
+
+Collections are named after their model and dimension (see
+collection_name), so vectors of different models never share a collection.
+Without a registry file the legacy setup is assumed: all-MiniLM-L6-v2
+writing to and searched from 'video_embeddings'.
+
+Migrating to a new model:
+    python model_registry.py register <model>     # add it with its own collection
+    python model_registry.py dual-write <model>   # ingest now also writes to it
+    python embedding_generator.py backfill <model> # copy existing videos over in bulk
+    python model_registry.py activate <model>     # search switches to it
+    python model_registry.py retire <old model>   # stop writing the old collection
+
+Processes read the registry when they start; restart long-lived workers
+after activate.
+"""
+
+import sys
+import json
+import os
+import re
+from typing import List, Dict, Any, Optional
+
+LEGACY_MODEL_NAME = "all-MiniLM-L6-v2"
+LEGACY_COLLECTION = "video_embeddings"
+LEGACY_DIMENSION = 384
+
+
+def get_registry_path() -> str:
+    return os.getenv('MODEL_REGISTRY_FILE', './model_registry.json')
+
+
+def collection_name(model_name: str, dimension: int) -> str:
+    """
+    Collection for a model's vectors, e.g. 'emb_baai-bge-small-en-v1-5_384'.
+
+    Kept within Chroma's naming rules (3-63 characters of [a-z0-9_-]).
+    """
+    slug = re.sub(r'[^a-z0-9]+', '-', model_name.lower()).strip('-')
+    suffix = f"_{dimension}"
+    return f"emb_{slug[:63 - len('emb_') - len(suffix)].strip('-')}{suffix}"
+
+
+def default_registry() -> Dict[str, Any]:
+    return {
+        'active': LEGACY_MODEL_NAME,
+        'write': [LEGACY_MODEL_NAME],
+        'models': {
+            LEGACY_MODEL_NAME: {'dimension': LEGACY_DIMENSION, 'collection': LEGACY_COLLECTION}
+        }
+    }
+
+
+def load_registry() -> Dict[str, Any]:
+    """Read the registry file, or the legacy default when there is none."""
+    path = get_registry_path()
+    if not os.path.isfile(path):
+        return default_registry()
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_registry(registry: Dict[str, Any]) -> None:
+    """Write the registry atomically, so readers never see a partial file."""
+    path = get_registry_path()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(registry, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def get_model_entry(model_name: str, registry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Registry entry of a model with its name included.
+
+    Raises:
+        ValueError: If the model is not registered
+    """
+    registry = registry or load_registry()
+    if model_name not in registry['models']:
+        raise ValueError(f"Model {model_name} is not registered. Run 'python model_registry.py register {model_name}'")
+    return {'name': model_name, **registry['models'][model_name]}
+
+
+def get_active_model(registry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Entry of the model search reads from."""
+    registry = registry or load_registry()
+    return get_model_entry(registry['active'], registry)
+
+
+def get_write_models(registry: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Entries of every model ingest writes to, the active model first."""
+    registry = registry or load_registry()
+    names = [registry['active']] + [name for name in registry['write'] if name != registry['active']]
+    return [get_model_entry(name, registry) for name in names]
+
+
+def register_model(model_name: str, dimension: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Add a model with its own collection; ingest does not write to it yet.
+
+    Args:
+        model_name: SentenceTransformer model name
+        dimension: Embedding size; the model is loaded to read it when omitted
+    """
+    registry = load_registry()
+    if model_name in registry['models']:
+        return get_model_entry(model_name, registry)
+    if dimension is None:
+        from model_backends import load_embedding_model
+        dimension = load_embedding_model(model_name).get_sentence_embedding_dimension()
+    registry['models'][model_name] = {
+        'dimension': int(dimension),
+        'collection': collection_name(model_name, int(dimension))
+    }
+    save_registry(registry)
+    return get_model_entry(model_name, registry)
+
+
+def start_dual_write(model_name: str) -> Dict[str, Any]:
+    """Make ingest write to a registered model's collection as well."""
+    registry = load_registry()
+    get_model_entry(model_name, registry)
+    if model_name not in registry['write']:
+        registry['write'].append(model_name)
+        save_registry(registry)
+    return registry
+
+
+def activate_model(model_name: str) -> Dict[str, Any]:
+    """
+    Switch search to a model. It must already be written to, so videos
+    stored from now on stay searchable.
+    """
+    registry = load_registry()
+    get_model_entry(model_name, registry)
+    if model_name not in registry['write']:
+        raise ValueError(f"Model {model_name} is not written to. Run 'python model_registry.py dual-write {model_name}' "
+                         f"and backfill it first")
+    registry['active'] = model_name
+    save_registry(registry)
+    return registry
+
+
+def retire_model(model_name: str) -> Dict[str, Any]:
+    """Stop writing to a model's collection. The collection itself is kept."""
+    registry = load_registry()
+    if model_name == registry['active']:
+        raise ValueError(f"Model {model_name} is active; activate another model first")
+    registry['write'] = [name for name in registry['write'] if name != model_name]
+    save_registry(registry)
+    return registry
+
+
+def main():
+    """Main function to handle command line execution."""
+    commands = {'status': 2, 'register': (3, 4), 'dual-write': 3, 'activate': 3, 'retire': 3}
+    arity = commands.get(sys.argv[1]) if len(sys.argv) > 1 else None
+    if arity is None or len(sys.argv) not in (arity if isinstance(arity, tuple) else (arity,)):
+        print(json.dumps({
+            'success': False,
+            'error': 'Usage: python model_registry.py status | register <model> [dimension] | '
+                     'dual-write <model> | activate <model> | retire <model>'
+        }))
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    try:
+        if command == 'register':
+            dimension = int(sys.argv[3]) if len(sys.argv) == 4 else None
+            register_model(sys.argv[2], dimension)
+        elif command == 'dual-write':
+            start_dual_write(sys.argv[2])
+        elif command == 'activate':
+            activate_model(sys.argv[2])
+        elif command == 'retire':
+            retire_model(sys.argv[2])
+
+        result = {
+            'success': True,
+            'registry_file': get_registry_path(),
+            'file_exists': os.path.isfile(get_registry_path()),
+            **load_registry()
+        }
+        print(json.dumps(result, indent=2))
+        sys.exit(0)
+
+    except Exception as e:
+        print(json.dumps({
+            'success': False,
+            'error': f'{command} failed: {str(e)}'
+        }))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Local Model Store
+
+Pre-materializes the embedding and sentiment models as safetensors under
+MODEL_STORE_DIR so processes load them from local disk instead of resolving
+them through the Hugging Face hub on every start. safetensors files are
+memory-mapped on load, so several processes on one host share page cache.
+
+When a model is present in the store, loading switches to offline mode
+(HF_HUB_OFFLINE / TRANSFORMERS_OFFLINE). With MODEL_STORE_OFFLINE=1 a missing
+model is an error instead of a silent fallback to the hub.
+
+Usage:
+    python model_store.py materialize   # download once and save as safetensors
+    python model_store.py status        # list what is in the store
+    python model_store.py benchmark     # report model load times
+"""
+
+import sys
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+MANIFEST_FILE = 'vidsense_model.json'
+
+# Models served by the store and how each one is saved
+STORE_MODELS = {
+    'all-MiniLM-L6-v2': 'sentence-transformer',
+    'distilbert-base-uncased-finetuned-sst-2-english': 'sequence-classification'
+}
+
+
+def get_store_dir() -> str:
+    return os.getenv('MODEL_STORE_DIR', './models')
+
+
+def is_strict_offline() -> bool:
+    return os.getenv('MODEL_STORE_OFFLINE', '0').lower() in ('1', 'true', 'yes')
+
+
+def model_dir(model_name: str) -> str:
+    """Directory of a model inside the store ('org/name' becomes 'org__name')."""
+    return os.path.join(get_store_dir(), model_name.replace('/', '__'))
+
+
+def local_model_path(model_name: str) -> Optional[str]:
+    """Path of a fully materialized model, or None if it is not in the store."""
+    path = model_dir(model_name)
+    if os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+        return path
+    return None
+
+
+def enable_offline_mode() -> None:
+    """
+    Stop transformers and huggingface_hub from contacting the hub.
+
+    The libraries read these flags at import time, so this only takes effect
+    in processes that have not imported them yet; model_backends.py also
+    passes local_files_only for models served from the store.
+    """
+    os.environ['HF_HUB_OFFLINE'] = '1'
+    os.environ['TRANSFORMERS_OFFLINE'] = '1'
+
+
+def resolve_model(model_name: str) -> str:
+    """
+    Map a hub model name to its local store path when available.
+
+    Args:
+        model_name: Hugging Face model name (or an explicit local path)
+
+    Returns:
+        Local directory to load from, or the original name
+
+    Raises:
+        Exception: If MODEL_STORE_OFFLINE=1 and the model is not materialized
+    """
+    if os.path.isdir(model_name):
+        return model_name
+
+    path = local_model_path(model_name)
+    if path:
+        enable_offline_mode()
+        return path
+
+    if is_strict_offline():
+        raise Exception(
+            f"Model {model_name} is not in the local store at {get_store_dir()}. "
+            f"Run 'python model_store.py materialize' first."
+        )
+    return model_name
+
+
+def materialize_model(model_name: str, kind: str) -> Dict[str, Any]:
+    """
+    Download a model once and save it as safetensors in the store.
+
+    Args:
+        model_name: Hugging Face model name
+        kind: 'sentence-transformer' or 'sequence-classification'
+
+    Returns:
+        Manifest written next to the model files
+    """
+    path = model_dir(model_name)
+    os.makedirs(path, exist_ok=True)
+
+    print(f"Materializing {model_name} into {path}...", file=sys.stderr)
+    if kind == 'sentence-transformer':
+        from sentence_transformers import SentenceTransformer
+        SentenceTransformer(model_name).save(path, safe_serialization=True)
+    elif kind == 'sequence-classification':
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        AutoModelForSequenceClassification.from_pretrained(model_name).save_pretrained(
+            path, safe_serialization=True
+        )
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(path)
+    else:
+        raise ValueError(f"Unknown model kind: {kind}")
+
+    size_bytes = 0
+    for root, _, files in os.walk(path):
+        size_bytes += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+
+    manifest = {
+        'model_name': model_name,
+        'kind': kind,
+        'format': 'safetensors',
+        'size_mb': round(size_bytes / (1024 * 1024), 1),
+        'materialized_at': datetime.now(timezone.utc).isoformat()
+    }
+    # Written last: a model only counts as present once its manifest exists
+    with open(os.path.join(path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def store_status() -> Dict[str, Any]:
+    models = {}
+    for model_name in STORE_MODELS:
+        path = local_model_path(model_name)
+        if path:
+            with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                models[model_name] = {'present': True, 'path': path, **json.load(f)}
+        else:
+            models[model_name] = {'present': False}
+
+    return {
+        'success': True,
+        'store_dir': get_store_dir(),
+        'strict_offline': is_strict_offline(),
+        'models': models
+    }
+
+
+def benchmark_load() -> Dict[str, Any]:
+    """Time import and model load for both models as a cold process would see them."""
+    timings = {}
+
+    started = time.perf_counter()
+    import torch  # noqa: F401
+    import sentence_transformers  # noqa: F401
+    import transformers  # noqa: F401
+    timings['import_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    from model_backends import load_embedding_model, load_sentiment_pipeline
+    from embedding_generator import EMBEDDING_MODEL_NAME
+    from sentiment_analyzer import SENTIMENT_MODEL_NAME
+
+    started = time.perf_counter()
+    load_embedding_model(EMBEDDING_MODEL_NAME)
+    timings['embedding_model_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    started = time.perf_counter()
+    load_sentiment_pipeline(SENTIMENT_MODEL_NAME)
+    timings['sentiment_model_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    return {
+        'success': True,
+        'source': {
+            EMBEDDING_MODEL_NAME: local_model_path(EMBEDDING_MODEL_NAME) or 'hub',
+            SENTIMENT_MODEL_NAME: local_model_path(SENTIMENT_MODEL_NAME) or 'hub'
+        },
+        'timings': timings,
+        'total_ms': round(sum(timings.values()), 2)
+    }
+
+
+def main():
+    """Main function to handle command line execution."""
+    commands = ('materialize', 'status', 'benchmark')
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        print(json.dumps({
+            'success': False,
+            'error': 'Usage: python model_store.py <materialize|status|benchmark>'
+        }))
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    try:
+        if command == 'materialize':
+            result = {
+                'success': True,
+                'store_dir': get_store_dir(),
+                'models': {name: materialize_model(name, kind) for name, kind in STORE_MODELS.items()}
+            }
+        elif command == 'status':
+            result = store_status()
+        else:
+            result = benchmark_load()
+
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        sys.exit(0 if result['success'] else 1)
+
+    except Exception as e:
+        print(json.dumps({
+            'success': False,
+            'error': f'{command} failed: {str(e)}'
+        }))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
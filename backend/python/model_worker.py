@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Model-Resident Worker
+
+Long-lived process that keeps the embedding model, the sentiment pipeline,
+the ChromaDB client and the Groq client loaded between requests. It reads
+newline-delimited JSON requests from stdin and writes one JSON response line
+per request to stdout, so the Node.js bridge can keep a pool of warm workers
+instead of spawning a fresh Python process for every call.
+
+Request:  {"id": "42", "command": "search", "query": "neural networks", "limit": 10}
+Response: {"id": "42", "success": true, "results": [...], ...}
+
+Commands: ping, search, search-batch, stats, store, sentiment, summarize, shutdown
+"""
+
+import sys
+import json
+import os
+import io
+import time
+from typing import Dict, Any, Optional
+
+# Suppress TensorFlow warnings before importing anything else
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+
+import warnings
+warnings.filterwarnings('ignore')
+
+
+class ModelWorker:
+    def __init__(self):
+        # Each component is created on first use and then kept for the
+        # lifetime of the process.
+        self._embedder = None
+        self._searcher = None
+        self._sentiment_analyzer = None
+        self._summarizer = None
+        self.requests_served = 0
+        self.started_at = time.time()
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            from embedding_generator import EmbeddingGenerator
+            self._embedder = EmbeddingGenerator()
+        return self._embedder
+
+    @property
+    def searcher(self):
+        if self._searcher is None:
+            from semantic_search import SemanticSearcher
+            # Share the embedder's SentenceTransformer and vector store client
+            # instead of loading the model twice and opening a clashing client
+            self._searcher = SemanticSearcher(embedding_model=self.embedder.embedding_model,
+                                              chroma_client=self.embedder.chroma_client)
+        return self._searcher
+
+    @property
+    def sentiment_analyzer(self):
+        if self._sentiment_analyzer is None:
+            from sentiment_analyzer import SentimentAnalyzer
+            self._sentiment_analyzer = SentimentAnalyzer()
+        return self._sentiment_analyzer
+
+    @property
+    def summarizer(self):
+        if self._summarizer is None:
+            from summarizer import VideoSummarizer
+            self._summarizer = VideoSummarizer()
+        return self._summarizer
+
+    def loaded_components(self) -> list:
+        """Names of the components that are currently resident."""
+        components = {
+            'embedder': self._embedder,
+            'searcher': self._searcher,
+            'sentiment': self._sentiment_analyzer,
+            'summarizer': self._summarizer
+        }
+        return [name for name, component in components.items() if component is not None]
+
+    def preload(self, components: list) -> None:
+        """
+        Load components eagerly so the first request does not pay for it.
+
+        Args:
+            components: Names from 'embedder', 'searcher', 'sentiment', 'summarizer'
+        """
+        for name in components:
+            if name == 'embedder':
+                self.embedder
+            elif name == 'searcher':
+                self.searcher
+            elif name == 'sentiment':
+                self.sentiment_analyzer
+            elif name == 'summarizer':
+                self.summarizer
+            else:
+                raise ValueError(f"Unknown component to preload: {name}")
+
+    def _load_payload(self, request: Dict[str, Any]) -> Any:
+        """Requests may carry their payload inline or point to a data file."""
+        data_file = request.get('data_file')
+        if data_file:
+            with open(data_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return request
+
+    def handle_search(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        query = request.get('query', '')
+        limit = int(request.get('limit', 10))
+        if limit < 1 or limit > 50:
+            return {
+                'success': False,
+                'error': 'Invalid limit parameter: Limit must be between 1 and 50'
+            }
+
+        searcher = self.searcher
+        if searcher.collection is None:
+            # Videos may have been stored since the searcher was created
+            searcher.connect_collection()
+        return searcher.search(query, limit)
+
+    def handle_search_batch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        queries = request.get('queries')
+        if not isinstance(queries, list) or not queries:
+            return {
+                'success': False,
+                'error': '"queries" must be a non-empty list of strings'
+            }
+        limit = int(request.get('limit', 10))
+        if limit < 1 or limit > 50:
+            return {
+                'success': False,
+                'error': 'Invalid limit parameter: Limit must be between 1 and 50'
+            }
+
+        searcher = self.searcher
+        if searcher.collection is None:
+            searcher.connect_collection()
+        searches = searcher.search_batch(queries, limit)
+        return {
+            'success': all(search['success'] for search in searches),
+            'searches': searches,
+            'total_queries': len(searches)
+        }
+
+    def handle_stats(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        searcher = self.searcher
+        if searcher.collection is None:
+            searcher.connect_collection()
+        return searcher.get_collection_stats()
+
+    def handle_store(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        data = self._load_payload(request)
+        return self.embedder.store_video_embeddings(
+            data['video_id'],
+            data['transcript_text'],
+            data['transcript_segments'],
+            title=data.get('title', ''),
+            summary=data.get('summary', '')
+        )
+
+    def handle_sentiment(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        data = self._load_payload(request)
+        # sentiment_analyzer.py data files hold the bare segment list
+        transcript_segments = data if isinstance(data, list) else data.get('transcript_segments')
+        if not isinstance(transcript_segments, list) or not transcript_segments:
+            return {
+                'success': False,
+                'error': 'No transcript segments provided'
+            }
+        return self.sentiment_analyzer.analyze_transcript(transcript_segments)
+
+    def handle_summarize(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        data = self._load_payload(request)
+        return self.summarizer.summarize(data.get('transcript_text', ''))
+
+    def handle_ping(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'success': True,
+            'pid': os.getpid(),
+            'loaded': self.loaded_components(),
+            'requests_served': self.requests_served,
+            'uptime_seconds': round(time.time() - self.started_at, 2)
+        }
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Dispatch a single request to its handler.
+
+        Args:
+            request: Parsed request object with a 'command' field
+
+        Returns:
+            Response dictionary (always contains 'success')
+        """
+        handlers = {
+            'ping': self.handle_ping,
+            'search': self.handle_search,
+            'search-batch': self.handle_search_batch,
+            'stats': self.handle_stats,
+            'store': self.handle_store,
+            'sentiment': self.handle_sentiment,
+            'summarize': self.handle_summarize
+        }
+
+        command = request.get('command')
+        handler = handlers.get(command)
+        if handler is None:
+            return {
+                'success': False,
+                'error': f'Unknown command: {command}. Use one of: {", ".join(sorted(handlers))}, shutdown'
+            }
+
+        try:
+            return handler(request)
+        except KeyError as e:
+            return {
+                'success': False,
+                'error': f'Missing required field: {str(e)}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'{command} failed: {str(e)}'
+            }
+
+    def serve(self, input_stream, output_stream) -> None:
+        """
+        Serve newline-delimited JSON requests until EOF or a shutdown command.
+
+        Args:
+            input_stream: Text stream to read requests from
+            output_stream: Text stream to write responses to
+        """
+        def respond(request_id: Optional[Any], response: Dict[str, Any]) -> None:
+            output_stream.write(json.dumps({'id': request_id, **response}, ensure_ascii=False) + '\n')
+            output_stream.flush()
+
+        respond(None, {'success': True, 'event': 'ready', 'pid': os.getpid()})
+
+        for line in input_stream:
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("Request must be a JSON object")
+            except (json.JSONDecodeError, ValueError) as e:
+                respond(None, {
+                    'success': False,
+                    'error': f'Invalid JSON input: {str(e)}'
+                })
+                continue
+
+            request_id = request.get('id')
+            if request.get('command') == 'shutdown':
+                respond(request_id, {'success': True, 'event': 'shutdown'})
+                break
+
+            started = time.perf_counter()
+            response = self.handle(request)
+            response['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            self.requests_served += 1
+            respond(request_id, response)
+
+
+def main():
+    """Main function to handle command line execution."""
+    # Usage: python model_worker.py [--preload embedder,searcher,sentiment,summarizer]
+    preload = []
+    args = sys.argv[1:]
+    if args:
+        if len(args) != 2 or args[0] != '--preload':
+            print(json.dumps({
+                'success': False,
+                'error': 'Usage: python model_worker.py [--preload <component,...>]'
+            }))
+            sys.exit(1)
+        preload = [name.strip() for name in args[1].split(',') if name.strip()]
+
+    # stdout carries the protocol only: keep a dedicated UTF-8 handle for it
+    # and send anything else written to sys.stdout (library chatter) to stderr.
+    protocol_out = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True)
+    protocol_in = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    sys.stdout = sys.stderr
+
+    worker = ModelWorker()
+    try:
+        worker.preload(preload)
+    except Exception as e:
+        protocol_out.write(json.dumps({
+            'id': None,
+            'success': False,
+            'error': f'Failed to preload models: {str(e)}'
+        }) + '\n')
+        protocol_out.flush()
+        sys.exit(1)
+
+    worker.serve(protocol_in, protocol_out)
+
+
+if __name__ == "__main__":
+    main()
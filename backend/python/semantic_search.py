@@ -3,11 +3,20 @@
 Semantic Search using ChromaDB
 
 This script performs semantic search across stored video embeddings.
+
+Heavy dependencies (chromadb, torch, sentence-transformers) are imported
+lazily: arguments are validated and the collection is looked up before the
+embedding model is loaded, so a search that cannot succeed fails fast.
 """
 
 import sys
 import json
 import os
+import time
+import threading
+
+# Measure startup from the moment the interpreter reaches this module
+_PROCESS_START = time.perf_counter()
 
 # Suppress TensorFlow warnings before importing anything else
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
@@ -16,60 +25,377 @@ os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 import warnings
 warnings.filterwarnings('ignore')
 
-from typing import List, Dict, Any
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-from dotenv import load_dotenv
+import importlib
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+# Per-module import times in milliseconds, filled by _timed_import
+_import_timings: Dict[str, float] = {}
+_env_loaded = False
+
+
+def _timed_import(module_name: str):
+    """Import a module and record how long the import took."""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    _import_timings[module_name] = round((time.perf_counter() - started) * 1000, 2)
+    return module
+
+
+def _load_environment() -> None:
+    """Load .env once, on first use rather than at import time."""
+    global _env_loaded
+    if not _env_loaded:
+        _timed_import('dotenv').load_dotenv()
+        _env_loaded = True
+
+
+def get_startup_budget_ms() -> float:
+    """
+    Startup budget in milliseconds for a one-shot search (imports + vector
+    store connection, measured before the query is encoded). Read after
+    .env is loaded, not at import.
+    """
+    _load_environment()
+    return float(os.getenv('SEARCH_STARTUP_BUDGET_MS', '5000'))
+
+
+def get_search_cache_sizes() -> Dict[str, int]:
+    """
+    In-process LRU sizes: query text -> vector, and (query, limit) -> search
+    result (valid until the collection's version changes). 0 disables either.
+    """
+    _load_environment()
+    return {
+        'query_vectors': int(os.getenv('SEARCH_QUERY_CACHE_SIZE', '1024')),
+        'results': int(os.getenv('SEARCH_RESULT_CACHE_SIZE', '256'))
+    }
+
+
+def get_import_profile() -> Dict[str, Any]:
+    """Import timings and total startup time measured so far."""
+    elapsed_ms = round((time.perf_counter() - _PROCESS_START) * 1000, 2)
+    budget_ms = get_startup_budget_ms()
+    return {
+        'modules_ms': dict(_import_timings),
+        'total_import_ms': round(sum(_import_timings.values()), 2),
+        'startup_ms': elapsed_ms,
+        'startup_budget_ms': budget_ms,
+        'within_budget': elapsed_ms <= budget_ms
+    }
+
+
+def _is_missing_collection(error: Exception) -> bool:
+    """Whether a query failed because its collection was deleted (e.g. by a rebuild swap)."""
+    # chromadb raises NotFoundError; a dropped flat collection loses its files
+    return (type(error).__name__ == 'NotFoundError' or isinstance(error, FileNotFoundError)
+            or 'does not exist' in str(error))
 
-# Load environment variables
-load_dotenv()
 
 class SemanticSearcher:
-    def __init__(self):
-        self.model_name = "all-MiniLM-L6-v2"
-        self.chroma_persist_dir = os.getenv('CHROMA_PERSIST_DIR', './chromadb')
+    def __init__(self, embedding_model=None, backend: Optional[str] = None,
+                 vector_store: Optional[str] = None, chroma_client=None):
+        _load_environment()
+        # Queries are encoded with the active registry model and run against its collection
+        active_model = _timed_import('model_registry').get_active_model()
+        self.model_name = active_model['name']
+        self.collection_name = active_model['collection']
+        self.backend = backend
+        vector_store_module = _timed_import('vector_store')
+        self.vector_store = vector_store_module.get_vector_store_backend(vector_store)
+        self.chroma_persist_dir = vector_store_module.get_store_path(self.vector_store)
+        
+        # Reuse an already loaded model (e.g. shared inside model_worker.py),
+        # otherwise the model is loaded on first use by the embedding_model property
+        self._embedding_model = embedding_model
+        # Popular queries are served from the disk cache without loading the model
+        model_backends = _timed_import('model_backends')
+        self.embedding_cache = _timed_import('embedding_cache').open_embedding_cache(
+            self.model_name, model_backends.get_backend(self.backend)
+        )
+        # Processes that also hold an EmbeddingGenerator pass its client: Chroma
+        # refuses a second client on the same path with different Settings
+        self.chroma_client = chroma_client
+        self.collection = None
+        # Collection version when self.collection was looked up; see refresh_collection
+        self._collection_version = None
+        # Long-lived searchers (model_worker.py, inference_server.py) answer
+        # repeated queries from memory; see cached_search
+        self._query_vectors = OrderedDict()
+        self._results = OrderedDict()
+        cache_sizes = get_search_cache_sizes()
+        self.query_vector_cache_size = cache_sizes['query_vectors']
+        self.result_cache_size = cache_sizes['results']
+        # inference_server.py searches from several executor threads
+        self._cache_lock = threading.Lock()
+        
+        self.connect_collection()
+    
+    @property
+    def embedding_model(self):
+        """SentenceTransformer used to encode queries, loaded on first access."""
+        if self._embedding_model is None:
+            try:
+                print("Loading embedding model for search...", file=sys.stderr)
+                # Import torch on its own so its cost shows up separately in the profile
+                _timed_import('torch')
+                _timed_import('sentence_transformers')
+                model_backends = _timed_import('model_backends')
+                self._embedding_model = model_backends.load_embedding_model(self.model_name, self.backend)
+            except Exception as e:
+                raise Exception(f"Failed to load embedding model: {str(e)}")
+        return self._embedding_model
+    
+    def _create_client(self):
+        if self.vector_store == 'chroma':
+            # Imported here so the cost shows up in the import profile
+            _timed_import('chromadb')
+        return _timed_import('vector_store').create_client(self.vector_store)
+    
+    def connect_collection(self) -> bool:
+        """
+        Look up the active model's collection.
+        
+        Long-lived processes call this again once videos have been stored,
+        since the collection may not exist yet when the searcher starts.
+        
+        Returns:
+            True if the collection is available
+        """
+        # Read first: a write that lands during the lookup triggers another one
+        self._collection_version = _timed_import('vector_store').get_collection_version(
+            self.collection_name, self.vector_store
+        )
+        if self.chroma_client is None:
+            # Nothing has been stored yet: skip importing chromadb altogether
+            if not os.path.isdir(self.chroma_persist_dir):
+                print(f"Warning: Vector store directory {self.chroma_persist_dir} not found", file=sys.stderr)
+                return False
+            
+            try:
+                print(f"Connecting to vector store ({self.vector_store})...", file=sys.stderr)
+                self.chroma_client = self._create_client()
+            except Exception as e:
+                raise Exception(f"Failed to connect to vector store: {str(e)}")
         
         try:
-            print("Loading embedding model for search...", file=sys.stderr)
-            self.embedding_model = SentenceTransformer(self.model_name)
-        except Exception as e:
-            raise Exception(f"Failed to load embedding model: {str(e)}")
+            self.collection = self.chroma_client.get_collection(self.collection_name)
+            collection_count = self.collection.count()
+            print(f"Connected to {self.vector_store} collection {self.collection_name} with {collection_count} documents",
+                  file=sys.stderr)
+        except Exception:
+            print(f"Warning: {self.collection_name} collection not found", file=sys.stderr)
+            self.collection = None
         
+        return self.collection is not None
+    
+    def refresh_collection(self) -> bool:
+        """
+        Look the collection up again by name if it was written to since.
+        
+        A rebuild (embedding_generator.py rebuild) swaps a new collection in
+        under the same name and drops the old one, which long-lived searchers
+        would otherwise keep querying. Writes bump the collection version, so
+        this costs one stat call when nothing changed.
+        
+        Returns:
+            True if the collection is available
+        """
+        version = _timed_import('vector_store').get_collection_version(self.collection_name, self.vector_store)
+        if version != self._collection_version:
+            self.connect_collection()
+        return self.collection is not None
+    
+    def _query_collection(self, **kwargs) -> Dict[str, Any]:
+        """collection.query, reconnecting by name once if the collection was dropped."""
         try:
-            print("Connecting to ChromaDB...", file=sys.stderr)
-            self.chroma_client = chromadb.PersistentClient(
-                path=self.chroma_persist_dir,
-                settings=Settings(
-                    anonymized_telemetry=False
-                )
+            return self.collection.query(**kwargs)
+        except Exception as e:
+            if not _is_missing_collection(e) or not self.connect_collection():
+                raise
+            print(f"Reconnected to {self.collection_name} after: {str(e)}", file=sys.stderr)
+            return self.collection.query(**kwargs)
+    
+    def encode_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Encode several search queries in a single forward pass.
+        
+        Queries seen recently come from the in-process LRU, then the disk
+        embedding cache is checked, and the model is only loaded if at
+        least one query misses both.
+        
+        Args:
+            queries: Search query texts
+            
+        Returns:
+            One embedding vector per query
+        """
+        def encode(batch: List[str]):
+            # Unit vectors: search converts distance to cosine similarity
+            return self.embedding_model.encode(
+                batch, normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False
             )
+        
+        with self._cache_lock:
+            found = {query: self._query_vectors[query] for query in queries if query in self._query_vectors}
+        missing = list(dict.fromkeys(query for query in queries if query not in found))
+        if missing:
+            if self.embedding_cache is not None:
+                vectors = self.embedding_cache.encode(missing, encode).tolist()
+            else:
+                vectors = encode(missing).tolist()
+            found.update(zip(missing, vectors))
+        
+        if self.query_vector_cache_size:
+            with self._cache_lock:
+                for query in dict.fromkeys(queries):
+                    self._query_vectors[query] = found[query]
+                    self._query_vectors.move_to_end(query)
+                while len(self._query_vectors) > self.query_vector_cache_size:
+                    self._query_vectors.popitem(last=False)
+        return [found[query] for query in queries]
+    
+    def _result_key(self, query: str, limit: int):
+        """Result cache key and the collection version results are valid for."""
+        version = _timed_import('vector_store').get_collection_version(self.collection_name, self.vector_store)
+        return (query.strip(), limit), version
+    
+    def cached_search(self, query: str, limit: int = 10) -> Optional[Dict[str, Any]]:
+        """
+        The result of an earlier identical search, if nothing was stored since.
+        
+        Lets callers skip encoding the query altogether on a warm hit.
+        """
+        if not self.result_cache_size or not self.collection:
+            return None
+        key, version = self._result_key(query, limit)
+        with self._cache_lock:
+            cached = self._results.get(key)
+            if cached is None or cached[0] != version:
+                return None
+            self._results.move_to_end(key)
+        return {**cached[1], 'cache': {'results': 'hit'}}
+    
+    def _cache_result(self, key, version: int, result: Dict[str, Any], vector_cache: str) -> Dict[str, Any]:
+        if self.result_cache_size:
+            with self._cache_lock:
+                self._results[key] = (version, result)
+                self._results.move_to_end(key)
+                while len(self._results) > self.result_cache_size:
+                    self._results.popitem(last=False)
+        return {**result, 'cache': {'results': 'miss', 'query_vector': vector_cache}}
+    
+    def _group_results(self, query: str, limit: int, documents: List[str], metadatas: List[Dict[str, Any]],
+                       distances: List[float], collection_size: int) -> Dict[str, Any]:
+        """
+        Turn one query's raw matches into the search() result: scored,
+        boosted for title/summary matches, one entry per video, best first.
+        """
+        if not documents:
+            return {
+                'success': True,
+                'results': [],
+                'query': query,
+                'message': 'No similar content found. Try different keywords or analyze more videos.'
+            }
+        
+        print(f"Found {len(documents)} raw results", file=sys.stderr)
+        
+        # Debug: print first few results
+        if distances:
+            print(f"Sample distances: {distances[:3]}", file=sys.stderr)
+            print(f"Sample metadatas: {[m.get('chunk_type', 'unknown') for m in metadatas[:3]]}", file=sys.stderr)
+        
+        # Process and deduplicate results by video_id
+        vector_store_module = _timed_import('vector_store')
+        space = vector_store_module.get_collection_space(self.collection)
+        video_results = {}
+        
+        for doc, metadata, distance in zip(documents, metadatas, distances):
+            video_id = metadata['video_id']
+            chunk_type = metadata.get('chunk_type', 'transcript')
             
-            # Get the existing collection
-            try:
-                self.collection = self.chroma_client.get_collection("video_embeddings")
-                collection_count = self.collection.count()
-                print(f"Connected to ChromaDB collection with {collection_count} documents", file=sys.stderr)
-            except Exception:
-                print("Warning: video_embeddings collection not found", file=sys.stderr)
-                self.collection = None
-                
-        except Exception as e:
-            raise Exception(f"Failed to connect to ChromaDB: {str(e)}")
+            # Embeddings are normalized, so every space maps back to cosine
+            # similarity: 1 - d for 'cosine', 1 - d/2 for the legacy
+            # squared-L2 collections created before HNSW_SPACE existed
+            
+            # Calculate base similarity
+            similarity_score = max(0, vector_store_module.distance_to_similarity(distance, space))
+            
+            # Apply boost for title and summary matches
+            boost = 1.0
+            if chunk_type == 'title':
+                boost = 1.3  # 30% boost for title matches
+            elif chunk_type == 'summary':
+                boost = 1.15  # 15% boost for summary matches
+            
+            similarity_score = min(1.0, similarity_score * boost)
+            
+            # Debug logging for first result
+            if len(video_results) == 0:
+                print(f"First match - Type: {chunk_type}, Distance: {distance:.4f}, Similarity: {similarity_score:.4f}, Boost: {boost}", file=sys.stderr)
+            
+            # Only keep the best match for each video
+            if video_id not in video_results or similarity_score > video_results[video_id]['similarity_score']:
+                video_results[video_id] = {
+                    'video_id': video_id,
+                    'similarity_score': round(similarity_score, 4),
+                    'match_type': chunk_type,
+                    'best_match_text': doc[:200] + ('...' if len(doc) > 200 else ''),
+                    'chunk_index': metadata.get('chunk_index', 0),
+                    'estimated_timestamp': metadata.get('estimated_timestamp', 0),
+                    'end_time': metadata.get('end_time'),
+                    'word_count': metadata.get('word_count', 0)
+                }
+        
+        # Sort by similarity score (descending) and limit results
+        sorted_results = sorted(
+            video_results.values(),
+            key=lambda x: x['similarity_score'],
+            reverse=True
+        )[:limit]
+        
+        # Filter out results with very low similarity scores
+        # Lower threshold since we're now using proper cosine similarity
+        filtered_results = [
+            result for result in sorted_results 
+            if result['similarity_score'] > 0.2  # Minimum similarity threshold
+        ]
+        
+        print(f"Returning {len(filtered_results)} unique video results", file=sys.stderr)
+        
+        return {
+            'success': True,
+            'results': filtered_results,
+            'query': query,
+            'total_found': len(filtered_results),
+            'collection_size': collection_size
+        }
     
-    def search(self, query: str, limit: int = 10) -> Dict[str, Any]:
+    def search(self, query: str, limit: int = 10,
+               query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
         """
         Perform semantic search for similar videos.
         
         Args:
             query: Search query text
             limit: Maximum number of results to return
+            query_embedding: Precomputed embedding for the query (e.g. from a
+                batched encode_queries call); encoded here when omitted
             
         Returns:
-            Dictionary with search results
+            Dictionary with search results. 'cache' reports whether the
+            result ('results') and the query vector ('query_vector') were
+            served from memory.
         """
+        cached = self.cached_search(query, limit)
+        if cached is not None:
+            return cached
+        
         try:
-            if not self.collection:
+            if not self.refresh_collection():
                 return {
                     'success': False,
                     'error': 'ChromaDB collection not available. No videos have been analyzed yet.'
@@ -83,112 +409,112 @@ class SemanticSearcher:
             
             print(f"Searching for: '{query}' (limit: {limit})", file=sys.stderr)
             
+            # Read before querying: a write that lands meanwhile invalidates this result
+            cache_key, version = self._result_key(query, limit)
+            
             # Generate embedding for the search query
-            query_embedding = self.embedding_model.encode([query], convert_to_tensor=False)[0].tolist()
+            if query_embedding is not None:
+                vector_cache = 'provided'
+            else:
+                vector_cache = 'hit' if query in self._query_vectors else 'miss'
+                query_embedding = self.encode_queries([query])[0]
             
             # Search in ChromaDB with higher result count to allow for deduplication
             search_limit = min(limit * 5, 100)  # Get more results to deduplicate by video
             
-            results = self.collection.query(
+            results = self._query_collection(
                 query_embeddings=[query_embedding],
                 n_results=search_limit,
                 include=['documents', 'metadatas', 'distances']
             )
             
-            if not results['ids'] or not results['ids'][0]:
-                return {
-                    'success': True,
-                    'results': [],
-                    'query': query,
-                    'message': 'No similar content found. Try different keywords or analyze more videos.'
-                }
-            
-            print(f"Found {len(results['ids'][0])} raw results", file=sys.stderr)
-            
-            # Debug: print first few results
-            if results['distances'][0]:
-                print(f"Sample distances: {results['distances'][0][:3]}", file=sys.stderr)
-                print(f"Sample metadatas: {[m.get('chunk_type', 'unknown') for m in results['metadatas'][0][:3]]}", file=sys.stderr)
-            
-            # Process and deduplicate results by video_id
-            video_results = {}
-            
-            for doc, metadata, distance in zip(
-                results['documents'][0], 
-                results['metadatas'][0], 
-                results['distances'][0]
-            ):
-                video_id = metadata['video_id']
-                chunk_type = metadata.get('chunk_type', 'transcript')
-                
-                # ChromaDB returns squared L2 distance by default
-                # For normalized embeddings (which sentence-transformers produces),
-                # squared L2 distance is equivalent to 2 * (1 - cosine_similarity)
-                # So: cosine_similarity = 1 - (distance / 2)
-                # This gives us a proper 0-1 similarity score
-                
-                # Calculate base similarity
-                similarity_score = max(0, 1 - (distance / 2.0))
-                
-                # Apply boost for title and summary matches
-                boost = 1.0
-                if chunk_type == 'title':
-                    boost = 1.3  # 30% boost for title matches
-                elif chunk_type == 'summary':
-                    boost = 1.15  # 15% boost for summary matches
-                
-                similarity_score = min(1.0, similarity_score * boost)
-                
-                # Debug logging for first result
-                if len(video_results) == 0:
-                    print(f"First match - Type: {chunk_type}, Distance: {distance:.4f}, Similarity: {similarity_score:.4f}, Boost: {boost}", file=sys.stderr)
-                
-                # Only keep the best match for each video
-                if video_id not in video_results or similarity_score > video_results[video_id]['similarity_score']:
-                    video_results[video_id] = {
-                        'video_id': video_id,
-                        'similarity_score': round(similarity_score, 4),
-                        'match_type': chunk_type,
-                        'best_match_text': doc[:200] + ('...' if len(doc) > 200 else ''),
-                        'chunk_index': metadata.get('chunk_index', 0),
-                        'estimated_timestamp': metadata.get('estimated_timestamp', 0),
-                        'word_count': metadata.get('word_count', 0)
-                    }
-            
-            # Sort by similarity score (descending) and limit results
-            sorted_results = sorted(
-                video_results.values(),
-                key=lambda x: x['similarity_score'],
-                reverse=True
-            )[:limit]
-            
-            # Filter out results with very low similarity scores
-            # Lower threshold since we're now using proper cosine similarity
-            filtered_results = [
-                result for result in sorted_results 
-                if result['similarity_score'] > 0.2  # Minimum similarity threshold
-            ]
-            
-            print(f"Returning {len(filtered_results)} unique video results", file=sys.stderr)
+            return self._cache_result(cache_key, version, self._group_results(
+                query, limit,
+                results['documents'][0] if results['ids'] else [],
+                results['metadatas'][0] if results['ids'] else [],
+                results['distances'][0] if results['ids'] else [],
+                self.collection.count()
+            ), vector_cache)
             
+        except Exception as e:
             return {
-                'success': True,
-                'results': filtered_results,
-                'query': query,
-                'total_found': len(filtered_results),
-                'collection_size': self.collection.count()
+                'success': False,
+                'error': f'Semantic search failed: {str(e)}'
             }
+    
+    def search_batch(self, queries: List[str], limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Run many searches with one encode and one collection query.
+        
+        Queries answered by the result cache are served from it; the rest
+        are encoded together as one matrix and sent to the collection as a
+        single multi-query request.
+        
+        Args:
+            queries: Search query texts
+            limit: Maximum number of results per query
             
+        Returns:
+            One search() shaped result per query, in input order
+        """
+        try:
+            available = self.refresh_collection()
         except Exception as e:
-            return {
+            return [{'success': False, 'error': f'Semantic search failed: {str(e)}'} for _ in queries]
+        if not available:
+            error = {
                 'success': False,
-                'error': f'Semantic search failed: {str(e)}'
+                'error': 'ChromaDB collection not available. No videos have been analyzed yet.'
             }
+            return [dict(error) for _ in queries]
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        pending = []
+        for i, query in enumerate(queries):
+            if not isinstance(query, str) or not query.strip():
+                results[i] = {'success': False, 'error': 'Empty search query provided'}
+                continue
+            results[i] = self.cached_search(query, limit)
+            if results[i] is None:
+                pending.append(i)
+        
+        if pending:
+            # Duplicates in one batch are encoded and searched once
+            unique_queries = list(dict.fromkeys(queries[i] for i in pending))
+            print(f"Searching for {len(unique_queries)} queries in one batch (limit: {limit})", file=sys.stderr)
+            try:
+                cache_key_versions = {query: self._result_key(query, limit) for query in unique_queries}
+                vector_cache = {query: 'hit' if query in self._query_vectors else 'miss' for query in unique_queries}
+                embeddings = self.encode_queries(unique_queries)
+                raw = self._query_collection(
+                    query_embeddings=embeddings,
+                    n_results=min(limit * 5, 100),
+                    include=['documents', 'metadatas', 'distances']
+                )
+                collection_size = self.collection.count()
+                by_query = {}
+                for row, query in enumerate(unique_queries):
+                    has_matches = bool(raw['ids']) and row < len(raw['ids'])
+                    cache_key, version = cache_key_versions[query]
+                    by_query[query] = self._cache_result(cache_key, version, self._group_results(
+                        query, limit,
+                        raw['documents'][row] if has_matches else [],
+                        raw['metadatas'][row] if has_matches else [],
+                        raw['distances'][row] if has_matches else [],
+                        collection_size
+                    ), vector_cache[query])
+                for i in pending:
+                    results[i] = by_query[queries[i]]
+            except Exception as e:
+                for i in pending:
+                    results[i] = {'success': False, 'error': f'Semantic search failed: {str(e)}'}
+        
+        return results
     
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics about the ChromaDB collection."""
         try:
-            if not self.collection:
+            if not self.refresh_collection():
                 return {
                     'success': False,
                     'error': 'Collection not available'
@@ -215,7 +541,8 @@ class SemanticSearcher:
                 'total_documents': count,
                 'sample_videos': len(unique_videos),
                 'chunk_type_distribution': chunk_types,
-                'collection_name': 'video_embeddings',
+                'collection_name': self.collection_name,
+                'model': self.model_name,
                 'note': 'If title/summary counts are 0, videos need to be re-analyzed'
             }
             
@@ -227,17 +554,24 @@ class SemanticSearcher:
 
 def main():
     """Main function to handle command line execution."""
-    if len(sys.argv) != 3:
+    args = sys.argv[1:]
+    import_profile = '--import-profile' in args
+    # --batch: the first argument is a JSON file ('-' for stdin) holding a list of queries
+    batch = '--batch' in args
+    args = [arg for arg in args if arg not in ('--import-profile', '--batch')]
+    
+    if len(args) != 2:
         print(json.dumps({
             'success': False,
-            'error': 'Usage: python semantic_search.py "<query>" <limit>'
+            'error': 'Usage: python semantic_search.py "<query>" <limit> [--import-profile] | '
+                     '--batch <queries.json|-> <limit>'
         }))
         sys.exit(1)
     
-    query = sys.argv[1]
+    query = args[0]
     
     try:
-        limit = int(sys.argv[2])
+        limit = int(args[1])
         if limit < 1 or limit > 50:
             raise ValueError("Limit must be between 1 and 50")
     except ValueError as e:
@@ -247,9 +581,47 @@ def main():
         }))
         sys.exit(1)
     
+    if batch:
+        try:
+            if query == '-':
+                queries = json.load(sys.stdin)
+            else:
+                with open(query, 'r', encoding='utf-8') as f:
+                    queries = json.load(f)
+            if not isinstance(queries, list) or not queries:
+                raise ValueError('expected a non-empty JSON list of query strings')
+        except (OSError, ValueError) as e:
+            print(json.dumps({
+                'success': False,
+                'error': f'Invalid batch input: {str(e)}'
+            }))
+            sys.exit(1)
+    elif not query.strip():
+        print(json.dumps({
+            'success': False,
+            'error': 'Empty search query provided'
+        }))
+        sys.exit(1)
+    
     try:
         searcher = SemanticSearcher()
-        result = searcher.search(query, limit)
+        # Measured before searching: query encoding and the lazy model load are not startup
+        profile = get_import_profile()
+        if batch:
+            searches = searcher.search_batch(queries, limit)
+            result = {
+                'success': all(search['success'] for search in searches),
+                'searches': searches,
+                'total_queries': len(searches)
+            }
+        else:
+            result = searcher.search(query, limit)
+        
+        if not profile['within_budget']:
+            print(f"Warning: startup took {profile['startup_ms']}ms "
+                  f"(budget {profile['startup_budget_ms']}ms)", file=sys.stderr)
+        if import_profile:
+            result['import_profile'] = profile
         
         print(json.dumps(result, ensure_ascii=False, indent=2))
         
@@ -264,4 +636,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -9,7 +9,18 @@ using the DistilBERT model fine-tuned for sentiment analysis.
 import sys
 import json
 import os
-from typing import List, Dict, Any
+import time
+import argparse
+import re
+import sqlite3
+import hashlib
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
+import numpy as np
+# Before transformers: switches on strict offline mode ahead of the HF imports
+from model_backends import get_backend, load_sentiment_pipeline
 import torch
 from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
 import warnings
@@ -24,21 +35,283 @@ if sys.platform == 'win32':
 # Suppress warnings for cleaner output
 warnings.filterwarnings("ignore")
 
-class SentimentAnalyzer:
-    def __init__(self):
-        self.model_name = "distilbert-base-uncased-finetuned-sst-2-english"
-        self.device = 0 if torch.cuda.is_available() else -1
+SENTIMENT_MODEL_NAME = "distilbert-base-uncased-finetuned-sst-2-english"
+
+# Segments scored per forward pass
+DEFAULT_BATCH_SIZE = int(os.getenv('SENTIMENT_BATCH_SIZE', '32'))
+
+# Sliding-window scoring for segments longer than the model's token limit
+WINDOW_OVERLAP_TOKENS = int(os.getenv('SENTIMENT_WINDOW_OVERLAP', '64'))
+
+# On-disk cache of per-segment results (set SENTIMENT_CACHE=0 to disable)
+CACHE_ENABLED = os.getenv('SENTIMENT_CACHE', '1').lower() not in ('0', 'false', 'no')
+CACHE_PATH = os.getenv('SENTIMENT_CACHE_PATH', './cache/sentiment_cache.sqlite')
+
+# Optional downsampled timeline: number of time buckets (0 = off) and the
+# rolling-mean window, in buckets, used to smooth it
+TIMELINE_BUCKETS = int(os.getenv('SENTIMENT_TIMELINE_BUCKETS', '0'))
+TIMELINE_SMOOTHING = int(os.getenv('SENTIMENT_TIMELINE_SMOOTHING', '3'))
+
+# Segments per NDJSON record in --stream mode
+STREAM_BLOCK_SIZE = int(os.getenv('SENTIMENT_STREAM_BLOCK', '256'))
+
+# Multi-core mode: 'threads' or 'shards', and how many cores/processes to use
+# (0 workers = torch's default thread count)
+PARALLEL_MODE = os.getenv('SENTIMENT_PARALLEL', 'threads')
+PARALLEL_WORKERS = int(os.getenv('SENTIMENT_WORKERS', '0'))
+
+# Optional cheap first tier: segments the lexical scorer is sure about never
+# reach the model. Only segments of at most CASCADE_MAX_WORDS words are eligible.
+CASCADE_ENABLED = os.getenv('SENTIMENT_CASCADE', '0').lower() in ('1', 'true', 'yes')
+CASCADE_MAX_WORDS = int(os.getenv('SENTIMENT_CASCADE_MAX_WORDS', '6'))
+
+LABEL_CODES = {'negative': -1, 'neutral': 0, 'positive': 1}
+CODE_LABELS = {code: label for label, code in LABEL_CODES.items()}
+
+NEUTRAL_RESULT = {
+    'sentiment_label': 'neutral',
+    'sentiment_score': 0.0,
+    'confidence': 0.0
+}
+
+# Lexicon for the cascade's cheap tier. Filler-only segments are neutral;
+# short segments with clear polar words and no negation or contrast take
+# the word's polarity. Anything else goes to the model. Words that can carry
+# sentiment on their own ("like it", "right", "you mean it") are not filler.
+FILLER_WORDS = frozenset({
+    'a', 'ah', 'alright', 'all', 'and', 'applause', 'er', 'hey', 'hi', 'hmm', "it's",
+    'just', 'laughter', 'mhm', 'music', 'now', 'oh', 'ok', 'okay',
+    'so', 'the', 'then', 'uh', 'um', 'yeah', 'yep'
+})
+POSITIVE_WORDS = frozenset({
+    'amazing', 'awesome', 'beautiful', 'best', 'brilliant', 'excellent', 'fantastic',
+    'great', 'happy', 'love', 'loved', 'nice', 'perfect', 'thank', 'thanks', 'wonderful'
+})
+NEGATIVE_WORDS = frozenset({
+    'awful', 'bad', 'broken', 'disappointing', 'hate', 'hated', 'horrible', 'sad',
+    'terrible', 'ugly', 'useless', 'worst', 'wrong'
+})
+AMBIGUITY_WORDS = frozenset({
+    'but', 'however', 'although', 'though', 'no', 'not', 'never', 'nothing', 'nobody',
+    'hardly', 'without'
+})
+LEXICAL_SCORE = 0.9
+
+def compute_statistics(scores: np.ndarray, label_codes: np.ndarray) -> Dict[str, Any]:
+    """
+    Aggregate sentiment statistics over a whole transcript.
+    
+    Args:
+        scores: Normalized score per segment
+        label_codes: LABEL_CODES value per segment
         
-        try:
-            print("Loading sentiment analysis model...", file=sys.stderr)
-            self.sentiment_pipeline = pipeline(
-                "sentiment-analysis",
-                model=self.model_name,
-                device=self.device
+    Returns:
+        Dictionary with label counts, percentages and the average non-zero score
+    """
+    total_segments = int(label_codes.size)
+    positive_count = int(np.count_nonzero(label_codes == LABEL_CODES['positive']))
+    negative_count = int(np.count_nonzero(label_codes == LABEL_CODES['negative']))
+    neutral_count = total_segments - positive_count - negative_count
+    
+    # Segments that scored exactly 0 (skipped or failed) don't count towards the average
+    nonzero_scores = scores[scores != 0]
+    
+    return {
+        'total_segments': total_segments,
+        'positive_segments': positive_count,
+        'negative_segments': negative_count,
+        'neutral_segments': neutral_count,
+        'average_score': round(float(nonzero_scores.mean()), 4) if nonzero_scores.size else 0.0,
+        'positive_percentage': round((positive_count / total_segments) * 100, 2),
+        'negative_percentage': round((negative_count / total_segments) * 100, 2),
+        'neutral_percentage': round((neutral_count / total_segments) * 100, 2)
+    }
+
+def build_timeline(starts: np.ndarray, ends: np.ndarray, scores: np.ndarray,
+                   label_codes: np.ndarray, buckets: int,
+                   smoothing: int = TIMELINE_SMOOTHING) -> List[Dict[str, Any]]:
+    """
+    Downsample per-segment sentiment into a fixed number of time buckets.
+    
+    Each segment falls into the bucket containing its start time. Bucket
+    means are smoothed with a rolling mean over `smoothing` neighbouring
+    buckets, weighted by segment count so empty buckets don't drag the
+    curve towards zero.
+    
+    Args:
+        starts: Segment start times in seconds
+        ends: Segment end times in seconds
+        scores: Normalized score per segment
+        label_codes: LABEL_CODES value per segment
+        buckets: Number of time buckets to return
+        smoothing: Rolling-mean window in buckets (1 = no smoothing)
+        
+    Returns:
+        List of `buckets` dictionaries ordered by time
+        
+    Raises:
+        ValueError: If buckets is less than 1
+    """
+    if buckets < 1:
+        raise ValueError(f"Timeline needs at least 1 bucket, got {buckets}")
+    start_time = float(starts.min())
+    end_time = max(float(ends.max()), start_time + 1.0)
+    edges = np.linspace(start_time, end_time, buckets + 1)
+    bucket_index = np.clip(np.searchsorted(edges, starts, side='right') - 1, 0, buckets - 1)
+    
+    counts = np.bincount(bucket_index, minlength=buckets).astype(np.float64)
+    sums = np.bincount(bucket_index, weights=scores, minlength=buckets)
+    means = np.divide(sums, counts, out=np.zeros(buckets), where=counts > 0)
+    
+    # A window wider than the timeline would make mode='same' return more than `buckets` values
+    kernel = np.ones(min(max(1, smoothing), buckets))
+    smoothed_sums = np.convolve(sums, kernel, mode='same')
+    smoothed_counts = np.convolve(counts, kernel, mode='same')
+    smoothed = np.divide(smoothed_sums, smoothed_counts, out=np.zeros(buckets), where=smoothed_counts > 0)
+    
+    # Label histogram per bucket: rows follow CODE_LABELS order (-1, 0, 1)
+    codes = sorted(CODE_LABELS)
+    label_counts = np.stack([
+        np.bincount(bucket_index[label_codes == code], minlength=buckets) for code in codes
+    ])
+    dominant = np.argmax(label_counts, axis=0)
+    
+    return [
+        {
+            'start': round(float(edges[b]), 2),
+            'end': round(float(edges[b + 1]), 2),
+            'segment_count': int(counts[b]),
+            'average_score': round(float(means[b]), 4),
+            'smoothed_score': round(float(smoothed[b]), 4),
+            'dominant_label': CODE_LABELS[codes[dominant[b]]] if counts[b] else 'neutral'
+        }
+        for b in range(buckets)
+    ]
+
+class SentimentCache:
+    def __init__(self, path: str):
+        """
+        SQLite cache of segment results keyed by model plus normalized text.
+        
+        The connection is opened lazily (and reopened after a fork) so the
+        cache can be created in a parent process and used by its workers.
+        
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self._connection = None
+        self._pid = None
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._pid = os.getpid()
+            # WAL lets several analyzer processes read while one writes
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS sentiment_cache ('
+                'key TEXT PRIMARY KEY, sentiment_label TEXT, sentiment_score REAL, '
+                'confidence REAL, raw_label TEXT, created_at REAL)'
             )
-            print("Model loaded successfully", file=sys.stderr)
-        except Exception as e:
-            raise Exception(f"Failed to load sentiment model: {str(e)}")
+        return self._connection
+    
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Lowercase and collapse whitespace; the uncased model sees no difference."""
+        return re.sub(r'\s+', ' ', text).strip().lower()
+    
+    def make_key(self, model_key: str, text: str) -> str:
+        return hashlib.sha256(f"{model_key}\n{self.normalize_text(text)}".encode('utf-8')).hexdigest()
+    
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up many keys at once; returns only the keys that were found."""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(unique_keys), 500):
+            chunk = unique_keys[start:start + 500]
+            rows = self.connection.execute(
+                'SELECT key, sentiment_label, sentiment_score, confidence, raw_label '
+                f'FROM sentiment_cache WHERE key IN ({",".join("?" * len(chunk))})',
+                chunk
+            ).fetchall()
+            for key, label, score, confidence, raw_label in rows:
+                found[key] = {
+                    'sentiment_label': label,
+                    'sentiment_score': score,
+                    'confidence': confidence,
+                    'raw_label': raw_label
+                }
+        return found
+    
+    def put_many(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO sentiment_cache VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (key, r['sentiment_label'], r['sentiment_score'], r['confidence'], r.get('raw_label'), now)
+                    for key, r in entries.items()
+                ]
+            )
+
+class SentimentAnalyzer:
+    def __init__(self, sentiment_pipeline=None, backend: str = None,
+                 cache_path: Optional[str] = None, use_cache: Optional[bool] = None,
+                 parallel: Optional[str] = None, workers: Optional[int] = None,
+                 cascade: Optional[bool] = None):
+        self.model_name = SENTIMENT_MODEL_NAME
+        self.backend = get_backend(backend)
+        self.device = 0 if torch.cuda.is_available() and self.backend == 'torch' else -1
+        
+        # 'threads': one model, torch intra-op threads across `workers` cores.
+        # 'shards': `workers` processes with a model each, splitting the cores.
+        self.parallel = (parallel or PARALLEL_MODE).lower()
+        if self.parallel not in ('threads', 'shards'):
+            raise ValueError(f"Unknown parallel mode '{self.parallel}'. Use 'threads' or 'shards'")
+        self.workers = workers if workers is not None else PARALLEL_WORKERS
+        self.threads_per_worker = 1
+        self._shard_pool = None
+        # Threads mode applies its thread count only while score_texts runs
+        # (see torch_threads), not to the whole process from here
+        if self.parallel == 'shards':
+            self.workers = self.workers or max(1, (os.cpu_count() or 1) // 2)
+            self.threads_per_worker = max(1, (os.cpu_count() or 1) // self.workers)
+        
+        if sentiment_pipeline is not None:
+            # Reuse an already loaded pipeline (e.g. shared by the pre-fork server)
+            self.sentiment_pipeline = sentiment_pipeline
+        else:
+            try:
+                print(f"Loading sentiment analysis model ({self.backend} backend)...", file=sys.stderr)
+                self.sentiment_pipeline = load_sentiment_pipeline(
+                    self.model_name,
+                    backend=self.backend,
+                    device=self.device
+                )
+                print("Model loaded successfully", file=sys.stderr)
+            except Exception as e:
+                raise Exception(f"Failed to load sentiment model: {str(e)}")
+        
+        # Token budget per forward pass, excluding the [CLS]/[SEP] special tokens.
+        # model_max_length is a huge sentinel for tokenizers without a limit.
+        self.tokenizer = self.sentiment_pipeline.tokenizer
+        self.window_tokens = min(getattr(self.tokenizer, 'model_max_length', 512), 512) - 2
+        self.window_overlap = min(WINDOW_OVERLAP_TOKENS, self.window_tokens // 2)
+        
+        # Everything that changes a segment's score is part of the cache key
+        use_cache = CACHE_ENABLED if use_cache is None else use_cache
+        self.cache = SentimentCache(cache_path or CACHE_PATH) if use_cache else None
+        self.cache_model_key = f"{self.model_name}|{self.backend}|{self.window_tokens}/{self.window_overlap}"
+        self.cache_stats = {'hits': 0, 'misses': 0}
+        
+        self.cascade = CASCADE_ENABLED if cascade is None else cascade
+        self.cascade_stats = {'skipped': 0, 'lexical': 0, 'model': 0}
     
     def normalize_sentiment_score(self, label: str, score: float) -> float:
         """
@@ -73,6 +346,111 @@ class SentimentAnalyzer:
         else:
             return 'neutral'
     
+    def split_into_windows(self, tokens: List[Any]) -> List[List[Any]]:
+        """
+        Split a segment's tokens into overlapping windows that fit the model.
+        
+        Args:
+            tokens: Token IDs (or character offsets) of one segment, without
+                special tokens
+            
+        Returns:
+            List of token windows (a single window for short segments)
+        """
+        if len(tokens) <= self.window_tokens:
+            return [tokens]
+        
+        windows = []
+        step = self.window_tokens - self.window_overlap
+        for start in range(0, len(tokens), step):
+            windows.append(tokens[start:start + self.window_tokens])
+            if start + self.window_tokens >= len(tokens):
+                break
+        return windows
+    
+    def build_result(self, normalized_score: float, confidence: float, raw_label: str) -> Dict[str, Any]:
+        """
+        Turn a normalized score into a segment result.
+        
+        Args:
+            normalized_score: Score between -1 and 1
+            confidence: Model confidence (0-1)
+            raw_label: Model label ('POSITIVE' or 'NEGATIVE')
+            
+        Returns:
+            Dictionary with sentiment analysis results
+        """
+        # Classify the sentiment
+        sentiment_label = self.classify_sentiment(normalized_score)
+        
+        return {
+            'sentiment_label': sentiment_label,
+            'sentiment_score': round(normalized_score, 4),
+            'confidence': round(confidence, 4),
+            'raw_label': raw_label
+        }
+    
+    def aggregate_windows(self, predictions: List[Dict[str, Any]], weights: List[int]) -> Dict[str, Any]:
+        """
+        Combine the predictions of a segment's windows into one result.
+        
+        Scores are averaged weighted by each window's token count, so a short
+        tail window does not count as much as a full one. A single window is
+        returned unchanged.
+        
+        Args:
+            predictions: Pipeline outputs with 'label' and 'score', one per window
+            weights: Token count of each window
+            
+        Returns:
+            Dictionary with sentiment analysis results
+        """
+        if len(predictions) == 1:
+            prediction = predictions[0]
+            normalized_score = self.normalize_sentiment_score(prediction['label'], prediction['score'])
+            return self.build_result(normalized_score, prediction['score'], prediction['label'])
+        
+        total_weight = float(sum(weights))
+        normalized_score = sum(
+            self.normalize_sentiment_score(p['label'], p['score']) * w
+            for p, w in zip(predictions, weights)
+        ) / total_weight
+        confidence = sum(p['score'] * w for p, w in zip(predictions, weights)) / total_weight
+        raw_label = 'POSITIVE' if normalized_score >= 0 else 'NEGATIVE'
+        
+        result = self.build_result(normalized_score, confidence, raw_label)
+        result['windows'] = len(predictions)
+        return result
+    
+    def lexical_result(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Cheap first tier of the cascade: score a segment from a small lexicon.
+        
+        Args:
+            text: Text segment to analyze
+            
+        Returns:
+            Result dictionary if the segment is filler or short and clearly
+            polar, None if it is ambiguous and needs the model
+        """
+        words = re.findall(r"[a-z']+", text.lower())
+        if all(word in FILLER_WORDS for word in words):
+            # Filler ("okay so", "um yeah") or residue with no words at all
+            return {**NEUTRAL_RESULT, 'raw_label': 'LEXICAL'}
+        
+        if len(words) > CASCADE_MAX_WORDS:
+            return None
+        if any(word in AMBIGUITY_WORDS or word.endswith("n't") for word in words):
+            return None
+        
+        positive = sum(1 for word in words if word in POSITIVE_WORDS)
+        negative = sum(1 for word in words if word in NEGATIVE_WORDS)
+        if positive and not negative:
+            return self.build_result(LEXICAL_SCORE, LEXICAL_SCORE, 'LEXICAL')
+        if negative and not positive:
+            return self.build_result(-LEXICAL_SCORE, LEXICAL_SCORE, 'LEXICAL')
+        return None
+    
     def analyze_text_segment(self, text: str) -> Dict[str, Any]:
         """
         Analyze sentiment for a single text segment.
@@ -83,110 +461,346 @@ class SentimentAnalyzer:
         Returns:
             Dictionary with sentiment analysis results
         """
-        try:
-            # Skip very short text segments
+        return self.analyze_text_segments([text], batch_size=1)[0]
+    
+    def analyze_text_segments(self, texts: List[str], batch_size: int = None) -> List[Dict[str, Any]]:
+        """
+        Analyze many text segments with batched, length-bucketed inference.
+        
+        With the cascade enabled, segments lexical_result() is confident about
+        are answered without the model. Remaining segments are measured in
+        real tokens. Segments longer than the model's
+        window are split into overlapping windows whose scores are aggregated,
+        so the tail of a long segment is never dropped. All windows are sorted
+        by token count so each padded batch holds inputs of similar size,
+        scored batch_size at a time, and the results put back in the original
+        order.
+        
+        Args:
+            texts: Text segments to analyze
+            batch_size: Windows per forward pass (defaults to SENTIMENT_BATCH_SIZE)
+            
+        Returns:
+            One result dictionary per input text, in input order
+        """
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        results: List[Dict[str, Any]] = [None] * len(texts)
+        
+        pending = []
+        for i, text in enumerate(texts):
             if len(text.strip()) < 3:
-                return {
-                    'sentiment_label': 'neutral',
-                    'sentiment_score': 0.0,
-                    'confidence': 0.0
-                }
+                # Skip very short text segments
+                results[i] = dict(NEUTRAL_RESULT)
+                self.cascade_stats['skipped'] += 1
+                continue
             
-            # Truncate text if too long (BERT models have token limits)
-            max_length = 512
-            words = text.split()
-            if len(words) > max_length:
-                text = ' '.join(words[:max_length])
+            if self.cascade:
+                lexical = self.lexical_result(text)
+                if lexical is not None:
+                    results[i] = lexical
+                    self.cascade_stats['lexical'] += 1
+                    continue
             
-            # Get sentiment prediction
-            result = self.sentiment_pipeline(text)[0]
+            pending.append(i)
+        
+        self.cascade_stats['model'] += len(pending)
+        if not pending:
+            return results
+        
+        # Serve repeated text (intros, sponsor reads, re-analysis) from the cache
+        keys = {}
+        if self.cache is not None:
+            keys = {i: self.cache.make_key(self.cache_model_key, texts[i]) for i in pending}
+            try:
+                cached = self.cache.get_many(list(keys.values()))
+            except (sqlite3.Error, OSError) as e:
+                # e.g. an unwritable cache directory; carry on without the cache
+                print(f"Warning: Sentiment cache lookup failed, disabling the cache: {str(e)}", file=sys.stderr)
+                self.cache = None
+                cached = {}
             
-            # Normalize the score
-            normalized_score = self.normalize_sentiment_score(
-                result['label'], 
-                result['score']
-            )
+            misses = []
+            first_miss = {}  # key -> first segment index with that text
+            for i in pending:
+                if keys[i] in cached:
+                    results[i] = dict(cached[keys[i]])
+                else:
+                    misses.append(i)
+                    first_miss.setdefault(keys[i], i)
+            self.cache_stats['hits'] += len(pending) - len(misses)
+            self.cache_stats['misses'] += len(misses)
+            # Text repeated within this call is scored once and copied
+            duplicates = [i for i in misses if first_miss[keys[i]] != i]
+            pending = list(first_miss.values())
             
-            # Classify the sentiment
-            sentiment_label = self.classify_sentiment(normalized_score)
+            if not pending:
+                return results
+        
+        pending_texts = [texts[i] for i in pending]
+        if self.parallel == 'shards' and len(pending_texts) >= self.workers * batch_size:
+            scored = self.score_texts_sharded(pending_texts, batch_size)
+        else:
+            scored = self.score_texts(pending_texts, batch_size)
+        for i, result in zip(pending, scored):
+            results[i] = result
+        
+        if keys:
+            if self.cache is not None:
+                # Failed segments are not cached so they are retried next time
+                entries = {keys[i]: results[i] for i in pending if 'error' not in results[i]}
+                try:
+                    self.cache.put_many(entries)
+                except (sqlite3.Error, OSError) as e:
+                    print(f"Warning: Sentiment cache write failed, disabling the cache: {str(e)}", file=sys.stderr)
+                    self.cache = None
             
-            return {
-                'sentiment_label': sentiment_label,
-                'sentiment_score': round(normalized_score, 4),
-                'confidence': round(result['score'], 4),
-                'raw_label': result['label']
-            }
+            for i in duplicates:
+                results[i] = dict(results[first_miss[keys[i]]])
+        
+        return results
+    
+    @contextmanager
+    def torch_threads(self):
+        """
+        Use `workers` torch threads for the duration of the block ('threads' mode).
+        
+        torch's thread count is process-wide, so it is set around inference
+        and restored afterwards instead of being left changed for other models
+        sharing the process (model_worker.py, inference_server.py).
+        """
+        if self.parallel != 'threads' or self.workers <= 0:
+            yield
+            return
+        previous = torch.get_num_threads()
+        torch.set_num_threads(self.workers)
+        try:
+            yield
+        finally:
+            torch.set_num_threads(previous)
+    
+    def score_texts(self, texts: List[str], batch_size: int) -> List[Dict[str, Any]]:
+        """
+        Run the model over texts in this process.
+        
+        Args:
+            texts: Non-trivial text segments (already filtered and de-duplicated)
+            batch_size: Windows per forward pass
             
-        except Exception as e:
-            print(f"Warning: Failed to analyze segment: {str(e)}", file=sys.stderr)
-            return {
-                'sentiment_label': 'neutral',
-                'sentiment_score': 0.0,
-                'confidence': 0.0,
-                'error': str(e)
-            }
+        Returns:
+            One result dictionary per text, in input order
+        """
+        # One tokenizer call for every segment, then cut long ones into windows.
+        # Fast tokenizers give character offsets, so windows are cut from the
+        # original text; decoding window IDs turns word pieces into '##' fragments.
+        use_offsets = getattr(self.tokenizer, 'is_fast', False)
+        encoded = self.tokenizer(texts, add_special_tokens=False, return_offsets_mapping=use_offsets)
+        windows = []  # (segment index, window text, token count)
+        for i, ids in enumerate(encoded['input_ids']):
+            if len(ids) <= self.window_tokens:
+                windows.append((i, texts[i], len(ids)))
+            elif use_offsets:
+                for window_offsets in self.split_into_windows(encoded['offset_mapping'][i]):
+                    text = texts[i][window_offsets[0][0]:window_offsets[-1][1]]
+                    windows.append((i, text, len(window_offsets)))
+            else:
+                for window_ids in self.split_into_windows(ids):
+                    windows.append((i, self.tokenizer.decode(window_ids), len(window_ids)))
+        
+        # Bucket by length: neighbours in this order need little padding
+        order = sorted(range(len(windows)), key=lambda w: windows[w][2])
+        predictions: List[Any] = [None] * len(windows)
+        
+        with self.torch_threads():
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                try:
+                    outputs = self.sentiment_pipeline(
+                        [windows[w][1] for w in batch],
+                        batch_size=len(batch),
+                        truncation=True
+                    )
+                    for w, output in zip(batch, outputs):
+                        predictions[w] = output
+                except Exception as e:
+                    # Fall back to one-by-one so a single bad segment only affects itself
+                    print(f"Warning: Batch failed ({str(e)}), retrying segments individually", file=sys.stderr)
+                    for w in batch:
+                        try:
+                            predictions[w] = self.sentiment_pipeline(windows[w][1], truncation=True)[0]
+                        except Exception as window_error:
+                            print(f"Warning: Failed to analyze segment: {str(window_error)}", file=sys.stderr)
+                            predictions[w] = window_error
+                
+                if len(texts) > 1:
+                    print(f"Processed {min(start + batch_size, len(order))}/{len(order)} windows...", file=sys.stderr)
+        
+        # Group window predictions back per segment (windows are in segment order)
+        grouped: Dict[int, List[int]] = {}
+        for w, (i, _, _) in enumerate(windows):
+            grouped.setdefault(i, []).append(w)
+        
+        results = []
+        for i in range(len(texts)):
+            window_indices = grouped[i]
+            failures = [predictions[w] for w in window_indices if isinstance(predictions[w], Exception)]
+            if failures:
+                results.append({**NEUTRAL_RESULT, 'error': str(failures[0])})
+                continue
+            results.append(self.aggregate_windows(
+                [predictions[w] for w in window_indices],
+                [windows[w][2] for w in window_indices]
+            ))
+        
+        return results
+    
+    def score_texts_sharded(self, texts: List[str], batch_size: int) -> List[Dict[str, Any]]:
+        """
+        Split texts into contiguous shards and score them in a process pool.
+        
+        Each worker process holds its own model and uses threads_per_worker
+        torch threads. Shards are contiguous and results are concatenated in
+        shard order, so the output keeps the input (timestamp) order.
+        
+        Args:
+            texts: Non-trivial text segments
+            batch_size: Windows per forward pass inside each worker
+            
+        Returns:
+            One result dictionary per text, in input order
+        """
+        if not texts:
+            return []
+        shard_size = -(-len(texts) // self.workers)  # ceiling division
+        shards = [texts[start:start + shard_size] for start in range(0, len(texts), shard_size)]
+        print(f"Scoring {len(texts)} segments in {len(shards)} shards "
+              f"({self.threads_per_worker} threads each)...", file=sys.stderr)
+        
+        results = []
+        for shard_results in self.shard_pool.map(_score_shard, shards, [batch_size] * len(shards)):
+            results.extend(shard_results)
+        return results
+    
+    @property
+    def shard_pool(self) -> ProcessPoolExecutor:
+        """Worker processes for 'shards' mode, started on first use."""
+        if self._shard_pool is None:
+            # spawn: forking a process that has already initialised torch threads is unsafe
+            self._shard_pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_shard_worker,
+                initargs=(self.backend, self.threads_per_worker)
+            )
+        return self._shard_pool
+    
+    def close(self) -> None:
+        """Stop the shard worker processes, if any were started."""
+        if self._shard_pool is not None:
+            self._shard_pool.shutdown()
+            self._shard_pool = None
+    
+    def build_sentiment_record(self, segment: Dict[str, Any], sentiment_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine a transcript segment with its sentiment result for storage."""
+        text = segment.get('text', '').strip()
+        return {
+            'timestamp': segment.get('start', 0),
+            'sentiment_label': sentiment_result['sentiment_label'],
+            'sentiment_score': sentiment_result['sentiment_score'],
+            'text_segment': text[:200] + ('...' if len(text) > 200 else ''),  # Truncate for storage
+            'confidence': sentiment_result.get('confidence', 0.0)
+        }
     
-    def analyze_transcript(self, transcript_segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def analyze_transcript(self, transcript_segments: List[Dict[str, Any]],
+                           batch_size: int = None, timeline_buckets: int = None,
+                           include_segments: bool = True,
+                           on_batch: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None) -> Dict[str, Any]:
         """
         Analyze sentiment for all transcript segments.
         
         Args:
             transcript_segments: List of transcript segments with text, start, and duration
+            batch_size: Segments per forward pass (defaults to SENTIMENT_BATCH_SIZE)
+            timeline_buckets: Also return a smoothed timeline with this many
+                time buckets (defaults to SENTIMENT_TIMELINE_BUCKETS, 0 = off)
+            include_segments: Return the per-segment 'sentiments' list; turn
+                off with a timeline to keep the payload bounded for long videos
+            on_batch: Streaming callback. When given, segments are processed in
+                contiguous blocks of SENTIMENT_STREAM_BLOCK and each block's
+                records are passed to on_batch(offset, records) as soon as they
+                are ready instead of being kept for the final result
             
         Returns:
             Dictionary containing sentiment analysis results
         """
         try:
-            sentiments = []
             total_segments = len(transcript_segments)
+            timeline_buckets = TIMELINE_BUCKETS if timeline_buckets is None else timeline_buckets
             
             print(f"Analyzing sentiment for {total_segments} segments...", file=sys.stderr)
             
-            for i, segment in enumerate(transcript_segments):
-                if i % 10 == 0:  # Progress indicator
-                    print(f"Processing segment {i + 1}/{total_segments}...", file=sys.stderr)
-                
-                text = segment.get('text', '').strip()
-                timestamp = segment.get('start', 0)
-                
-                # Analyze sentiment for this segment
-                sentiment_result = self.analyze_text_segment(text)
+            self.cache_stats = {'hits': 0, 'misses': 0}
+            self.cascade_stats = {'skipped': 0, 'lexical': 0, 'model': 0}
+            block_size = max(1, STREAM_BLOCK_SIZE if on_batch else total_segments)
+            keep_records = include_segments and on_batch is None
+            sentiments = []
+            
+            # Only these arrays are kept for the aggregates, not the records
+            scores = np.zeros(total_segments, dtype=np.float64)
+            label_codes = np.zeros(total_segments, dtype=np.int8)
+            
+            for offset in range(0, total_segments, block_size):
+                block = transcript_segments[offset:offset + block_size]
+                texts = [segment.get('text', '').strip() for segment in block]
+                results = self.analyze_text_segments(texts, batch_size=batch_size)
                 
-                # Add segment information
-                sentiment_data = {
-                    'timestamp': timestamp,
-                    'sentiment_label': sentiment_result['sentiment_label'],
-                    'sentiment_score': sentiment_result['sentiment_score'],
-                    'text_segment': text[:200] + ('...' if len(text) > 200 else ''),  # Truncate for storage
-                    'confidence': sentiment_result.get('confidence', 0.0)
-                }
+                records = [
+                    self.build_sentiment_record(segment, result)
+                    for segment, result in zip(block, results)
+                ]
+                for i, record in enumerate(records, start=offset):
+                    scores[i] = record['sentiment_score']
+                    label_codes[i] = LABEL_CODES[record['sentiment_label']]
                 
-                sentiments.append(sentiment_data)
+                if on_batch is not None:
+                    on_batch(offset, records)
+                elif keep_records:
+                    sentiments.extend(records)
             
             # Calculate overall statistics
-            scores = [s['sentiment_score'] for s in sentiments if s['sentiment_score'] != 0]
-            positive_count = len([s for s in sentiments if s['sentiment_label'] == 'positive'])
-            negative_count = len([s for s in sentiments if s['sentiment_label'] == 'negative'])
-            neutral_count = len([s for s in sentiments if s['sentiment_label'] == 'neutral'])
-            
-            statistics = {
-                'total_segments': total_segments,
-                'positive_segments': positive_count,
-                'negative_segments': negative_count,
-                'neutral_segments': neutral_count,
-                'average_score': round(sum(scores) / len(scores), 4) if scores else 0.0,
-                'positive_percentage': round((positive_count / total_segments) * 100, 2),
-                'negative_percentage': round((negative_count / total_segments) * 100, 2),
-                'neutral_percentage': round((neutral_count / total_segments) * 100, 2)
-            }
+            statistics = compute_statistics(scores, label_codes)
             
             print("Sentiment analysis completed", file=sys.stderr)
             
-            return {
-                'success': True,
-                'sentiments': sentiments,
-                'statistics': statistics
+            result = {'success': True}
+            if keep_records:
+                result['sentiments'] = sentiments
+            result['statistics'] = statistics
+            result['cache'] = {
+                'enabled': self.cache is not None,
+                **self.cache_stats
             }
+            result['cascade'] = {
+                'enabled': self.cascade,
+                **self.cascade_stats,
+                # Share of all segments answered by each tier
+                'lexical_fraction': round(self.cascade_stats['lexical'] / total_segments, 4) if total_segments else 0.0,
+                'model_fraction': round(self.cascade_stats['model'] / total_segments, 4) if total_segments else 0.0
+            }
+            
+            if timeline_buckets and total_segments:
+                starts = np.fromiter(
+                    (float(segment.get('start', 0)) for segment in transcript_segments),
+                    dtype=np.float64, count=total_segments
+                )
+                durations = np.fromiter(
+                    (float(segment.get('duration', 0)) for segment in transcript_segments),
+                    dtype=np.float64, count=total_segments
+                )
+                result['timeline'] = build_timeline(
+                    starts, starts + durations, scores, label_codes, timeline_buckets
+                )
+            
+            return result
             
         except Exception as e:
             return {
@@ -194,18 +808,193 @@ class SentimentAnalyzer:
                 'error': f'Sentiment analysis failed: {str(e)}'
             }
 
-def main():
-    """Main function to handle command line execution."""
-    if len(sys.argv) != 2:
+# Analyzer owned by each shard worker process, created by _init_shard_worker
+_shard_analyzer = None
+
+def _init_shard_worker(backend: str, threads: int) -> None:
+    global _shard_analyzer
+    torch.set_num_threads(threads)
+    # The parent process does the cache lookups; workers only run the model
+    _shard_analyzer = SentimentAnalyzer(backend=backend, use_cache=False, parallel='threads', workers=0)
+
+def _score_shard(texts: List[str], batch_size: int) -> List[Dict[str, Any]]:
+    return _shard_analyzer.score_texts(texts, batch_size)
+
+class JsonArgumentParser(argparse.ArgumentParser):
+    """ArgumentParser that reports usage errors as the JSON the Node bridge expects."""
+    def error(self, message):
         print(json.dumps({
             'success': False,
-            'error': 'Usage: python sentiment_analyzer.py "<transcript_segments_json_file>"'
+            'error': f'{message}. {self.format_usage().strip()}'
         }))
         sys.exit(1)
+
+def positive_int(value: str) -> int:
+    """argparse type for options that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def benchmark_batching(analyzer: SentimentAnalyzer, transcript_segments: List[Dict[str, Any]],
+                       batch_size: int = None) -> Dict[str, Any]:
+    """
+    Compare per-segment inference with batched inference on the same segments.
+    
+    Returns:
+        Timings, speedup and whether both paths produced identical results
+    """
+    texts = [segment.get('text', '').strip() for segment in transcript_segments]
+    # Measure inference, not cache lookups
+    analyzer.cache = None
+    
+    started = time.perf_counter()
+    sequential = [analyzer.analyze_text_segment(text) for text in texts]
+    sequential_seconds = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    batched = analyzer.analyze_text_segments(texts, batch_size=batch_size)
+    batched_seconds = time.perf_counter() - started
+    
+    mismatches = sum(
+        1 for a, b in zip(sequential, batched)
+        if (a['sentiment_label'], a['sentiment_score']) != (b['sentiment_label'], b['sentiment_score'])
+    )
+    
+    return {
+        'success': True,
+        'segments': len(texts),
+        'batch_size': batch_size or DEFAULT_BATCH_SIZE,
+        'sequential_seconds': round(sequential_seconds, 3),
+        'batched_seconds': round(batched_seconds, 3),
+        'speedup': round(sequential_seconds / batched_seconds, 2) if batched_seconds else 0.0,
+        'mismatched_segments': mismatches,
+        'identical': mismatches == 0
+    }
+
+def benchmark_cascade(analyzer: SentimentAnalyzer, transcript_segments: List[Dict[str, Any]],
+                      batch_size: int = None) -> Dict[str, Any]:
+    """
+    Compare model-only scoring with the lexical cascade on the same segments.
+    
+    Returns:
+        Routing fractions, timings and how often the lexical tier disagrees
+        with the model on the segments it answered
+    """
+    texts = [segment.get('text', '').strip() for segment in transcript_segments]
+    analyzer.cache = None
+    
+    analyzer.cascade = False
+    started = time.perf_counter()
+    reference = analyzer.analyze_text_segments(texts, batch_size=batch_size)
+    model_seconds = time.perf_counter() - started
+    
+    analyzer.cascade = True
+    analyzer.cascade_stats = {'skipped': 0, 'lexical': 0, 'model': 0}
+    started = time.perf_counter()
+    cascaded = analyzer.analyze_text_segments(texts, batch_size=batch_size)
+    cascade_seconds = time.perf_counter() - started
+    
+    lexical = [i for i, result in enumerate(cascaded) if result.get('raw_label') == 'LEXICAL']
+    disagreements = sum(
+        1 for i in lexical if reference[i]['sentiment_label'] != cascaded[i]['sentiment_label']
+    )
+    
+    return {
+        'success': True,
+        'segments': len(texts),
+        'routing': analyzer.cascade_stats,
+        'lexical_fraction': round(len(lexical) / len(texts), 4) if texts else 0.0,
+        'model_seconds': round(model_seconds, 3),
+        'cascade_seconds': round(cascade_seconds, 3),
+        'speedup': round(model_seconds / cascade_seconds, 2) if cascade_seconds else 0.0,
+        'lexical_disagreements': disagreements,
+        # Only lexically answered segments can disagree, so they are the denominator
+        'label_agreement': round(1 - disagreements / len(lexical), 4) if lexical else 1.0
+    }
+
+def benchmark_scaling(transcript_segments: List[Dict[str, Any]], max_workers: int,
+                      batch_size: int = None, backend: str = None) -> Dict[str, Any]:
+    """
+    Measure how both parallel modes scale from 1 to max_workers cores.
+    
+    Worker counts double from 1 up to max_workers. Pool start-up and model
+    loading are excluded: each configuration is warmed up before timing.
+    
+    Returns:
+        Per-mode timings, segments/second and speedup relative to one core
+    """
+    texts = [segment.get('text', '').strip() for segment in transcript_segments]
+    texts = [text for text in texts if len(text) >= 3]
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    
+    counts = []
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    
+    runs = {'threads': [], 'shards': []}
+    for mode in runs:
+        for workers in counts:
+            analyzer = SentimentAnalyzer(backend=backend, use_cache=False, parallel=mode, workers=workers)
+            score = analyzer.score_texts_sharded if mode == 'shards' else analyzer.score_texts
+            try:
+                score(texts[:batch_size * workers], batch_size)  # warm-up
+                started = time.perf_counter()
+                score(texts, batch_size)
+                seconds = time.perf_counter() - started
+            finally:
+                analyzer.close()
+            
+            runs[mode].append({
+                'workers': workers,
+                'seconds': round(seconds, 3),
+                'segments_per_second': round(len(texts) / seconds, 1) if seconds else 0.0
+            })
+        
+        baseline = runs[mode][0]['seconds']
+        for run in runs[mode]:
+            run['speedup'] = round(baseline / run['seconds'], 2) if run['seconds'] else 0.0
+    
+    return {
+        'success': True,
+        'segments': len(texts),
+        'batch_size': batch_size,
+        'cpu_count': os.cpu_count(),
+        'runs': runs
+    }
+
+def main():
+    """Main function to handle command line execution."""
+    parser = JsonArgumentParser(prog='sentiment_analyzer.py')
+    parser.add_argument('input', help='Transcript segments JSON file (or a JSON string)')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Segments per forward pass (default: SENTIMENT_BATCH_SIZE or 32)')
+    parser.add_argument('--timeline-buckets', type=positive_int, default=None,
+                        help='Add a smoothed timeline with this many time buckets')
+    parser.add_argument('--timeline-only', action='store_true',
+                        help='Omit per-segment sentiments (use with --timeline-buckets)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Write NDJSON: one record per completed block, then a summary record')
+    parser.add_argument('--parallel', choices=['threads', 'shards'], default=None,
+                        help='Multi-core mode (default: SENTIMENT_PARALLEL or threads)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Threads (threads mode) or processes (shards mode); default SENTIMENT_WORKERS')
+    parser.add_argument('--cascade', action='store_true', default=None,
+                        help='Answer filler and clearly polar short segments with a lexicon, not the model')
+    parser.add_argument('--benchmark-cascade', action='store_true',
+                        help='Compare model-only scoring with the cascade (routing, speed, agreement)')
+    parser.add_argument('--benchmark-scaling', action='store_true',
+                        help='Report scaling of both parallel modes from 1 to --workers cores')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Time per-segment vs batched inference instead of returning sentiments')
+    args = parser.parse_args()
     
     try:
         # Read transcript segments from file (to avoid Windows PowerShell JSON escaping issues)
-        input_arg = sys.argv[1]
+        input_arg = args.input
         if os.path.exists(input_arg):
             # It's a file path
             with open(input_arg, 'r', encoding='utf-8') as f:
@@ -225,10 +1014,48 @@ def main():
             sys.exit(1)
         
         # Initialize and run sentiment analyzer
-        analyzer = SentimentAnalyzer()
-        result = analyzer.analyze_transcript(transcript_segments)
+        if args.benchmark_scaling:
+            result = benchmark_scaling(
+                transcript_segments, args.workers or os.cpu_count() or 1, args.batch_size
+            )
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+            sys.exit(0)
         
-        print(json.dumps(result, ensure_ascii=False, indent=2))
+        analyzer = SentimentAnalyzer(parallel=args.parallel, workers=args.workers, cascade=args.cascade)
+        try:
+            if args.benchmark:
+                result = benchmark_batching(analyzer, transcript_segments, args.batch_size)
+            elif args.benchmark_cascade:
+                result = benchmark_cascade(analyzer, transcript_segments, args.batch_size)
+            else:
+                on_batch = None
+                if args.stream:
+                    total_segments = len(transcript_segments)
+                    
+                    def on_batch(offset: int, records: List[Dict[str, Any]]) -> None:
+                        print(json.dumps({
+                            'type': 'batch',
+                            'offset': offset,
+                            'completed': offset + len(records),
+                            'total': total_segments,
+                            'sentiments': records
+                        }, ensure_ascii=False), flush=True)
+                
+                result = analyzer.analyze_transcript(
+                    transcript_segments,
+                    batch_size=args.batch_size,
+                    timeline_buckets=args.timeline_buckets,
+                    include_segments=not args.timeline_only,
+                    on_batch=on_batch
+                )
+        finally:
+            analyzer.close()
+        
+        if args.stream:
+            # Final summary record closes the NDJSON stream
+            print(json.dumps({'type': 'summary', **result}, ensure_ascii=False))
+        else:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
         
         # Exit with appropriate code
         sys.exit(0 if result['success'] else 1)
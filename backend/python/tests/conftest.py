@@ -0,0 +1,50 @@
+import os
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+# The scripts are flat modules next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeEmbeddingModel:
+    """Deterministic SentenceTransformer stand-in: hashed bag of words."""
+
+    max_seq_length = 128
+
+    def __init__(self, dimension: int = 32):
+        self.dimension = dimension
+        self.encode_calls = 0
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, convert_to_numpy=True,
+               show_progress_bar=False, **kwargs):
+        self.encode_calls += 1
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i, zlib.crc32(word.encode('utf-8')) % self.dimension] += 1.0
+            vectors[i, -1] += 0.01
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+@pytest.fixture
+def fake_model():
+    return FakeEmbeddingModel()
+
+
+@pytest.fixture
+def store_env(tmp_path, monkeypatch):
+    """Run in an empty directory with every store and cache pointed inside it."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('CHROMA_PERSIST_DIR', str(tmp_path / 'chromadb'))
+    monkeypatch.setenv('FLAT_STORE_DIR', str(tmp_path / 'flat_index'))
+    monkeypatch.setenv('MODEL_REGISTRY_FILE', str(tmp_path / 'model_registry.json'))
+    monkeypatch.setenv('EMBEDDING_CACHE_DIR', '')
+    return tmp_path
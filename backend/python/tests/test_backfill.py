@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip('chromadb')
+pytest.importorskip('sentence_transformers')
+
+from conftest import FakeEmbeddingModel
+
+
+def _store(embedder, video_id, text):
+    result = embedder.store_video_embeddings(
+        video_id, text, [{'text': text, 'start': 0.0, 'duration': 4.0}], title=video_id
+    )
+    assert result['success'], result
+
+
+def _video_documents(embedder, video_id):
+    stored = embedder.collection.get(where={'video_id': video_id}, include=['metadatas'])
+    return dict(zip(stored['ids'], stored['metadatas']))
+
+
+@pytest.mark.parametrize('backend', ['chroma', 'flat'])
+def test_backfill_keeps_dual_written_videos(store_env, fake_model, monkeypatch, backend):
+    monkeypatch.setenv('VECTOR_STORE_BACKEND', backend)
+    import embedding_generator
+    import model_registry
+    new_model = FakeEmbeddingModel(dimension=48)
+    monkeypatch.setattr(embedding_generator, 'load_embedding_model', lambda name, backend=None: new_model)
+
+    legacy = embedding_generator.EmbeddingGenerator(embedding_model=fake_model)
+    _store(legacy, 'before', 'stored before the migration started')
+    model_registry.register_model('new-model', 48)
+    model_registry.start_dual_write('new-model')
+    legacy = embedding_generator.EmbeddingGenerator(embedding_model=fake_model)
+    _store(legacy, 'during', 'stored while dual-writing')
+
+    target = embedding_generator.EmbeddingGenerator(model_name='new-model', dual_write=False)
+    # Stand-in for the new model cutting the transcript differently
+    _store(target, 'during', 'stored while dual-writing, chunked for the new model')
+    dual_written = _video_documents(target, 'during')
+    assert dual_written
+
+    summary = embedding_generator.run_backfill(target, legacy.collection, videos_per_batch=1)
+
+    assert summary['videos'] == 2
+    assert summary['videos_skipped'] == 1
+    # Used to be replaced by copies of the legacy collection's chunks
+    assert _video_documents(target, 'during') == dual_written
+    copied = _video_documents(target, 'before')
+    assert copied and all(m['backfilled_from'] == legacy.collection_name for m in copied.values())
+
+    # Resuming re-encodes nothing
+    again = embedding_generator.run_backfill(target, legacy.collection, videos_per_batch=1)
+    assert again['documents_embedded'] == 0
+    assert again['videos_skipped'] == 1
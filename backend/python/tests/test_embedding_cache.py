@@ -0,0 +1,70 @@
+import numpy as np
+
+import embedding_cache
+
+
+def _open(tmp_path, monkeypatch, **env):
+    monkeypatch.setenv('EMBEDDING_CACHE_DIR', str(tmp_path / 'cache'))
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return embedding_cache.open_embedding_cache('test-model', 'torch')
+
+
+def test_settings_are_read_when_the_cache_is_opened(tmp_path, monkeypatch):
+    # Set after the module was imported, as load_dotenv() in a script would
+    cache = _open(tmp_path, monkeypatch, EMBEDDING_CACHE_DTYPE='float16', EMBEDDING_CACHE_MAX_MB='1')
+
+    assert cache.dtype == np.float16
+    assert cache.max_bytes == 1024 * 1024
+
+
+def test_hits_skip_the_encoder_and_do_not_write_on_lookup(tmp_path, monkeypatch, fake_model):
+    cache = _open(tmp_path, monkeypatch)
+    encode = lambda texts: fake_model.encode(texts, normalize_embeddings=True)
+
+    first = cache.encode(['alpha', 'beta', 'alpha'], encode)
+    calls = fake_model.encode_calls
+    second = cache.encode(['beta', 'alpha'], encode)
+
+    assert fake_model.encode_calls == calls
+    np.testing.assert_array_equal(second, first[[1, 0]])
+    assert second.flags.writeable
+    # Last-use times wait in memory until the next write
+    assert set(cache._touched) == {cache.make_key('alpha'), cache.make_key('beta')}
+    cache.flush_touches()
+    assert not cache._touched
+
+
+def test_compaction_keeps_recently_used_entries(tmp_path, monkeypatch, fake_model):
+    cache = _open(tmp_path, monkeypatch)
+    encode = lambda texts: fake_model.encode(texts, normalize_embeddings=True)
+    cache.encode(['old'], encode)
+    cache.encode(['new'], encode)
+    cache.encode(['old'], encode)  # hit, only pending in memory
+
+    row_bytes = fake_model.get_sentence_embedding_dimension() * 4
+    assert cache.compact(target_bytes=row_bytes) == {'entries_before': 2, 'entries_after': 1}
+    assert 0 in cache.get_many(['old'])
+
+
+def test_cache_opened_on_one_thread_hits_on_the_encode_thread(tmp_path, monkeypatch, fake_model):
+    import asyncio
+    from inference_server import MicroBatcher
+
+    cache = _open(tmp_path, monkeypatch)
+    encode = lambda texts: fake_model.encode(texts, normalize_embeddings=True)
+    stored = cache.encode(['warm query'], encode)
+    calls = fake_model.encode_calls
+
+    async def submit():
+        # MicroBatcher encodes on its own 'encode' thread, as in inference_server.py
+        batcher = MicroBatcher(lambda texts: cache.encode(texts, encode), max_batch_size=4, max_wait_ms=1.0)
+        batcher.start()
+        return await batcher.submit('warm query')
+
+    vector = asyncio.run(submit())
+
+    # Used to fail with sqlite3.ProgrammingError, swallowed as a cache miss
+    assert fake_model.encode_calls == calls
+    assert cache.stats['hits'] == 1
+    np.testing.assert_array_equal(vector, stored[0])
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip('chromadb')
+pytest.importorskip('sentence_transformers')
+
+
+def test_hnsw_settings_are_read_when_collections_are_created(store_env, fake_model, monkeypatch):
+    monkeypatch.setenv('VECTOR_STORE_BACKEND', 'chroma')
+    monkeypatch.setenv('HNSW_M', 'sixteen')
+    import embedding_generator
+
+    with pytest.raises(Exception, match='HNSW_M'):
+        embedding_generator.EmbeddingGenerator(embedding_model=fake_model)
+
+    monkeypatch.setenv('HNSW_M', '8')
+    embedder = embedding_generator.EmbeddingGenerator(embedding_model=fake_model)
+    assert embedder.collection.metadata['hnsw:M'] == 8
+    assert embedder.create_staging_collection().metadata['hnsw:M'] == 8
+
+
+def test_inserting_an_early_chunk_keeps_the_later_chunks(store_env, fake_model, monkeypatch):
+    monkeypatch.setenv('VECTOR_STORE_BACKEND', 'chroma')
+    import embedding_generator
+
+    embedder = embedding_generator.EmbeddingGenerator(embedding_model=fake_model, dual_write=False)
+    chunk_texts = ['intro to the topic', 'gradient descent', 'thanks for watching', 'thanks for watching']
+    monkeypatch.setattr(embedder, 'chunk_segments', lambda segments: [
+        {'text': text, 'start': float(i), 'end': float(i + 1), 'word_count': len(text.split())}
+        for i, text in enumerate(chunk_texts)
+    ])
+
+    first = embedder.store_video_embeddings('v1', ' '.join(chunk_texts), [], title='')
+    assert first['success'], first
+    assert first['documents_embedded'] == 4
+    assert embedder.collection.count() == 4
+
+    # Shifts the position of every later chunk
+    chunk_texts.insert(0, 'previously on this channel')
+    second = embedder.store_video_embeddings('v1', ' '.join(chunk_texts), [], title='')
+    assert second['success'], second
+    assert (second['documents_embedded'], second['documents_unchanged'], second['documents_deleted']) == (1, 4, 0)
+    assert embedder.collection.count() == 5
@@ -0,0 +1,262 @@
+import os
+import subprocess
+import sys
+import textwrap
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import vector_store
+from vector_store import FlatVectorClient, evaluate_recall, _matches
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _unit_vectors(count, dimension=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _metadata(i):
+    return {
+        'video_id': f'video{i % 5}',
+        'chunk_type': ('title', 'summary', 'transcript')[i % 3],
+        'chunk_index': i,
+        'estimated_timestamp': float(i)
+    }
+
+
+@pytest.fixture
+def collection(tmp_path):
+    return FlatVectorClient(str(tmp_path / 'flat')).create_collection('docs')
+
+
+def _fill(collection, count=60, dimension=16):
+    vectors = _unit_vectors(count, dimension)
+    collection.upsert(
+        ids=[f'doc{i}' for i in range(count)],
+        embeddings=vectors,
+        metadatas=[_metadata(i) for i in range(count)],
+        documents=[f'text {i}' for i in range(count)]
+    )
+    return vectors
+
+
+def test_upsert_delete_and_requery(collection):
+    vectors = _fill(collection)
+    assert collection.count() == 60
+
+    found = collection.query([vectors[7]], n_results=3)
+    assert found['ids'][0][0] == 'doc7'
+    assert found['distances'][0][0] == pytest.approx(0.0, abs=1e-5)
+
+    # Overwrite in place: same row, new vector and document
+    collection.upsert(ids=['doc7'], embeddings=[vectors[8]], metadatas=[_metadata(7)], documents=['moved'])
+    assert collection.count() == 60
+    assert set(collection.query([vectors[8]], n_results=2)['ids'][0]) == {'doc7', 'doc8'}
+    assert collection.get(ids=['doc7'])['documents'] == ['moved']
+
+    collection.delete(ids=['doc7', 'doc8'])
+    assert collection.count() == 58
+    remaining = collection.query([vectors[8]], n_results=58)['ids'][0]
+    assert 'doc7' not in remaining and 'doc8' not in remaining
+    assert len(remaining) == 58
+
+    collection.delete(where={'video_id': 'video0'})
+    assert all(m['video_id'] != 'video0' for m in collection.get()['metadatas'])
+
+    # New rows after deletes do not reuse or clobber live ones
+    collection.upsert(ids=['new'], embeddings=[vectors[0]], metadatas=[_metadata(1)], documents=['new'])
+    assert collection.query([vectors[0]], n_results=1)['ids'][0] == ['new']
+    assert collection.get(ids=['doc1'])['documents'] == ['text 1']
+
+
+def test_one_store_is_queried_from_several_threads(collection):
+    vectors = _fill(collection)
+
+    def lookup(i):
+        # Some threads also write, forcing the others to notice the new manifest
+        if i % 10 == 0:
+            collection.upsert(ids=[f'extra{i}'], embeddings=[-vectors[i % 60]], metadatas=[_metadata(i)])
+        return collection.query([vectors[i % 60]], n_results=1, where={'video_id': f'video{i % 5}'})['ids'][0]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        found = list(executor.map(lookup, range(200)))
+
+    # Used to raise "SQLite objects created in a thread can only be used in that same thread"
+    assert found == [[f'doc{i % 60}'] for i in range(200)]
+    assert collection.count() == 80
+
+
+WRITER = textwrap.dedent('''
+    import sys
+    import numpy as np
+    from vector_store import FlatVectorClient
+
+    path, prefix, batches, per_batch = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+    collection = FlatVectorClient(path).get_collection('docs')
+    rng = np.random.default_rng(abs(hash(prefix)) % 1000)
+    for batch in range(batches):
+        ids = [f'{prefix}-{batch}-{i}' for i in range(per_batch)]
+        vectors = rng.normal(size=(per_batch, 16)).astype(np.float32)
+        collection.upsert(ids=ids, embeddings=vectors, documents=ids,
+                          metadatas=[{'video_id': prefix, 'chunk_type': 'transcript'} for _ in ids])
+''')
+
+
+def test_concurrent_upserts_from_two_processes(tmp_path, collection):
+    path = str(tmp_path / 'flat')
+    batches, per_batch = 30, 20
+    writers = [
+        subprocess.Popen([sys.executable, '-c', WRITER, path, prefix, str(batches), str(per_batch)],
+                         cwd=BACKEND_DIR)
+        for prefix in ('a', 'b')
+    ]
+    assert [writer.wait(timeout=120) for writer in writers] == [0, 0]
+
+    collection = FlatVectorClient(path).get_collection('docs')
+    stored = collection.get(include=['documents', 'metadatas', 'embeddings'])
+    assert collection.count() == 2 * batches * per_batch
+    assert collection._load_manifest()['rows'] == 2 * batches * per_batch
+    # Every document still sits next to its own vector: query each by its vector
+    assert stored['ids'] == stored['documents']
+    for doc_id, embedding in list(zip(stored['ids'], stored['embeddings']))[::37]:
+        assert collection.query([embedding], n_results=1)['ids'][0] == [doc_id]
+
+
+@pytest.mark.parametrize('where', [
+    {'video_id': 'video2'},
+    {'video_id': {'$in': ['video1', 'video3']}},
+    {'chunk_type': 'title'},
+    {'chunk_type': {'$in': ['title', 'summary']}},
+    {'chunk_type': {'$ne': 'transcript'}},
+    {'video_id': {'$eq': 'video4'}},
+    {'chunk_index': 12},
+    {'$and': [{'video_id': 'video2'}, {'chunk_type': 'transcript'}]},
+])
+def test_query_and_get_apply_where_filters(collection, where):
+    vectors = _fill(collection)
+    expected = {f'doc{i}' for i in range(60) if _matches(_metadata(i), where)}
+    assert expected
+
+    found = collection.query([vectors[0]], n_results=60, where=where)
+    assert set(found['ids'][0]) == expected
+    assert all(_matches(metadata, where) for metadata in found['metadatas'][0])
+    assert set(collection.get(where=where)['ids']) == expected
+
+
+def test_int8_scan_recall_matches_exact_search(tmp_path, monkeypatch):
+    monkeypatch.setenv('FLAT_STORE_QUANTIZATION', 'int8')
+    collection = FlatVectorClient(str(tmp_path / 'flat')).create_collection('docs')
+    vectors = _unit_vectors(3000, dimension=32, seed=1)
+    for start in range(0, len(vectors), 500):
+        collection.upsert(
+            ids=[f'doc{i}' for i in range(start, start + 500)],
+            embeddings=vectors[start:start + 500],
+            metadatas=[_metadata(i) for i in range(start, start + 500)]
+        )
+    collection.quantize()
+
+    report = evaluate_recall(collection, k=10, samples=100)
+    assert report['recall_at_k'] >= 0.95
+    assert report['footprint']['quantization'] == 'int8'
+
+    query = _unit_vectors(1, dimension=32, seed=2)
+    exact = collection.query(query, n_results=10, exact=True)
+    approximate = collection.query(query, n_results=10)
+    # Re-ranked distances are exact for whatever the scan kept
+    shared = set(exact['ids'][0]) & set(approximate['ids'][0])
+    assert len(shared) >= 9
+    exact_distance = dict(zip(exact['ids'][0], exact['distances'][0]))
+    for doc_id, distance in zip(approximate['ids'][0], approximate['distances'][0]):
+        if doc_id in shared:
+            assert distance == pytest.approx(exact_distance[doc_id], abs=1e-5)
+
+
+def test_search_batch_matches_search(store_env, fake_model, monkeypatch):
+    pytest.importorskip('sentence_transformers')
+    monkeypatch.setenv('VECTOR_STORE_BACKEND', 'flat')
+    import semantic_search
+    from embedding_generator import EmbeddingGenerator
+    monkeypatch.setenv('SEARCH_RESULT_CACHE_SIZE', '0')
+
+    embedder = EmbeddingGenerator(embedding_model=fake_model)
+    topics = ['python decorators explained', 'sourdough bread baking', 'tomato garden in spring',
+              'rust ownership rules', 'sourdough starter feeding']
+    for i, topic in enumerate(topics):
+        text = f'{topic}. ' * 5
+        result = embedder.store_video_embeddings(
+            f'v{i}', text, [{'text': text, 'start': 0.0, 'duration': 10.0}], title=topic
+        )
+        assert result['success'], result
+
+    searcher = semantic_search.SemanticSearcher(embedding_model=fake_model, chroma_client=embedder.chroma_client)
+    queries = ['sourdough', 'python decorators', 'garden', 'sourdough', '']
+    batched = searcher.search_batch(queries, limit=3)
+    single = [searcher.search(query, limit=3) for query in queries]
+
+    strip = lambda result: {key: value for key, value in result.items() if key != 'cache'}
+    assert [strip(result) for result in batched] == [strip(result) for result in single]
+    assert batched[0]['results'][0]['video_id'] in ('v1', 'v4')
+
+
+def test_int8_scales_widen_when_a_later_batch_exceeds_them(tmp_path, monkeypatch):
+    monkeypatch.setenv('FLAT_STORE_QUANTIZATION', 'int8')
+    collection = FlatVectorClient(str(tmp_path / 'flat')).create_collection('docs')
+    small = _unit_vectors(500, dimension=16, seed=3) * 0.1
+    large = _unit_vectors(500, dimension=16, seed=4)
+    collection.upsert(ids=[f'small{i}' for i in range(500)], embeddings=small)
+    collection.upsert(ids=[f'large{i}' for i in range(500)], embeddings=large)
+
+    manifest = collection._load_manifest()
+    scales = np.asarray(manifest['scales'], dtype=np.float32)
+    assert np.all(np.abs(large).max(axis=0) <= scales * 127.0)
+    # Earlier rows were re-encoded with the wider scales, not left on the old ones
+    collection._map(manifest)
+    decoded = np.asarray(collection._codes[:1000], dtype=np.float32) * scales
+    stored = np.concatenate([small, large])
+    assert np.abs(decoded - stored).max() <= scales.max()
+
+    queries = large[:20]
+    for query, expected in zip(queries, [f'large{i}' for i in range(20)]):
+        assert collection.query([query], n_results=1)['ids'][0] == [expected]
+
+
+def test_collection_version_changes_on_every_bump_without_growing(store_env):
+    seen = {vector_store.get_collection_version('videos', 'flat')}
+    for _ in range(50):
+        seen.add(vector_store.bump_collection_version('videos', 'flat'))
+        assert vector_store.get_collection_version('videos', 'flat') in seen
+
+    assert len(seen) == 51
+    path = vector_store._version_path('videos', 'flat')
+    assert os.path.getsize(path) < 32
+    assert os.listdir(os.path.dirname(path)) == ['videos.version']
+
+    vector_store.drop_collection_version('videos', 'flat')
+    assert vector_store.get_collection_version('videos', 'flat') == 0
+
+
+def test_tune_hnsw_builds_once_per_graph_and_applies_search_ef(monkeypatch):
+    chromadb = pytest.importorskip('chromadb')
+    from chromadb.config import Settings
+
+    source = chromadb.EphemeralClient(Settings(anonymized_telemetry=False)).get_or_create_collection(
+        'tune_source', metadata={'hnsw:space': 'cosine'}
+    )
+    vectors = _unit_vectors(6000, dimension=16, seed=3)
+    for start in range(0, len(vectors), 2000):
+        source.add(ids=[str(i) for i in range(start, start + 2000)],
+                   embeddings=vectors[start:start + 2000].tolist())
+    monkeypatch.setattr(vector_store, 'TUNE_M', (16,))
+    monkeypatch.setattr(vector_store, 'TUNE_CONSTRUCTION_EF', (100,))
+    monkeypatch.setattr(vector_store, 'TUNE_SEARCH_EF', (1, 200))
+
+    result = vector_store.tune_hnsw(source, k=10, queries=50)
+
+    low, high = result['results']
+    assert (low['search_ef'], high['search_ef']) == (1, 200)
+    assert low['build_seconds'] == high['build_seconds']
+    assert high['recall_at_k'] > low['recall_at_k']
+    assert high['recall_at_k'] >= 0.99
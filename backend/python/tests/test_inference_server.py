@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('chromadb')
+pytest.importorskip('sentence_transformers')
+
+
+def test_server_starts_and_searches_with_one_chroma_client(store_env, fake_model, monkeypatch):
+    monkeypatch.setenv('VECTOR_STORE_BACKEND', 'chroma')
+    from inference_server import InferenceServer
+
+    server = InferenceServer(max_batch_size=8, window_ms=1.0, embedding_model=fake_model)
+    assert server.searcher.chroma_client is server.embedder.chroma_client
+
+    stored = server.embedder.store_video_embeddings(
+        'v1', 'gradient descent explained',
+        [{'text': 'gradient descent explained', 'start': 0.0, 'duration': 3.0}],
+        title='Gradient descent'
+    )
+    assert stored['success'], stored
+
+    async def search():
+        server.batcher.start()
+        return await server.handle_search({'query': 'gradient descent', 'limit': 3})
+
+    status, result = asyncio.run(search())
+    assert status == 200, result
+    assert result['results'][0]['video_id'] == 'v1'
+
+
+def test_server_loads_no_models_for_dual_write_targets(store_env, fake_model, monkeypatch):
+    monkeypatch.setenv('VECTOR_STORE_BACKEND', 'chroma')
+    import embedding_generator
+    import model_registry
+    from inference_server import InferenceServer
+
+    model_registry.register_model('new-model', 48)
+    model_registry.start_dual_write('new-model')
+    loaded = []
+    monkeypatch.setattr(embedding_generator, 'load_embedding_model',
+                        lambda name, backend=None: loaded.append(name) or fake_model)
+
+    server = InferenceServer(max_batch_size=8, window_ms=1.0, embedding_model=fake_model)
+
+    assert server.embedder.dual_writers == []
+    assert loaded == []
+
+
+@pytest.mark.skipif(not hasattr(__import__('os'), 'fork'), reason='pre-fork mode needs os.fork')
+def test_prefork_parent_gives_up_on_crash_looping_workers(monkeypatch):
+    import argparse
+    import signal
+    import inference_server
+
+    def crash(sock, args, embedding_model, sentiment_pipeline):
+        raise RuntimeError('cannot start')
+
+    monkeypatch.setattr(inference_server, 'load_shared_models', lambda: (None, None))
+    monkeypatch.setattr(inference_server, 'run_worker', crash)
+    monkeypatch.setattr(inference_server, 'WORKER_RESPAWN_BASE_DELAY', 0.01)
+    monkeypatch.setattr(inference_server, 'WORKER_MAX_RAPID_FAILURES', 3)
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+    args = argparse.Namespace(host='127.0.0.1', port=0, workers=2)
+    try:
+        with pytest.raises(Exception, match='giving up'):
+            inference_server.run_prefork(args)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('sentence_transformers')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = (
+    "import os, embedding_generator, model_backends; "
+    "print(os.environ.get('HF_HUB_OFFLINE'), model_backends.get_embedding_precision())"
+)
+
+
+def test_embedding_generator_applies_offline_and_precision_from_dotenv(store_env):
+    (store_env / '.env').write_text('MODEL_STORE_OFFLINE=1\nEMBEDDING_PRECISION=float16\n')
+    env = {key: value for key, value in os.environ.items()
+           if key not in ('MODEL_STORE_OFFLINE', 'EMBEDDING_PRECISION', 'HF_HUB_OFFLINE', 'TRANSFORMERS_OFFLINE')}
+    env['PYTHONPATH'] = BACKEND_DIR
+
+    probe = subprocess.run([sys.executable, '-c', PROBE], cwd=store_env, env=env,
+                           capture_output=True, text=True, timeout=120)
+
+    assert probe.returncode == 0, probe.stderr
+    assert probe.stdout.split() == ['1', 'float16']
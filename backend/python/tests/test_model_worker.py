@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip('chromadb')
+pytest.importorskip('sentence_transformers')
+
+
+def test_worker_builds_embedder_and_searcher_on_one_chroma_path(store_env, fake_model, monkeypatch):
+    monkeypatch.setenv('VECTOR_STORE_BACKEND', 'chroma')
+    import embedding_generator
+    monkeypatch.setattr(embedding_generator, 'load_embedding_model', lambda name, backend=None: fake_model)
+    from model_worker import ModelWorker
+
+    worker = ModelWorker()
+    stored = worker.handle({
+        'command': 'store',
+        'video_id': 'v1',
+        'transcript_text': 'neural networks learn features',
+        'transcript_segments': [{'text': 'neural networks learn features', 'start': 0.0, 'duration': 4.0}],
+        'title': 'Neural networks'
+    })
+    assert stored['success'], stored
+
+    # Used to fail: a second PersistentClient with different Settings on the same path
+    assert worker.searcher.chroma_client is worker.embedder.chroma_client
+    result = worker.handle({'command': 'search', 'query': 'neural networks', 'limit': 5})
+    assert result['success'], result
+    assert result['results'][0]['video_id'] == 'v1'
+    assert worker.handle({'command': 'stats'})['success']
@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip('chromadb')
+pytest.importorskip('sentence_transformers')
+
+
+def _store(embedder, video_id, text):
+    result = embedder.store_video_embeddings(
+        video_id, text, [{'text': text, 'start': 0.0, 'duration': 4.0}], title=text
+    )
+    assert result['success'], result
+
+
+@pytest.mark.parametrize('backend', ['chroma', 'flat'])
+def test_searcher_follows_a_rebuild_swap(store_env, fake_model, monkeypatch, backend):
+    monkeypatch.setenv('VECTOR_STORE_BACKEND', backend)
+    from embedding_generator import EmbeddingGenerator
+    from semantic_search import SemanticSearcher
+
+    embedder = EmbeddingGenerator(embedding_model=fake_model)
+    _store(embedder, 'old', 'gardening tomatoes in spring')
+    searcher = SemanticSearcher(embedding_model=fake_model, chroma_client=embedder.chroma_client)
+    assert searcher.search('tomatoes')['results'][0]['video_id'] == 'old'
+
+    # What `embedding_generator.py rebuild` does: fill a staging collection, then swap it in
+    staging = embedder.create_staging_collection()
+    embedder.collection = staging
+    _store(embedder, 'new', 'baking sourdough bread')
+    embedder.swap_collection(staging)
+
+    # Used to fail: the searcher kept querying the dropped collection
+    result = searcher.search('sourdough bread')
+    assert result['success'], result
+    assert [video['video_id'] for video in result['results']] == ['new']
+    assert searcher.search_batch(['sourdough'])[0]['success']
+
+
+def test_searcher_reconnects_when_its_collection_disappears(store_env, fake_model, monkeypatch):
+    monkeypatch.setenv('VECTOR_STORE_BACKEND', 'chroma')
+    from embedding_generator import EmbeddingGenerator
+    from semantic_search import SemanticSearcher
+
+    embedder = EmbeddingGenerator(embedding_model=fake_model)
+    _store(embedder, 'v1', 'rust ownership and borrowing')
+    searcher = SemanticSearcher(embedding_model=fake_model, chroma_client=embedder.chroma_client)
+
+    # Recreated without a version bump: only the failed query reveals it
+    embedder.chroma_client.delete_collection(embedder.collection_name)
+    monkeypatch.setattr(searcher, 'refresh_collection', lambda: searcher.collection is not None)
+    embedder.collection = embedder.chroma_client.create_collection(embedder.collection_name)
+    embedder.chroma_client.get_collection(embedder.collection_name).add(
+        ids=['x'], embeddings=fake_model.encode(['rust'], normalize_embeddings=True).tolist(),
+        documents=['rust'], metadatas=[{'video_id': 'v2', 'chunk_type': 'title'}]
+    )
+
+    result = searcher.search('rust')
+    assert result['success'], result
+    assert result['results'][0]['video_id'] == 'v2'
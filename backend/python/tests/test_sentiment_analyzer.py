@@ -0,0 +1,65 @@
+import json
+import sys
+
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('transformers')
+
+import sentiment_analyzer
+
+
+def test_main_closes_the_analyzer_when_analysis_fails(monkeypatch, capsys):
+    closed = []
+
+    class FailingAnalyzer:
+        def __init__(self, **kwargs):
+            pass
+
+        def analyze_transcript(self, *args, **kwargs):
+            raise RuntimeError('model crashed')
+
+        def close(self):
+            closed.append(True)
+
+    monkeypatch.setattr(sentiment_analyzer, 'SentimentAnalyzer', FailingAnalyzer)
+    segments = json.dumps([{'text': 'hello there', 'start': 0.0, 'duration': 1.0}])
+    monkeypatch.setattr(sys, 'argv', ['sentiment_analyzer.py', segments])
+
+    with pytest.raises(SystemExit) as exit_info:
+        sentiment_analyzer.main()
+
+    assert exit_info.value.code == 1
+    assert closed == [True]
+    assert 'model crashed' in json.loads(capsys.readouterr().out)['error']
+
+
+class RecordingPipeline:
+    """Sentiment pipeline stand-in that records the texts it is given."""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.texts = []
+
+    def __call__(self, texts, **kwargs):
+        texts = [texts] if isinstance(texts, str) else texts
+        self.texts.extend(texts)
+        return [{'label': 'POSITIVE', 'score': 0.9} for _ in texts]
+
+
+def test_long_segments_are_windowed_on_the_original_text(tmp_path):
+    from transformers import BertTokenizerFast
+
+    vocab = tmp_path / 'vocab.txt'
+    vocab.write_text('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', 'the', 'model', 'learn', '##ing', '##s']))
+    tokenizer = BertTokenizerFast(vocab_file=str(vocab), model_max_length=10)
+    pipeline = RecordingPipeline(tokenizer)
+    analyzer = sentiment_analyzer.SentimentAnalyzer(sentiment_pipeline=pipeline, use_cache=False, cascade=False)
+    text = ' '.join(['the models learning'] * 6)
+
+    results = analyzer.score_texts([text], batch_size=8)
+
+    assert len(pipeline.texts) > 1
+    assert all('##' not in window for window in pipeline.texts)
+    assert all(window in text for window in pipeline.texts)
+    assert results[0]['raw_label'] == 'POSITIVE'
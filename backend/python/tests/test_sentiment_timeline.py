@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('transformers')
+
+from sentiment_analyzer import build_timeline
+
+
+def _segments(count):
+    starts = np.arange(count, dtype=np.float64) * 10.0
+    scores = np.linspace(-1.0, 1.0, count)
+    label_codes = np.sign(scores).astype(np.int64)
+    return starts, starts + 5.0, scores, label_codes
+
+
+@pytest.mark.parametrize('buckets', [1, 2, 3, 8])
+def test_timeline_has_one_entry_per_bucket_when_smoothing_is_wider(buckets):
+    timeline = build_timeline(*_segments(6), buckets=buckets, smoothing=5)
+
+    # Used to return more than `buckets` entries once the window exceeded the timeline
+    assert len(timeline) == buckets
+    assert timeline[0]['start'] == 0.0
+    assert sum(bucket['segment_count'] for bucket in timeline) == 6
+
+
+def test_timeline_rejects_fewer_than_one_bucket():
+    with pytest.raises(ValueError):
+        build_timeline(*_segments(3), buckets=0)
@@ -0,0 +1,1147 @@
+#!/usr/bin/env python3
+"""
+Pluggable Vector Store
+
+EmbeddingGenerator and SemanticSearcher talk to their vector store through
+the small subset of the ChromaDB API they use:
+
+    client:      get_collection, get_or_create_collection, create_collection,
+                 delete_collection, get_max_batch_size
+    collection:  name, metadata, count, get, upsert, add, update, delete,
+                 query, modify(name=...)
+
+VECTOR_STORE_BACKEND selects the implementation:
+
+    chroma  - ChromaDB PersistentClient under CHROMA_PERSIST_DIR (default)
+    flat    - FlatVectorStore below, under FLAT_STORE_DIR
+
+FlatVectorStore keeps every vector in a memory-mapped float32 matrix next to
+a compact per-row array (video index, chunk type code, timestamp, squared
+norm, alive flag) and answers queries exactly with one matrix-vector
+product and argpartition. Documents and full metadata live in SQLite and
+are only read for the rows returned. Deleted rows are masked, not
+reclaimed; `embedding_generator.py rebuild` writes a compact copy.
+
+With FLAT_STORE_QUANTIZATION=int8 a collection also keeps int8 codes with
+per-dimension scales. Queries scan the codes (a quarter of the memory
+traffic) and re-score only the best FLAT_RERANK_FACTOR * k candidates
+against the float vectors, which stay on disk and are paged in per row.
+The scales come from the first vectors written and are widened, with the
+stored codes re-encoded, whenever a later upsert exceeds them; `quantize`
+recalibrates them on everything stored.
+
+Chroma collections are created with an explicit distance space and HNSW
+parameters from HNSW_SPACE, HNSW_M, HNSW_CONSTRUCTION_EF and HNSW_SEARCH_EF
+(see hnsw_metadata). Collections created before that keep Chroma's 'l2'
+default until they are rebuilt; distance_to_similarity reads the space from
+the collection, so search scores stay correct for both.
+
+Usage:
+    python vector_store.py quantize [collection]        # add int8 codes to a flat collection
+    python vector_store.py recall [collection] [k] [n]  # recall@k of int8 search vs exact
+    python vector_store.py tune [k] [queries] [docs]    # HNSW recall@k and latency sweep
+"""
+
+import sys
+import json
+import os
+import time
+import shutil
+import sqlite3
+import tempfile
+import threading
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+# Settings from the environment (VECTOR_STORE_BACKEND, FLAT_STORE_*, HNSW_*)
+# are read when used rather than at import, so a .env loaded by the
+# importing script after its imports still applies.
+
+# Rows converted from int8 to float per step of the compressed scan; small
+# enough that the converted block stays in cache
+SCAN_BLOCK_ROWS = 2048
+
+# When an upsert holds values beyond the int8 scales, they are widened by
+# this much more than needed, so drifting data does not re-encode every batch
+SCALE_HEADROOM = 1.1
+
+VECTOR_STORE_BACKENDS = ('chroma', 'flat')
+
+HNSW_SPACES = ('cosine', 'l2', 'ip')
+
+# Grid swept by `python vector_store.py tune`
+TUNE_M = (8, 16, 32)
+TUNE_CONSTRUCTION_EF = (100, 200)
+TUNE_SEARCH_EF = (16, 32, 64, 128, 256)
+
+CHUNK_TYPE_CODES = {'transcript': 0, 'title': 1, 'summary': 2}
+OTHER_CHUNK_TYPE = 3
+
+# Per-row fields kept in memory for masking and distance computation
+ROW_DTYPE = np.dtype([
+    ('video', '<i4'),
+    ('chunk_type', 'i1'),
+    ('alive', 'u1'),
+    ('timestamp', '<f4'),
+    ('norm2', '<f4')
+])
+
+MANIFEST_FILE = 'manifest.json'
+INITIAL_CAPACITY = 1024
+
+# Per-collection write versions under the store directory (see bump_collection_version)
+COLLECTION_VERSION_DIR = 'collection_versions'
+
+
+def get_vector_store_backend(backend: Optional[str] = None) -> str:
+    """
+    Resolve the vector store from an explicit argument or VECTOR_STORE_BACKEND.
+
+    Raises:
+        ValueError: If the name is not one of VECTOR_STORE_BACKENDS
+    """
+    name = (backend or os.getenv('VECTOR_STORE_BACKEND', 'chroma')).strip().lower()
+    if name not in VECTOR_STORE_BACKENDS:
+        raise ValueError(f"Unknown vector store '{name}'. Use one of: {', '.join(VECTOR_STORE_BACKENDS)}")
+    return name
+
+
+def get_store_path(backend: Optional[str] = None) -> str:
+    """Directory the selected vector store persists to."""
+    if get_vector_store_backend(backend) == 'flat':
+        return os.getenv('FLAT_STORE_DIR', './flat_index')
+    return os.getenv('CHROMA_PERSIST_DIR', './chromadb')
+
+
+def get_flat_quantization() -> str:
+    """Compressed scan for new flat collections: 'int8' or 'none' (FLAT_STORE_QUANTIZATION)."""
+    return 'int8' if os.getenv('FLAT_STORE_QUANTIZATION', 'none').strip().lower() == 'int8' else 'none'
+
+
+def get_rerank_factor() -> int:
+    """Candidates per requested result the int8 scan hands to float re-ranking (FLAT_RERANK_FACTOR)."""
+    return int(os.getenv('FLAT_RERANK_FACTOR', '10'))
+
+
+def get_hnsw_settings() -> Dict[str, Any]:
+    """
+    Distance space and HNSW graph parameters for new Chroma collections.
+
+    M and construction_ef are fixed once a collection is built (rebuild to
+    change them); search_ef trades query latency for recall.
+    """
+    try:
+        return {
+            'space': os.getenv('HNSW_SPACE', 'cosine'),
+            'M': int(os.getenv('HNSW_M', '16')),
+            'construction_ef': int(os.getenv('HNSW_CONSTRUCTION_EF', '100')),
+            'search_ef': int(os.getenv('HNSW_SEARCH_EF', '64'))
+        }
+    except ValueError as e:
+        raise ValueError(f"HNSW_M, HNSW_CONSTRUCTION_EF and HNSW_SEARCH_EF must be integers: {str(e)}")
+
+
+def _version_path(name: str, backend: Optional[str] = None) -> str:
+    return os.path.join(get_store_path(backend), COLLECTION_VERSION_DIR, f"{name}.version")
+
+
+def get_collection_version(name: str, backend: Optional[str] = None) -> int:
+    """
+    Write version of a collection (0 before its first recorded write).
+
+    Reading one small file is cheap enough to check on every search.
+    """
+    try:
+        with open(_version_path(name, backend)) as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_collection_version(name: str, backend: Optional[str] = None) -> int:
+    """
+    Record a write to a collection, invalidating results cached against it.
+
+    The version file holds a single integer and is rewritten through a
+    temporary file and os.replace, so readers never see a partial value
+    and the file never grows. The new value is at least the current time
+    in nanoseconds, so writers racing on the same old value still each
+    store a version no searcher has cached.
+    """
+    path = _version_path(name, backend)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    version = max(get_collection_version(name, backend) + 1, time.time_ns())
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(str(version))
+    os.replace(temp_path, path)
+    return version
+
+
+def drop_collection_version(name: str, backend: Optional[str] = None) -> None:
+    """Remove the version file of a collection that no longer exists."""
+    try:
+        os.remove(_version_path(name, backend))
+    except FileNotFoundError:
+        pass
+
+
+def create_client(backend: Optional[str] = None, allow_reset: bool = False):
+    """
+    Open the client of the selected vector store.
+
+    chromadb is only imported when the chroma backend is used.
+
+    Returns:
+        chromadb PersistentClient or FlatVectorClient
+    """
+    backend = get_vector_store_backend(backend)
+    path = get_store_path(backend)
+    if backend == 'flat':
+        return FlatVectorClient(path)
+
+    import chromadb
+    from chromadb.config import Settings
+    return chromadb.PersistentClient(
+        path=path,
+        settings=Settings(
+            anonymized_telemetry=False,
+            allow_reset=allow_reset
+        )
+    )
+
+
+def hnsw_metadata(space: Optional[str] = None, m: Optional[int] = None,
+                  construction_ef: Optional[int] = None, search_ef: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Collection metadata that pins Chroma's distance space and HNSW parameters.
+
+    Arguments default to the HNSW_* environment settings.
+
+    Raises:
+        ValueError: If the space is not one of HNSW_SPACES
+    """
+    settings = get_hnsw_settings()
+    space = (space or settings['space']).strip().lower()
+    if space not in HNSW_SPACES:
+        raise ValueError(f"Unknown HNSW space '{space}'. Use one of: {', '.join(HNSW_SPACES)}")
+    return {
+        'hnsw:space': space,
+        'hnsw:M': m or settings['M'],
+        'hnsw:construction_ef': construction_ef or settings['construction_ef'],
+        'hnsw:search_ef': search_ef or settings['search_ef']
+    }
+
+
+def get_collection_space(collection) -> str:
+    """Distance space of a collection; 'l2' (Chroma's default) when it was never set."""
+    return (collection.metadata or {}).get('hnsw:space', 'l2')
+
+
+def distance_to_similarity(distance: float, space: str) -> float:
+    """
+    Cosine similarity of a unit-length query and document from their distance.
+
+    Args:
+        distance: Distance returned by collection.query
+        space: 'cosine' (1 - cos), 'ip' (1 - dot) or 'l2' (squared L2, 2 - 2 cos)
+    """
+    if space == 'l2':
+        return 1.0 - distance / 2.0
+    return 1.0 - distance
+
+
+def _matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the equality / $in / $and subset of Chroma's where filters."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            for operator, value in condition.items():
+                if operator == '$in' and metadata.get(key) not in value:
+                    return False
+                if operator == '$eq' and metadata.get(key) != value:
+                    return False
+                if operator == '$ne' and metadata.get(key) == value:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _thread_attribute(name: str) -> property:
+    """Attribute stored per thread (None until the thread sets it)."""
+    return property(lambda self: getattr(self._local, name, None),
+                    lambda self, value: setattr(self._local, name, value))
+
+
+class FlatVectorStore:
+    # The SQLite connection and the mapped arrays are kept per thread:
+    # sqlite3 connections cannot be shared across threads (inference_server.py
+    # searches from executor threads), and a thread remapping after a write
+    # must not swap the arrays out from under another thread's query.
+    _connection = _thread_attribute('connection')
+    _connection_path = _thread_attribute('connection_path')
+    _pid = _thread_attribute('pid')
+    _manifest = _thread_attribute('manifest')
+    _manifest_stamp = _thread_attribute('manifest_stamp')
+    _vectors = _thread_attribute('vectors')
+    _rows = _thread_attribute('rows')
+    _codes = _thread_attribute('codes')
+
+    def __init__(self, path: str, name: str):
+        """
+        One collection of the flat store, kept in its own directory.
+
+        Args:
+            path: Collection directory
+            name: Collection name
+        """
+        self.path = path
+        self.name = name
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # Reopened after a fork, and after modify() moved the collection
+        if self._connection is None or self._pid != os.getpid() or self._connection_path != self.path:
+            self._connection = sqlite3.connect(os.path.join(self.path, 'documents.sqlite'), timeout=30,
+                                               isolation_level=None)
+            self._pid = os.getpid()
+            self._connection_path = self.path
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS documents (row INTEGER PRIMARY KEY, id TEXT UNIQUE, '
+                'video_id TEXT, document TEXT, metadata TEXT)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS documents_video ON documents (video_id)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS videos (idx INTEGER PRIMARY KEY, video_id TEXT UNIQUE)')
+        return self._connection
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, MANIFEST_FILE)
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Re-read the manifest (and remap the arrays) when another process changed it."""
+        stat = os.stat(self._manifest_path())
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp != self._manifest_stamp:
+            with open(self._manifest_path(), 'r', encoding='utf-8') as f:
+                self._manifest = json.load(f)
+            self._manifest_stamp = stamp
+            self._vectors = None
+            self._rows = None
+            self._codes = None
+        return self._manifest
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        # Replace atomically: readers see the old or the new row count, never half a file
+        temporary = self._manifest_path() + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temporary, self._manifest_path())
+        self._manifest = manifest
+        self._manifest_stamp = None
+
+    def _map(self, manifest: Dict[str, Any], writable: bool = False) -> None:
+        capacity = manifest['capacity']
+        self._codes = None
+        if not capacity or not manifest['dimension']:
+            self._vectors = np.zeros((0, manifest['dimension'] or 0), dtype=np.float32)
+            self._rows = np.zeros(0, dtype=ROW_DTYPE)
+            return
+        mode = 'r+' if writable else 'r'
+        self._vectors = np.memmap(os.path.join(self.path, 'vectors.f32'), dtype=np.float32, mode=mode,
+                                  shape=(capacity, manifest['dimension']))
+        self._rows = np.memmap(os.path.join(self.path, 'rows.bin'), dtype=ROW_DTYPE, mode=mode,
+                               shape=(capacity,))
+        if manifest.get('quantization') == 'int8':
+            self._codes = np.memmap(os.path.join(self.path, 'codes.i8'), dtype=np.int8, mode=mode,
+                                    shape=(capacity, manifest['dimension']))
+
+    def _ensure_capacity(self, manifest: Dict[str, Any], needed: int) -> None:
+        """Grow the vector and row files (doubling) to hold `needed` rows."""
+        capacity = manifest['capacity']
+        if needed <= capacity:
+            return
+        new_capacity = max(INITIAL_CAPACITY, capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+        self._vectors = None
+        self._rows = None
+        self._codes = None
+        with open(os.path.join(self.path, 'vectors.f32'), 'ab') as f:
+            f.truncate(new_capacity * manifest['dimension'] * 4)
+        with open(os.path.join(self.path, 'rows.bin'), 'ab') as f:
+            f.truncate(new_capacity * ROW_DTYPE.itemsize)
+        if manifest.get('quantization') == 'int8':
+            with open(os.path.join(self.path, 'codes.i8'), 'ab') as f:
+                f.truncate(new_capacity * manifest['dimension'])
+        manifest['capacity'] = new_capacity
+
+    @staticmethod
+    def _encode_int8(vectors: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        """Symmetric per-dimension int8 codes; values beyond the scale are clipped."""
+        return np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+
+    def _encode_rows(self, total: int, scales: np.ndarray) -> None:
+        """Re-encode the codes of the first `total` rows (mapped writable) with new scales."""
+        for start in range(0, total, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, total)
+            self._codes[start:end] = self._encode_int8(self._vectors[start:end], scales)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self._load_manifest().get('metadata') or {}
+
+    def _video_indexes(self, video_ids: List[str], create: bool = True) -> List[int]:
+        """Compact integer per video_id, assigned on first sight (-1 if unknown and not created)."""
+        connection = self.connection
+        if create:
+            connection.executemany('INSERT OR IGNORE INTO videos (video_id) VALUES (?)',
+                                   [(video_id,) for video_id in set(video_ids)])
+        lookup = {}
+        unique_ids = list(set(video_ids))
+        for start in range(0, len(unique_ids), 500):
+            chunk = unique_ids[start:start + 500]
+            lookup.update(connection.execute(
+                f'SELECT video_id, idx FROM videos WHERE video_id IN ({",".join("?" * len(chunk))})', chunk
+            ).fetchall())
+        return [lookup.get(video_id, -1) for video_id in video_ids]
+
+    @staticmethod
+    def _row_fields(metadata: Dict[str, Any]):
+        chunk_type = CHUNK_TYPE_CODES.get(metadata.get('chunk_type'), OTHER_CHUNK_TYPE)
+        return chunk_type, float(metadata.get('estimated_timestamp', 0) or 0)
+
+    def _rows_for_ids(self, ids: List[str]) -> Dict[str, int]:
+        found = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            found.update(self.connection.execute(
+                f'SELECT id, row FROM documents WHERE id IN ({",".join("?" * len(chunk))})', chunk
+            ).fetchall())
+        return found
+
+    def count(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    def _next_row(self, manifest: Dict[str, Any]) -> int:
+        """First unused row, from the manifest and the committed documents (write lock held)."""
+        last_row = self.connection.execute('SELECT MAX(row) FROM documents').fetchone()[0]
+        return max(manifest['rows'], -1 if last_row is None else last_row + 1)
+
+    def _commit_with_manifest(self, manifest: Dict[str, Any], previous: Dict[str, Any]) -> None:
+        """
+        Write the manifest, then COMMIT, both under the caller's BEGIN IMMEDIATE.
+
+        Written after the lock is released, a slower writer could put back
+        a stale row count over a faster one's, or start from it and overwrite
+        the faster one's rows. If COMMIT fails the previous manifest is restored.
+        """
+        self._write_manifest(manifest)
+        try:
+            self.connection.execute('COMMIT')
+        except Exception:
+            self._write_manifest(previous)
+            raise
+
+    def modify(self, name: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Rename the collection (moves its directory) and/or replace its metadata."""
+        if metadata is not None:
+            connection = self.connection
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                previous = self._load_manifest()
+                self._commit_with_manifest({**previous, 'metadata': metadata}, previous)
+            except Exception:
+                if connection.in_transaction:
+                    connection.execute('ROLLBACK')
+                raise
+        if name and name != self.name:
+            new_path = os.path.join(os.path.dirname(self.path), name)
+            if os.path.exists(new_path):
+                raise ValueError(f"Collection {name} already exists")
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            self._vectors = None
+            self._rows = None
+            self._codes = None
+            os.rename(self.path, new_path)
+            self.path = new_path
+            self.name = name
+            self._manifest_stamp = None
+
+    def upsert(self, ids: List[str], embeddings, metadatas: Optional[List[Dict[str, Any]]] = None,
+               documents: Optional[List[str]] = None) -> None:
+        """Insert new IDs at the end of the matrix and overwrite existing ones in place."""
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        metadatas = metadatas or [{} for _ in ids]
+        documents = documents or ['' for _ in ids]
+
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            previous = self._load_manifest()
+            manifest = dict(previous)
+            if not manifest['dimension']:
+                manifest['dimension'] = int(vectors.shape[1])
+            elif vectors.shape[1] != manifest['dimension']:
+                raise ValueError(f"Collection holds {manifest['dimension']}-d vectors, got {vectors.shape[1]}-d")
+
+            existing = self._rows_for_ids(list(ids))
+            next_row = self._next_row(manifest)
+            slots = []
+            for doc_id in ids:
+                if doc_id in existing:
+                    slots.append(existing[doc_id])
+                else:
+                    existing[doc_id] = next_row
+                    slots.append(next_row)
+                    next_row += 1
+
+            self._ensure_capacity(manifest, next_row)
+            self._map(manifest, writable=True)
+            slots_array = np.asarray(slots, dtype=np.int64)
+            self._vectors[slots_array] = vectors
+            fields = [self._row_fields(metadata) for metadata in metadatas]
+            self._rows['video'][slots_array] = self._video_indexes([m.get('video_id', '') for m in metadatas])
+            self._rows['chunk_type'][slots_array] = [chunk_type for chunk_type, _ in fields]
+            self._rows['timestamp'][slots_array] = [timestamp for _, timestamp in fields]
+            self._rows['norm2'][slots_array] = np.einsum('ij,ij->i', vectors, vectors)
+            self._rows['alive'][slots_array] = 1
+            if self._codes is not None:
+                maxima = np.abs(vectors).max(axis=0)
+                if not manifest.get('scales'):
+                    # Calibrate on the first vectors written; quantize() recalibrates on everything
+                    manifest['scales'] = (np.maximum(maxima, 1e-6) / 127.0).tolist()
+                scales = np.asarray(manifest['scales'], dtype=np.float32)
+                if np.any(maxima > scales * 127.0):
+                    # These values would be clipped: widen the scales and re-encode the stored rows
+                    scales = np.maximum(scales, maxima * SCALE_HEADROOM / 127.0).astype(np.float32)
+                    self._encode_rows(next_row, scales)
+                    manifest['scales'] = scales.tolist()
+                self._codes[slots_array] = self._encode_int8(vectors, scales)
+                self._codes.flush()
+            self._vectors.flush()
+            self._rows.flush()
+
+            connection.executemany(
+                'INSERT OR REPLACE INTO documents (row, id, video_id, document, metadata) VALUES (?, ?, ?, ?, ?)',
+                [
+                    (slot, doc_id, metadata.get('video_id'), document, json.dumps(metadata))
+                    for slot, doc_id, metadata, document in zip(slots, ids, metadatas, documents)
+                ]
+            )
+            manifest['rows'] = next_row
+            self._commit_with_manifest(manifest, previous)
+        except Exception:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        finally:
+            self._vectors = None
+            self._rows = None
+            self._codes = None
+
+    add = upsert
+
+    def update(self, ids: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+               documents: Optional[List[str]] = None, embeddings=None) -> None:
+        if embeddings is not None:
+            current = self.get(ids=ids, include=['documents', 'metadatas'])
+            by_id = {doc_id: i for i, doc_id in enumerate(current['ids'])}
+            self.upsert(
+                ids, embeddings,
+                metadatas or [current['metadatas'][by_id[doc_id]] for doc_id in ids],
+                documents or [current['documents'][by_id[doc_id]] for doc_id in ids]
+            )
+            return
+
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            manifest = self._load_manifest()
+            self._map(manifest, writable=True)
+            rows = self._rows_for_ids(list(ids))
+            for i, doc_id in enumerate(ids):
+                if doc_id not in rows:
+                    continue
+                slot = rows[doc_id]
+                if metadatas is not None:
+                    metadata = metadatas[i]
+                    chunk_type, timestamp = self._row_fields(metadata)
+                    self._rows['video'][slot] = self._video_indexes([metadata.get('video_id', '')])[0]
+                    self._rows['chunk_type'][slot] = chunk_type
+                    self._rows['timestamp'][slot] = timestamp
+                    connection.execute('UPDATE documents SET metadata = ?, video_id = ? WHERE row = ?',
+                                       (json.dumps(metadata), metadata.get('video_id'), slot))
+                if documents is not None:
+                    connection.execute('UPDATE documents SET document = ? WHERE row = ?', (documents[i], slot))
+            if self._rows.size:
+                self._rows.flush()
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        finally:
+            self._vectors = None
+            self._rows = None
+            self._codes = None
+
+    def _select(self, ids: Optional[List[str]], where: Optional[Dict[str, Any]]) -> List[tuple]:
+        """(row, id, document, metadata) for matching documents, in row order."""
+        clauses, params = [], []
+        if ids is not None:
+            if not ids:
+                return []
+            clauses.append(f'id IN ({",".join("?" * len(ids))})')
+            params.extend(ids)
+        video_filter = (where or {}).get('video_id')
+        if isinstance(video_filter, str):
+            clauses.append('video_id = ?')
+            params.append(video_filter)
+        elif isinstance(video_filter, dict) and set(video_filter) == {'$in'}:
+            values = list(video_filter['$in'])
+            if not values:
+                return []
+            clauses.append(f'video_id IN ({",".join("?" * len(values))})')
+            params.extend(values)
+
+        sql = 'SELECT row, id, document, metadata FROM documents'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        rows = []
+        for row, doc_id, document, metadata in self.connection.execute(sql + ' ORDER BY row', params):
+            metadata = json.loads(metadata)
+            if _matches(metadata, where):
+                rows.append((row, doc_id, document, metadata))
+        return rows
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Optional[List[str]] = None) -> Dict[str, Any]:
+        include = include if include is not None else ['documents', 'metadatas']
+        rows = self._select(ids, where)
+        rows = rows[offset or 0:]
+        if limit is not None:
+            rows = rows[:limit]
+
+        result = {'ids': [doc_id for _, doc_id, _, _ in rows]}
+        result['documents'] = [document for _, _, document, _ in rows] if 'documents' in include else None
+        result['metadatas'] = [metadata for _, _, _, metadata in rows] if 'metadatas' in include else None
+        if 'embeddings' in include:
+            manifest = self._load_manifest()
+            if self._vectors is None:
+                self._map(manifest)
+            result['embeddings'] = [self._vectors[row].tolist() for row, _, _, _ in rows]
+        else:
+            result['embeddings'] = None
+        return result
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        if ids is None and not where:
+            return
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = [row for row, _, _, _ in self._select(ids, where)]
+            if rows:
+                manifest = self._load_manifest()
+                self._map(manifest, writable=True)
+                self._rows['alive'][np.asarray(rows, dtype=np.int64)] = 0
+                self._rows.flush()
+                for start in range(0, len(rows), 500):
+                    chunk = rows[start:start + 500]
+                    connection.execute(f'DELETE FROM documents WHERE row IN ({",".join("?" * len(chunk))})', chunk)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        finally:
+            self._vectors = None
+            self._rows = None
+            self._codes = None
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Optional[List[str]] = None, exact: bool = False) -> Dict[str, Any]:
+        """
+        Nearest neighbours of each query by squared L2 distance.
+
+        Distances are reported in the collection's 'hnsw:space' ('l2' when
+        unset), as Chroma would, so callers convert them to similarity the
+        same way for either backend. Ranking by L2 matches cosine ranking
+        for the unit vectors stored here. On an int8 collection the codes are
+        scanned first and only the best candidates are scored exactly;
+        returned distances are always exact.
+
+        Args:
+            query_embeddings: One or more query vectors
+            n_results: Neighbours to return per query
+            where: Optional metadata filter (video_id / chunk_type use the compact arrays)
+            include: Any of 'documents', 'metadatas', 'distances', 'embeddings'
+            exact: Score every row against the float vectors, even on an int8 collection
+
+        Returns:
+            Chroma-shaped result with one list per query
+        """
+        include = include if include is not None else ['documents', 'metadatas', 'distances']
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        manifest = self._load_manifest()
+        if self._vectors is None:
+            self._map(manifest)
+        total = manifest['rows']
+
+        empty = {key: [[] for _ in queries] for key in ('ids', 'documents', 'metadatas', 'distances')}
+        if not total:
+            return empty
+
+        vectors = self._vectors[:total]
+        rows = self._rows[:total]
+        mask = rows['alive'] == 1
+        if where:
+            mask &= self._where_mask(rows, where)
+        candidates = int(np.count_nonzero(mask))
+        k = min(n_results, candidates)
+        if k == 0:
+            return empty
+
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        quantized = self._codes is not None and manifest.get('scales') and not exact
+        if quantized:
+            # Approximate v.q from the codes: (codes * scales) . q == codes . (scales * q)
+            scaled_queries = (queries * np.asarray(manifest['scales'], dtype=np.float32)).T
+            dots = np.empty((total, queries.shape[0]), dtype=np.float32)
+            block = np.empty((min(SCAN_BLOCK_ROWS, total), manifest['dimension']), dtype=np.float32)
+            for start in range(0, total, SCAN_BLOCK_ROWS):
+                end = min(start + SCAN_BLOCK_ROWS, total)
+                np.copyto(block[:end - start], self._codes[start:end], casting='unsafe')
+                np.matmul(block[:end - start], scaled_queries, out=dots[start:end])
+            shortlist = min(candidates, max(k, k * get_rerank_factor()))
+        else:
+            dots = vectors @ queries.T
+            shortlist = k
+        # ||v - q||^2 = ||v||^2 - 2 v.q + ||q||^2, for all rows and queries at once
+        distances = rows['norm2'][:, None] - 2.0 * dots + query_norms[None, :]
+        distances[~mask] = np.inf
+
+        space = get_collection_space(self)
+        result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        for column in range(queries.shape[0]):
+            scores = distances[:, column]
+            top = np.argpartition(scores, shortlist - 1)[:shortlist] if shortlist < total else np.arange(total)
+            if quantized:
+                # Re-rank the shortlist exactly against the float vectors
+                top = top[np.isfinite(scores[top])]
+                top.sort()
+                exact_scores = rows['norm2'][top] - 2.0 * (vectors[top] @ queries[column]) + query_norms[column]
+                order = np.argsort(exact_scores, kind='stable')[:k]
+                top, top_scores = top[order], exact_scores[order]
+            else:
+                top = top[np.argsort(scores[top], kind='stable')][:k]
+                top_scores = scores[top]
+            top_scores = np.maximum(top_scores, 0.0)
+            if space != 'l2':
+                # v.q = (||v||^2 + ||q||^2 - ||v - q||^2) / 2
+                dots = (rows['norm2'][top] + query_norms[column] - top_scores) / 2.0
+                if space == 'cosine':
+                    dots = dots / np.maximum(np.sqrt(rows['norm2'][top] * query_norms[column]), 1e-12)
+                top_scores = 1.0 - dots
+            documents = self._documents_for_rows(top.tolist())
+            result['ids'].append([documents[row][0] for row in top.tolist()])
+            result['documents'].append([documents[row][1] for row in top.tolist()])
+            result['metadatas'].append([documents[row][2] for row in top.tolist()])
+            result['distances'].append([float(score) for score in top_scores])
+
+        for key in ('documents', 'metadatas', 'distances'):
+            if key not in include:
+                result[key] = None
+        return result
+
+    def quantize(self) -> Dict[str, Any]:
+        """
+        Switch the collection to int8 scanning, calibrating scales on all stored vectors.
+
+        Upserts only ever widen the scales (re-encoding the stored codes when
+        a batch exceeds them), so this also tightens them again, e.g. after
+        the rows that set them were deleted.
+        """
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            previous = self._load_manifest()
+            manifest = dict(previous)
+            manifest['quantization'] = 'int8'
+            total = manifest['rows']
+            dimension = manifest['dimension']
+            if manifest['capacity'] and dimension:
+                with open(os.path.join(self.path, 'codes.i8'), 'ab') as f:
+                    f.truncate(manifest['capacity'] * dimension)
+                self._map(manifest, writable=True)
+                alive = self._rows['alive'][:total] == 1
+                maxima = np.zeros(dimension, dtype=np.float32)
+                for start in range(0, total, SCAN_BLOCK_ROWS):
+                    end = min(start + SCAN_BLOCK_ROWS, total)
+                    block = self._vectors[start:end][alive[start:end]]
+                    if block.size:
+                        maxima = np.maximum(maxima, np.abs(block).max(axis=0))
+                scales = np.maximum(maxima, 1e-6) / 127.0
+                self._encode_rows(total, scales)
+                self._codes.flush()
+                manifest['scales'] = scales.tolist() if total else None
+            self._commit_with_manifest(manifest, previous)
+        except Exception:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        finally:
+            self._vectors = None
+            self._rows = None
+            self._codes = None
+        return self.footprint()
+
+    def footprint(self) -> Dict[str, Any]:
+        """Bytes scanned per query and bytes on disk for the vectors."""
+        manifest = self._load_manifest()
+        float_bytes = manifest['rows'] * manifest['dimension'] * 4
+        quantized = manifest.get('quantization') == 'int8'
+        return {
+            'rows': manifest['rows'],
+            'dimension': manifest['dimension'],
+            'quantization': manifest.get('quantization', 'none'),
+            'scan_mb': round((float_bytes / 4 if quantized else float_bytes) / (1024 * 1024), 2),
+            'float_vectors_mb': round(float_bytes / (1024 * 1024), 2)
+        }
+
+    def _where_mask(self, rows: np.ndarray, where: Dict[str, Any]) -> np.ndarray:
+        """Boolean row mask for a where filter; uses the compact arrays where it can."""
+        mask = np.ones(rows.shape[0], dtype=bool)
+        for key, condition in where.items():
+            if not isinstance(condition, dict):
+                values = [condition]
+            elif set(condition) == {'$in'}:
+                values = condition['$in']
+            elif set(condition) == {'$eq'}:
+                values = [condition['$eq']]
+            else:
+                values = None  # $ne and combinations: only the stored metadata can answer them
+            if values is not None and key == 'chunk_type':
+                codes = [CHUNK_TYPE_CODES.get(value, OTHER_CHUNK_TYPE) for value in values]
+                mask &= np.isin(rows['chunk_type'], codes)
+            elif values is not None and key == 'video_id':
+                indexes = self._video_indexes(list(values), create=False) if values else []
+                mask &= np.isin(rows['video'], [index for index in indexes if index >= 0])
+            else:
+                # Other keys: filter on the stored metadata
+                keep = np.zeros(rows.shape[0], dtype=bool)
+                for row, _, _, _ in self._select(None, {key: condition}):
+                    if row < keep.size:
+                        keep[row] = True
+                mask &= keep
+        return mask
+
+    def _documents_for_rows(self, rows: List[int]) -> Dict[int, tuple]:
+        found = {}
+        for start in range(0, len(rows), 500):
+            chunk = rows[start:start + 500]
+            for row, doc_id, document, metadata in self.connection.execute(
+                f'SELECT row, id, document, metadata FROM documents WHERE row IN ({",".join("?" * len(chunk))})',
+                chunk
+            ):
+                found[row] = (doc_id, document, json.loads(metadata))
+        return found
+
+
+class FlatVectorClient:
+    def __init__(self, path: str):
+        """
+        Client for flat collections, one directory per collection under path.
+
+        Args:
+            path: Root directory of the flat store
+        """
+        self.path = path
+
+    def _collection_path(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _exists(self, name: str) -> bool:
+        return os.path.isfile(os.path.join(self._collection_path(name), MANIFEST_FILE))
+
+    def get_collection(self, name: str) -> FlatVectorStore:
+        if not self._exists(name):
+            raise ValueError(f"Collection {name} does not exist.")
+        return FlatVectorStore(self._collection_path(name), name)
+
+    def create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> FlatVectorStore:
+        if self._exists(name):
+            raise ValueError(f"Collection {name} already exists.")
+        path = self._collection_path(name)
+        os.makedirs(path, exist_ok=True)
+        collection = FlatVectorStore(path, name)
+        collection._write_manifest({
+            'dimension': 0,
+            'rows': 0,
+            'capacity': 0,
+            'quantization': get_flat_quantization(),
+            'scales': None,
+            'metadata': metadata or {}
+        })
+        return collection
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> FlatVectorStore:
+        if self._exists(name):
+            return self.get_collection(name)
+        return self.create_collection(name, metadata=metadata)
+
+    def delete_collection(self, name: str) -> None:
+        if not self._exists(name):
+            raise ValueError(f"Collection {name} does not exist.")
+        shutil.rmtree(self._collection_path(name))
+
+    def list_collections(self) -> List[FlatVectorStore]:
+        if not os.path.isdir(self.path):
+            return []
+        return [self.get_collection(name) for name in sorted(os.listdir(self.path)) if self._exists(name)]
+
+    def get_max_batch_size(self) -> int:
+        # No server-side limit; this only bounds memory per write
+        return 50000
+
+
+def evaluate_recall(collection: FlatVectorStore, k: int = 10, samples: int = 200,
+                    seed: int = 0) -> Dict[str, Any]:
+    """
+    Recall@k of the int8 scan with re-ranking against exact float search.
+
+    Stored vectors of randomly sampled rows serve as queries.
+
+    Returns:
+        Mean recall@k, per-query latencies of both paths and the footprint
+    """
+    manifest = collection._load_manifest()
+    if manifest.get('quantization') != 'int8':
+        raise ValueError(f"Collection {collection.name} is not quantized. Run 'python vector_store.py quantize' first")
+    total = manifest['rows']
+    collection._map(manifest)
+    alive_rows = np.flatnonzero(collection._rows[:total]['alive'] == 1)
+    if not alive_rows.size:
+        raise ValueError(f"Collection {collection.name} is empty")
+
+    rng = np.random.default_rng(seed)
+    sample_rows = rng.choice(alive_rows, size=min(samples, alive_rows.size), replace=False)
+    queries = np.asarray(collection._vectors[np.sort(sample_rows)])
+
+    recalls, exact_ms, quantized_ms = [], [], []
+    for query in queries:
+        started = time.perf_counter()
+        reference = collection.query([query], n_results=k, include=[], exact=True)['ids'][0]
+        exact_ms.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        candidate = collection.query([query], n_results=k, include=[])['ids'][0]
+        quantized_ms.append((time.perf_counter() - started) * 1000)
+        recalls.append(len(set(reference) & set(candidate)) / max(1, len(reference)))
+
+    return {
+        'success': True,
+        'collection': collection.name,
+        'k': k,
+        'queries': len(queries),
+        'rerank_factor': get_rerank_factor(),
+        'recall_at_k': round(float(np.mean(recalls)), 4),
+        'min_recall': round(float(np.min(recalls)), 4),
+        'exact_p50_ms': round(float(np.percentile(exact_ms, 50)), 2),
+        'int8_p50_ms': round(float(np.percentile(quantized_ms, 50)), 2),
+        'footprint': collection.footprint()
+    }
+
+
+def _set_search_ef(collection, search_ef: int) -> None:
+    """
+    Change the search_ef of a built Chroma collection.
+
+    chromadb 1.x keeps it in the collection configuration; older releases
+    take it as 'hnsw:search_ef' metadata.
+    """
+    try:
+        collection.modify(configuration={'hnsw': {'ef_search': search_ef}})
+    except TypeError:
+        collection.modify(metadata={'hnsw:search_ef': search_ef})
+
+
+def tune_hnsw(collection, k: int = 10, queries: int = 200, max_documents: int = 50000,
+              seed: int = 0) -> Dict[str, Any]:
+    """
+    Sweep HNSW parameters on a copy of a collection's vectors.
+
+    Up to max_documents stored vectors are read; `queries` of them are held
+    out as queries and the rest are indexed into a scratch Chroma collection
+    once per combination of TUNE_M and TUNE_CONSTRUCTION_EF, which is then
+    queried at every TUNE_SEARCH_EF. Each combination is scored against
+    brute force over the same vectors.
+
+    Returns:
+        recall@k and p50/p99 query latency per combination, with the build
+        time of its (M, construction_ef) index
+    """
+    import chromadb
+    from chromadb.config import Settings
+
+    settings = get_hnsw_settings()
+    space = (collection.metadata or {}).get('hnsw:space') or settings['space']
+    vectors = []
+    page_size = 5000
+    while len(vectors) < max_documents:
+        page = collection.get(limit=min(page_size, max_documents - len(vectors)), offset=len(vectors),
+                              include=['embeddings'])
+        if not page['ids']:
+            break
+        vectors.extend(page['embeddings'])
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if len(vectors) <= queries:
+        raise ValueError(f"Need more than {queries} stored vectors to tune, found {len(vectors)}")
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(vectors))
+    query_vectors, indexed = vectors[order[:queries]], vectors[order[queries:]]
+    ids = [str(i) for i in range(len(indexed))]
+
+    # Brute-force neighbours in the collection's space
+    if space == 'l2':
+        scores = (np.einsum('ij,ij->i', indexed, indexed)[None, :] - 2.0 * (query_vectors @ indexed.T))
+    elif space == 'cosine':
+        unit = indexed / np.maximum(np.linalg.norm(indexed, axis=1, keepdims=True), 1e-12)
+        scores = -(query_vectors @ unit.T)
+    else:
+        scores = -(query_vectors @ indexed.T)
+    k = min(k, len(indexed))
+    truth = np.argpartition(scores, k - 1, axis=1)[:, :k]
+
+    # A persistent scratch store, so the sweep can reopen it after changing search_ef
+    scratch_dir = tempfile.mkdtemp(prefix='hnsw_tune_')
+
+    def open_scratch_client():
+        return chromadb.PersistentClient(path=scratch_dir, settings=Settings(anonymized_telemetry=False))
+
+    client = open_scratch_client()
+    try:
+        batch_size = client.get_max_batch_size()
+    except Exception:
+        batch_size = 5000
+
+    current = (settings['M'], settings['construction_ef'], settings['search_ef'])
+    results = []
+    try:
+        for m in TUNE_M:
+            for construction_ef in TUNE_CONSTRUCTION_EF:
+                # The graph depends only on M and construction_ef: build it once per pair
+                name = f"tune_{m}_{construction_ef}"
+                scratch = client.create_collection(
+                    name, metadata=hnsw_metadata(space, m, construction_ef, TUNE_SEARCH_EF[0])
+                )
+                started = time.perf_counter()
+                for start in range(0, len(indexed), batch_size):
+                    scratch.add(ids=ids[start:start + batch_size],
+                                embeddings=indexed[start:start + batch_size].tolist())
+                build_seconds = time.perf_counter() - started
+
+                for search_ef in TUNE_SEARCH_EF:
+                    if search_ef != TUNE_SEARCH_EF[0]:
+                        _set_search_ef(scratch, search_ef)
+                        # A loaded index keeps the search_ef it was opened with
+                        if hasattr(client, 'close'):
+                            client.close()
+                            client = open_scratch_client()
+                        scratch = client.get_collection(name)
+
+                    recalls, latencies = [], []
+                    for query, expected in zip(query_vectors, truth):
+                        started = time.perf_counter()
+                        found = scratch.query(query_embeddings=[query.tolist()], n_results=k, include=[])['ids'][0]
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        recalls.append(len({int(doc_id) for doc_id in found} & set(expected.tolist())) / k)
+
+                    results.append({
+                        'M': m,
+                        'construction_ef': construction_ef,
+                        'search_ef': search_ef,
+                        'recall_at_k': round(float(np.mean(recalls)), 4),
+                        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+                        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+                        # Shared by every search_ef of this (M, construction_ef) build
+                        'build_seconds': round(build_seconds, 2),
+                        'current': (m, construction_ef, search_ef) == current
+                    })
+                    print(f"M={m} construction_ef={construction_ef} search_ef={search_ef}: "
+                          f"recall@{k} {results[-1]['recall_at_k']}, p99 {results[-1]['p99_ms']}ms", file=sys.stderr)
+                client.delete_collection(name)
+    finally:
+        if hasattr(client, 'close'):
+            client.close()
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    return {
+        'success': True,
+        'collection': collection.name,
+        'space': space,
+        'documents_indexed': len(indexed),
+        'queries': len(query_vectors),
+        'k': k,
+        'current': {key: settings[key] for key in ('M', 'construction_ef', 'search_ef')},
+        'results': results
+    }
+
+
+def main():
+    """Main function to handle command line execution."""
+    commands = ('quantize', 'recall', 'tune')
+    if len(sys.argv) < 2 or sys.argv[1] not in commands or len(sys.argv) > 5:
+        print(json.dumps({
+            'success': False,
+            'error': 'Usage: python vector_store.py quantize [collection] | recall [collection] [k] [samples] '
+                     '| tune [k] [queries] [max_documents]'
+        }))
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    try:
+        from model_registry import get_active_model
+        active_collection = get_active_model()['collection']
+        if command == 'tune':
+            # Always measured on the live Chroma collection
+            collection = create_client('chroma').get_collection(active_collection)
+            k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+            queries = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+            max_documents = int(sys.argv[4]) if len(sys.argv) > 4 else 50000
+            print(json.dumps(tune_hnsw(collection, k, queries, max_documents), indent=2))
+            sys.exit(0)
+
+        name = sys.argv[2] if len(sys.argv) > 2 else active_collection
+        collection = FlatVectorClient(get_store_path('flat')).get_collection(name)
+        if command == 'quantize':
+            result = {'success': True, 'collection': name, **collection.quantize()}
+        else:
+            k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+            samples = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+            result = evaluate_recall(collection, k, samples)
+
+        print(json.dumps(result, indent=2))
+        sys.exit(0)
+
+    except Exception as e:
+        print(json.dumps({
+            'success': False,
+            'error': f'{command} failed: {str(e)}'
+        }))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()